@@ -0,0 +1,13 @@
+"""
+Admin configuration for the Common app.
+"""
+from django.contrib import admin
+from .models import UploadSession
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'target_type', 'target_id', 'status', 'size', 'created_by', 'created_at']
+    list_filter = ['status', 'target_type']
+    search_fields = ['filename', 'upload_id']
+    readonly_fields = ['upload_id', 'sha256', 'completed_at']
@@ -0,0 +1,43 @@
+"""
+Utility functions for shared cache version keys.
+Per-process in-memory structures compare their build version with a key in
+the shared cache and rebuild when it changes; writers rotate the key.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version(key: str) -> str:
+    """
+    Return the current version token for a key, creating one if missing.
+    
+    Tokens are random rather than counters so a key evicted from the cache
+    can never come back with a value an outdated process already holds.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*keys: str, also=()) -> dict:
+    """
+    Return version tokens for several keys with a single cache round trip.
+    
+    Keys in ``also`` are read in the same round trip and returned as stored
+    (``None`` if missing) rather than created.
+    """
+    versions = cache.get_many([*keys, *also])
+    for key in also:
+        versions.setdefault(key, None)
+    for key in keys:
+        if versions.get(key) is None:
+            versions[key] = get_version(key)
+    return versions
+
+
+def bump_version(key: str) -> None:
+    """Rotate the version token so every process rebuilds on next use."""
+    cache.set(key, uuid.uuid4().hex, None)
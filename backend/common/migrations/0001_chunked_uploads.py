@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('total_size', models.BigIntegerField(blank=True, help_text='Declared size in bytes, if known', null=True)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='open', max_length=20)),
+                ('target_type', models.CharField(choices=[('lab_test', 'Lab test result file'), ('radiology_study', 'Radiology study report file'), ('patient_document', 'Patient document')], max_length=30)),
+                ('target_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(blank=True, help_text='Title for patient documents', max_length=200)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'upload_sessions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_number', models.PositiveIntegerField()),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('file_path', models.CharField(max_length=500)),
+                ('received_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='common.uploadsession')),
+            ],
+            options={
+                'db_table': 'upload_parts',
+                'ordering': ['part_number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['status', 'created_at'], name='upload_sess_status_462693_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadpart',
+            constraint=models.UniqueConstraint(fields=('session', 'part_number'), name='unique_upload_part_number'),
+        ),
+    ]
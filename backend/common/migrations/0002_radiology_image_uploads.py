@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='target_type',
+            field=models.CharField(choices=[('lab_test', 'Lab test result file'), ('radiology_study', 'Radiology study report file'), ('patient_document', 'Patient document'), ('radiology_image', 'Radiology study image')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_radiology_image_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('assembling', 'Assembling'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='open', max_length=20),
+        ),
+    ]
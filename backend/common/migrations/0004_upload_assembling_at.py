@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_upload_assembling_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='assembling_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,86 @@
+"""
+Models for the Common app.
+"""
+import uuid
+
+from django.db import models
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload. Parts are streamed to storage as they
+    arrive and concatenated into the final file when the upload completes,
+    which is then attached to its target record.
+    """
+    
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('assembling', 'Assembling'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    TARGET_CHOICES = [
+        ('lab_test', 'Lab test result file'),
+        ('radiology_study', 'Radiology study report file'),
+        ('patient_document', 'Patient document'),
+        ('radiology_image', 'Radiology study image'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField(null=True, blank=True, help_text="Declared size in bytes, if known")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    
+    target_type = models.CharField(max_length=30, choices=TARGET_CHOICES)
+    target_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200, blank=True, help_text="Title for patient documents")
+    
+    # Set when the parts start being joined
+    assembling_at = models.DateTimeField(null=True, blank=True)
+    
+    # Set on completion
+    file_path = models.CharField(max_length=500, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    created_by = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='upload_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'upload_sessions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.upload_id})"
+    
+    @property
+    def parts_folder(self):
+        """Storage folder holding the parts while the upload is open."""
+        return f"uploads/parts/{self.upload_id}"
+
+
+class UploadPart(models.Model):
+    """One received part of an upload session, stored as its own file."""
+    
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='parts')
+    part_number = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    file_path = models.CharField(max_length=500)
+    received_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'upload_parts'
+        ordering = ['part_number']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'part_number'], name='unique_upload_part_number'),
+        ]
+    
+    def __str__(self):
+        return f"Part {self.part_number} of {self.session_id}"
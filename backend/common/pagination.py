@@ -0,0 +1,83 @@
+"""
+Keyset pagination helpers.
+
+Worklists are paged by the values of their ordering columns instead of an
+offset: the next page starts strictly after the last row returned, so each
+page is an index range scan regardless of depth and rows do not shift
+between pages when earlier ones leave the list.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+def encode_cursor(values):
+    """Encode the ordering values of a row as an opaque cursor string."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, parsers):
+    """
+    Decode a cursor into ordering values, converting each with the matching
+    callable in ``parsers`` (e.g. ``(int, parse_datetime, int)``).
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(payload, list) or len(payload) != len(parsers):
+            raise InvalidCursor('Invalid cursor')
+        values = [parser(value) for parser, value in zip(parsers, payload)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+    if any(value is None for value in values):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def after_filter(ordering, values):
+    """
+    Return a ``Q`` selecting rows that sort after ``values`` under
+    ``ordering`` (field names, ``-`` prefixed for descending), which must
+    end with a unique field.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, ordering, parsers, cursor=None, limit=50):
+    """
+    Fetch one page of a ``values()`` queryset that includes the ordering
+    fields. Returns ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on
+    the last page. Raises ``InvalidCursor`` for a malformed cursor.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(after_filter(ordering, decode_cursor(cursor, parsers)))
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[field.lstrip('-')] for field in ordering])
+    return rows, next_cursor
+
+
+def parse_cursor_datetime(value):
+    """Cursor parser for datetime values."""
+    return parse_datetime(value) if isinstance(value, str) else None
@@ -26,8 +26,9 @@ class FileUploadService:
             # Create folder path
             file_path = os.path.join(folder, filename)
             
-            # Save file
-            saved_path = default_storage.save(file_path, ContentFile(file.read()))
+            # Save file; storage reads uploaded files in chunks
+            content = file if hasattr(file, 'chunks') else ContentFile(file.read())
+            saved_path = default_storage.save(file_path, content)
             return saved_path
         except Exception as e:
             logger.error(f"Error uploading file: {str(e)}")
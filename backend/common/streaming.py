@@ -0,0 +1,106 @@
+"""
+Streaming downloads of stored files.
+
+Files are sent in blocks straight from storage, never read whole into
+memory, and a single ``Range: bytes=...`` request is answered with ``206
+Partial Content`` so viewers can seek and interrupted downloads resume.
+
+When ``MEDIA_ACCEL_REDIRECT_PREFIX`` is set (e.g. ``/protected-media/``),
+Django only checks access and hands the transfer to nginx with an
+``X-Accel-Redirect`` header; nginx then serves the file, ranges included.
+"""
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single byte range, ``None``
+    when the header is absent or not a single range (the whole file is
+    sent), or raise ``ValueError`` when the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _iter_range(stream, start, length):
+    try:
+        stream.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        stream.close()
+
+
+def file_response(request, field_file, content_type='application/octet-stream', filename=None, etag=None):
+    """
+    Stream a stored file (a ``FieldFile``), honouring ``Range`` and, given
+    an ``etag``, ``If-None-Match`` and ``If-Range``.
+    """
+    if etag:
+        etag = f'"{etag}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+    disposition = f"inline; filename*=UTF-8''{quote(filename)}" if filename else None
+    prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    if prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{quote(field_file.name)}"
+    else:
+        size = field_file.size
+        if_range = request.headers.get('If-Range')
+        byte_range = None
+        if not if_range or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(field_file.open('rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_range(field_file.open('rb'), start, length), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        response['Accept-Ranges'] = 'bytes'
+
+    if disposition:
+        response['Content-Disposition'] = disposition
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
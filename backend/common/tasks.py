@@ -0,0 +1,12 @@
+"""
+Celery tasks for the Common app.
+"""
+from celery import shared_task
+
+from .uploads import ChunkedUploadService
+
+
+@shared_task(ignore_result=True)
+def purge_expired_uploads():
+    """Nightly cleanup of chunked uploads that were never completed."""
+    ChunkedUploadService.purge_expired()
@@ -0,0 +1,388 @@
+"""
+Resumable chunked uploads.
+
+Large files (outsourced lab reports, scanned documents) are uploaded as
+numbered parts. Each part is streamed from the request straight to storage
+in small blocks, so a worker never holds more than one block in memory, and
+is recorded with its size and SHA-256; a part that would take the upload
+past its size limit is refused as it streams. A client that loses its
+connection asks which parts arrived and re-sends the rest. Completing the
+upload streams the parts in order into the final file, outside any
+transaction, while computing the SHA-256 of the whole file, then attaches
+it to its target record.
+"""
+import hashlib
+import logging
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from rest_framework import status
+
+from .models import UploadSession, UploadPart
+
+logger = logging.getLogger(__name__)
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# target type -> (app label, model, file field); targets without a file
+# field get a new record holding the file on completion
+UPLOAD_TARGETS = {
+    'lab_test': ('laboratory', 'LabTest', 'result_file'),
+    'radiology_study': ('radiology', 'RadiologyStudy', 'report_file'),
+    'patient_document': ('patients', 'Patient', None),
+    'radiology_image': ('radiology', 'RadiologyStudy', None),
+}
+
+# target type -> (app label, model) of the record created for the file; the
+# model has a ``file`` field and a ``create_from_upload`` classmethod
+UPLOAD_RECORDS = {
+    'patient_document': ('patients', 'PatientDocument'),
+    'radiology_image': ('radiology', 'RadiologyImage'),
+}
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be accepted."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class HashingReader:
+    """
+    Read-only file wrapper that hashes and counts bytes as storage reads
+    them, refusing to read past ``limit`` bytes.
+    """
+
+    def __init__(self, stream, limit=None):
+        self.stream = stream
+        self.limit = limit
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(STREAM_BLOCK_SIZE if size is None or size < 0 else size)
+        self.bytes_read += len(data)
+        if self.limit is not None and self.bytes_read > self.limit:
+            raise UploadError(f'Upload exceeds the limit of {self.limit} bytes', status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.hasher.update(data)
+        return data
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+
+class ConcatenatedReader:
+    """Read several stored files in order as one stream."""
+
+    def __init__(self, storage, paths):
+        self.storage = storage
+        self.paths = list(paths)
+        self.current = None
+
+    def read(self, size=-1):
+        size = STREAM_BLOCK_SIZE if size is None or size < 0 else size
+        while True:
+            if self.current is None:
+                if not self.paths:
+                    return b''
+                self.current = self.storage.open(self.paths.pop(0), 'rb')
+            data = self.current.read(size)
+            if data:
+                return data
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+class ChunkedUploadService:
+    """Start, receive, complete and clean up chunked uploads."""
+
+    @staticmethod
+    def start(user, filename, target_type, target_id, content_type='', total_size=None, title=''):
+        """Validate the target and open an upload session."""
+        filename = get_valid_filename((filename or '').replace('\\', '/').split('/')[-1])
+        if not filename:
+            raise UploadError('filename is required')
+        if target_type not in UPLOAD_TARGETS:
+            raise UploadError(f"target_type must be one of {', '.join(UPLOAD_TARGETS)}")
+        try:
+            target_id = int(target_id)
+        except (TypeError, ValueError):
+            raise UploadError('target_id is required')
+        if total_size is not None:
+            try:
+                total_size = int(total_size)
+            except (TypeError, ValueError):
+                raise UploadError('total_size must be a number of bytes')
+            if total_size < 0 or total_size > settings.CHUNKED_UPLOAD_MAX_BYTES:
+                raise UploadError(
+                    f'total_size must be at most {settings.CHUNKED_UPLOAD_MAX_BYTES} bytes',
+                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+
+        app_label, model_name, _ = UPLOAD_TARGETS[target_type]
+        if not apps.get_model(app_label, model_name).objects.filter(pk=target_id).exists():
+            raise UploadError('Target not found', status.HTTP_404_NOT_FOUND)
+
+        return UploadSession.objects.create(
+            filename=filename,
+            content_type=(content_type or '')[:100],
+            total_size=total_size,
+            target_type=target_type,
+            target_id=target_id,
+            title=(title or '')[:200],
+            created_by=user,
+        )
+
+    @staticmethod
+    def get_open_session(upload_id, user):
+        """Return the user's open session or raise."""
+        session = UploadSession.objects.filter(upload_id=upload_id, created_by=user).first()
+        if session is None:
+            raise UploadError('Upload not found', status.HTTP_404_NOT_FOUND)
+        if session.status != 'open':
+            raise UploadError(f'Upload is {session.status}', status.HTTP_409_CONFLICT)
+        return session
+
+    @staticmethod
+    def receive_part(session, part_number, stream, expected_sha256=None):
+        """
+        Stream one part to storage and record it. Re-sending a part replaces
+        the earlier copy. Returns the ``UploadPart``.
+
+        Parts may not take the upload past ``CHUNKED_UPLOAD_MAX_BYTES`` (or
+        its declared ``total_size``); a part is cut off as soon as it would.
+        """
+        if part_number < 1:
+            raise UploadError('Part numbers start at 1')
+
+        received = ChunkedUploadService.received_size(session, exclude_part=part_number)
+        upload_limit = ChunkedUploadService.size_limit(session)
+        reader = HashingReader(stream, limit=min(settings.CHUNKED_UPLOAD_MAX_PART_BYTES, max(upload_limit - received, 0)))
+        # A unique name per attempt, so an interrupted write never clobbers a good part
+        path = f"{session.parts_folder}/{part_number:06d}-{uuid.uuid4().hex}"
+        try:
+            path = default_storage.save(path, File(reader, name=path))
+        except UploadError as e:
+            default_storage.delete(path)
+            if e.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE and reader.limit < settings.CHUNKED_UPLOAD_MAX_PART_BYTES:
+                raise UploadError(f'Upload exceeds the limit of {upload_limit} bytes', e.status_code)
+            raise
+        except Exception:
+            default_storage.delete(path)
+            raise
+
+        if reader.bytes_read == 0 or (expected_sha256 and expected_sha256.lower() != reader.sha256):
+            default_storage.delete(path)
+            raise UploadError('Part is empty' if reader.bytes_read == 0 else 'Part checksum mismatch')
+
+        try:
+            with transaction.atomic():
+                # Parts of one upload are recorded one at a time, and not
+                # once the upload is being assembled
+                locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+                if locked.status != 'open':
+                    raise UploadError(f'Upload is {locked.status}', status.HTTP_409_CONFLICT)
+                received = ChunkedUploadService.received_size(locked, exclude_part=part_number)
+                if received + reader.bytes_read > upload_limit:
+                    raise UploadError(
+                        f'Upload exceeds the limit of {upload_limit} bytes', status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                    )
+
+                previous = UploadPart.objects.select_for_update().filter(
+                    session=locked, part_number=part_number
+                ).first()
+                part, _ = UploadPart.objects.update_or_create(
+                    session=locked,
+                    part_number=part_number,
+                    defaults={'size': reader.bytes_read, 'sha256': reader.sha256, 'file_path': path},
+                )
+                if previous is not None:
+                    transaction.on_commit(lambda: default_storage.delete(previous.file_path))
+        except IntegrityError:
+            default_storage.delete(path)
+            raise UploadError(f'Part {part_number} is being uploaded by another request', status.HTTP_409_CONFLICT)
+        except Exception:
+            default_storage.delete(path)
+            raise
+        return part
+
+    @staticmethod
+    def received_size(session, exclude_part=None):
+        """Bytes received so far for an upload, optionally leaving out one part."""
+        parts = session.parts.all()
+        if exclude_part is not None:
+            parts = parts.exclude(part_number=exclude_part)
+        return parts.aggregate(size=Sum('size'))['size'] or 0
+
+    @staticmethod
+    def size_limit(session):
+        """The most bytes an upload may hold: its declared size, capped by the setting."""
+        if session.total_size is not None:
+            return min(session.total_size, settings.CHUNKED_UPLOAD_MAX_BYTES)
+        return settings.CHUNKED_UPLOAD_MAX_BYTES
+
+    @staticmethod
+    def complete(session, expected_sha256=None):
+        """
+        Concatenate the parts into the final file, verify it and attach it
+        to the target. Returns the completed session.
+
+        The session is claimed (``assembling``) under its row lock, the parts
+        are joined with no transaction open, and the file is attached in a
+        second, short transaction. If assembling fails the session is
+        reopened so the client can retry.
+        """
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status != 'open':
+                raise UploadError(f'Upload is {session.status}', status.HTTP_409_CONFLICT)
+
+            parts = list(session.parts.order_by('part_number'))
+            if not parts:
+                raise UploadError('No parts uploaded')
+            missing = sorted(set(range(1, parts[-1].part_number + 1)) - {part.part_number for part in parts})
+            if missing:
+                raise UploadError(f"Missing parts: {', '.join(map(str, missing[:20]))}")
+            size = sum(part.size for part in parts)
+            if size > settings.CHUNKED_UPLOAD_MAX_BYTES:
+                raise UploadError(
+                    f'Upload exceeds the limit of {settings.CHUNKED_UPLOAD_MAX_BYTES} bytes',
+                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            if session.total_size is not None and size != session.total_size:
+                raise UploadError(f'Received {size} bytes, expected {session.total_size}')
+
+            session.status = 'assembling'
+            session.assembling_at = timezone.now()
+            session.save(update_fields=['status', 'assembling_at'])
+
+        app_label, model_name, field_name = UPLOAD_TARGETS[session.target_type]
+        if field_name is None:
+            field = apps.get_model(*UPLOAD_RECORDS[session.target_type])._meta.get_field('file')
+        else:
+            field = apps.get_model(app_label, model_name)._meta.get_field(field_name)
+
+        name = None
+        try:
+            source = ConcatenatedReader(default_storage, [part.file_path for part in parts])
+            # The parts may not have changed, but a file past the limit is never stored
+            reader = HashingReader(source, limit=size)
+            name = field.generate_filename(None, session.filename)
+            try:
+                name = field.storage.save(name, File(reader, name=name))
+            finally:
+                source.close()
+            if reader.bytes_read != size:
+                raise UploadError(f'Assembled {reader.bytes_read} bytes, expected {size}')
+            if expected_sha256 and expected_sha256.lower() != reader.sha256:
+                raise UploadError('Checksum mismatch')
+
+            with transaction.atomic():
+                session = UploadSession.objects.select_for_update().get(pk=session.pk)
+                if session.status != 'assembling':
+                    raise UploadError(f'Upload is {session.status}', status.HTTP_409_CONFLICT)
+                ChunkedUploadService.attach(session, name, reader.bytes_read, reader.sha256)
+
+                session.status = 'completed'
+                session.file_path = name
+                session.size = reader.bytes_read
+                session.sha256 = reader.sha256
+                session.completed_at = timezone.now()
+                session.save(update_fields=['status', 'file_path', 'size', 'sha256', 'completed_at'])
+
+                part_paths = [part.file_path for part in parts]
+                session.parts.all().delete()
+                transaction.on_commit(lambda: ChunkedUploadService.delete_files(part_paths))
+        except Exception:
+            if name is not None:
+                field.storage.delete(name)
+            UploadSession.objects.filter(pk=session.pk, status='assembling').update(status='open', assembling_at=None)
+            raise
+
+        logger.info(f"Upload {session.upload_id} completed: {name} ({session.size} bytes)")
+        return session
+
+    @staticmethod
+    def attach(session, name, size, sha256):
+        """Point the target's file field at the stored file (or create the record holding it)."""
+        app_label, model_name, field_name = UPLOAD_TARGETS[session.target_type]
+        if field_name is None:
+            record_model = apps.get_model(*UPLOAD_RECORDS[session.target_type])
+            return record_model.create_from_upload(session, name, size, sha256).pk
+
+        model = apps.get_model(app_label, model_name)
+        if not model.objects.filter(pk=session.target_id).update(**{field_name: name}):
+            raise UploadError('Target not found', status.HTTP_404_NOT_FOUND)
+        return session.target_id
+
+    @staticmethod
+    def abort(session, assembling_before=None):
+        """
+        Discard an open upload and its parts. With ``assembling_before``, an
+        upload that started assembling before then (e.g. by a worker that
+        died) is discarded too.
+        """
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            stale = (
+                session.status == 'assembling' and assembling_before is not None
+                and session.assembling_at is not None and session.assembling_at < assembling_before
+            )
+            if session.status != 'open' and not stale:
+                raise UploadError(f'Upload is {session.status}', status.HTTP_409_CONFLICT)
+            part_paths = list(session.parts.values_list('file_path', flat=True))
+            session.parts.all().delete()
+            session.status = 'aborted'
+            session.save(update_fields=['status'])
+            transaction.on_commit(lambda: ChunkedUploadService.delete_files(part_paths))
+
+    @staticmethod
+    def delete_files(paths):
+        for path in paths:
+            try:
+                default_storage.delete(path)
+            except Exception as e:
+                logger.warning(f"Could not delete upload part {path}: {e}")
+
+    @staticmethod
+    def purge_expired():
+        """
+        Abort uploads left open longer than ``CHUNKED_UPLOAD_EXPIRY_HOURS``
+        and uploads still assembling after
+        ``CHUNKED_UPLOAD_ASSEMBLY_TIMEOUT_MINUTES``. Returns the number of
+        sessions aborted.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+        assembling_before = now - timedelta(minutes=settings.CHUNKED_UPLOAD_ASSEMBLY_TIMEOUT_MINUTES)
+        expired = UploadSession.objects.filter(
+            Q(status='open', created_at__lt=cutoff) | Q(status='assembling', assembling_at__lt=assembling_before)
+        )
+        aborted = 0
+        for session in expired:
+            try:
+                ChunkedUploadService.abort(session, assembling_before=assembling_before)
+            except UploadError:
+                # Claimed or completed meanwhile
+                continue
+            aborted += 1
+        if aborted:
+            logger.info(f"Aborted {aborted} expired upload(s)")
+        return aborted
@@ -2,11 +2,26 @@
 URL configuration for the Common app.
 """
 from django.urls import path
-from .views import FileUploadView, SendEmailView, ExportDataView, health_check
+from .views import (
+    FileUploadView, SendEmailView, ExportDataView, health_check,
+    ChunkedUploadView, ChunkedUploadDetailView, ChunkedUploadPartView, ChunkedUploadCompleteView,
+)
 
 urlpatterns = [
     path('health/', health_check, name='health-check'),
     path('common/upload/', FileUploadView.as_view(), name='file-upload'),
+    path('common/uploads/', ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('common/uploads/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path(
+        'common/uploads/<uuid:upload_id>/parts/<int:part_number>/',
+        ChunkedUploadPartView.as_view(),
+        name='chunked-upload-part',
+    ),
+    path(
+        'common/uploads/<uuid:upload_id>/complete/',
+        ChunkedUploadCompleteView.as_view(),
+        name='chunked-upload-complete',
+    ),
     path('common/send-email/', SendEmailView.as_view(), name='send-email'),
     path('common/export/', ExportDataView.as_view(), name='export-data'),
 ]
@@ -1,6 +1,7 @@
 """
 Common utility views.
 """
+from django.conf import settings
 from django.db import connection
 from django.core.cache import cache
 from django.http import JsonResponse
@@ -11,7 +12,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 import json
 
+from .models import UploadSession
 from .services import FileUploadService, EmailService, SMSService, BackupService
+from .uploads import ChunkedUploadService, UploadError
 
 
 @require_http_methods(["GET"])
@@ -76,6 +79,119 @@ class FileUploadView(views.APIView):
             return Response({'error': str(e)}, status=500)
 
 
+def upload_session_data(session):
+    """Serialize an upload session with the parts received so far."""
+    parts = list(session.parts.values('part_number', 'size', 'sha256'))
+    return {
+        'upload_id': str(session.upload_id),
+        'filename': session.filename,
+        'status': session.status,
+        'target_type': session.target_type,
+        'target_id': session.target_id,
+        'total_size': session.total_size,
+        'received_size': sum(part['size'] for part in parts),
+        'parts': parts,
+        'max_part_size': settings.CHUNKED_UPLOAD_MAX_PART_BYTES,
+        'file_path': session.file_path,
+        'sha256': session.sha256,
+    }
+
+
+class ChunkedUploadView(views.APIView):
+    """
+    Start a resumable chunked upload.
+    
+    Expects ``filename``, ``target_type`` (lab_test, radiology_study,
+    patient_document or radiology_image), ``target_id`` and optionally ``total_size``,
+    ``content_type`` and ``title``. Parts are then sent to
+    ``uploads/<upload_id>/parts/<n>/`` and the upload finished with
+    ``uploads/<upload_id>/complete/``.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            session = ChunkedUploadService.start(
+                request.user,
+                filename=request.data.get('filename'),
+                target_type=request.data.get('target_type'),
+                target_id=request.data.get('target_id'),
+                content_type=request.data.get('content_type', ''),
+                total_size=request.data.get('total_size'),
+                title=request.data.get('title', ''),
+            )
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(upload_session_data(session), status=201)
+
+
+class ChunkedUploadDetailView(views.APIView):
+    """Status of an upload (to resume it) and aborting it."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, upload_id):
+        session = UploadSession.objects.filter(upload_id=upload_id, created_by=request.user).first()
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=404)
+        return Response(upload_session_data(session))
+    
+    def delete(self, request, upload_id):
+        try:
+            session = ChunkedUploadService.get_open_session(upload_id, request.user)
+            ChunkedUploadService.abort(session)
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(status=204)
+
+
+class ChunkedUploadPartView(views.APIView):
+    """
+    Receive one part of an upload.
+    
+    The part is the raw request body (``application/octet-stream``) or a
+    multipart ``file`` field. An ``X-Content-SHA256`` header, if given, is
+    checked against the received bytes.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def put(self, request, upload_id, part_number):
+        try:
+            session = ChunkedUploadService.get_open_session(upload_id, request.user)
+            if request.content_type.startswith('multipart/'):
+                stream = request.FILES.get('file')
+                if stream is None:
+                    return Response({'error': 'No file provided'}, status=400)
+            else:
+                # Read the body as it arrives instead of loading it into memory
+                stream = request._request
+            part = ChunkedUploadService.receive_part(
+                session, part_number, stream, request.headers.get('X-Content-SHA256')
+            )
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response({'part_number': part.part_number, 'size': part.size, 'sha256': part.sha256})
+
+
+class ChunkedUploadCompleteView(views.APIView):
+    """
+    Assemble the parts and attach the file to the upload's target.
+    Accepts an optional ``sha256`` of the whole file to verify.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, upload_id):
+        try:
+            session = ChunkedUploadService.get_open_session(upload_id, request.user)
+            session = ChunkedUploadService.complete(session, request.data.get('sha256'))
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(upload_session_data(session))
+
+
 class SendEmailView(views.APIView):
     """Send email (admin only)."""
     
@@ -0,0 +1,42 @@
+"""
+JWT authentication for websocket connections.
+
+Browsers cannot set an ``Authorization`` header on a websocket handshake,
+so clients pass their access token as a ``token`` query parameter. A valid
+token sets ``scope['user']``; otherwise the session user from
+``AuthMiddlewareStack`` (or an anonymous user) is kept.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+@database_sync_to_async
+def get_token_user(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class JWTAuthMiddleware:
+    """Authenticate a websocket scope from its ``token`` query parameter."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        tokens = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if tokens:
+            user = await get_token_user(tokens[0])
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await self.inner(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
@@ -2,7 +2,7 @@
 Admin configuration for the Consultation app.
 """
 from django.contrib import admin
-from .models import ConsultationRoom, ConsultationSession, ConsultationQueue, Referral
+from .models import ConsultationRoom, ConsultationSession, ConsultationQueue, SessionDurationStat, Referral
 
 
 @admin.register(ConsultationRoom)
@@ -26,6 +26,13 @@ class ConsultationQueueAdmin(admin.ModelAdmin):
     search_fields = ['patient__surname', 'patient__first_name', 'room__name']
 
 
+@admin.register(SessionDurationStat)
+class SessionDurationStatAdmin(admin.ModelAdmin):
+    list_display = ['room', 'doctor', 'sample_count', 'mean_seconds', 'updated_at']
+    list_filter = ['room']
+    readonly_fields = ['sample_count', 'mean_seconds', 'updated_at']
+
+
 @admin.register(Referral)
 class ReferralAdmin(admin.ModelAdmin):
     list_display = ['referral_id', 'patient', 'specialty', 'facility', 'urgency', 'status', 'referred_at']
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ConsultationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'consultation'
-
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        import consultation.signals  # noqa
@@ -0,0 +1,35 @@
+"""
+Websocket consumers for the Consultation app.
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import live_queue
+
+
+class RoomQueueConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams a consultation room's active queue: the current queue on
+    connect, then the whole queue again after every change.
+    """
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        self.group_name = live_queue.room_group(self.room_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        queue = await database_sync_to_async(live_queue.get_room_queue)(self.room_id)
+        await self.send_json({'type': 'queue.snapshot', 'room': self.room_id, 'queue': list(queue)})
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def queue_update(self, event):
+        await self.send_json(event)
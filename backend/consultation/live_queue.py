@@ -0,0 +1,182 @@
+"""
+Live consultation queues mirrored in Redis.
+
+Room screens and waiting-area displays read a room's active queue many
+times a minute. Each room's active entries are kept in a Redis sorted set
+scored by priority, then enqueue time, next to a hash of the serialized
+entries, so a read is two Redis round trips and no database query.
+``ConsultationQueue`` writes update the mirror once they commit (see
+``signals``) and push the room's new queue to the websocket subscribers of
+its group (see ``consumers``).
+
+A room's mirror is built from the database the first time it is read and
+again once ``CONSULTATION_QUEUE_REBUILD_SECONDS`` pass, so a missed update
+cannot linger. If Redis is unreachable, reads fall back to the database.
+"""
+import json
+import logging
+
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ConsultationQueue
+from .serializers import ConsultationQueueSerializer
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'consultation:queue:'
+ENTRY_ROOMS_KEY = f'{KEY_PREFIX}entry-rooms'
+# Seconds per priority level in a score; larger than any epoch timestamp,
+# so priority always orders first and enqueue time breaks ties
+PRIORITY_SPAN = 10 ** 10
+
+_client = None
+
+
+def get_client():
+    """The Redis connection of the queue mirror, created on first use."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.CONSULTATION_QUEUE_REDIS_URL, socket_timeout=1, socket_connect_timeout=1
+        )
+    return _client
+
+
+def room_group(room_id):
+    """The channel layer group of a room's queue subscribers."""
+    return f'consultation_queue_{room_id}'
+
+
+def _keys(room_id):
+    base = f'{KEY_PREFIX}{room_id}'
+    return f'{base}:order', f'{base}:entries', f'{base}:ready'
+
+
+def entry_score(entry):
+    return entry.priority * PRIORITY_SPAN + entry.queued_at.timestamp()
+
+
+def _payloads(entries):
+    data = ConsultationQueueSerializer(entries, many=True).data
+    return {entry.id: json.dumps(item, cls=DjangoJSONEncoder) for entry, item in zip(entries, data)}
+
+
+def load_active(room_id):
+    """A room's active entries from the database, in queue order."""
+    return list(
+        ConsultationQueue.objects.filter(room_id=room_id, is_active=True)
+        .select_related('room', 'patient', 'visit').order_by('priority', 'queued_at')
+    )
+
+
+def rebuild_room(room_id):
+    """Replace a room's mirror with its active entries. Returns the serialized queue."""
+    entries = load_active(room_id)
+    payloads = _payloads(entries)
+    order_key, entries_key, ready_key = _keys(room_id)
+    pipe = get_client().pipeline()
+    pipe.delete(order_key, entries_key)
+    if entries:
+        pipe.zadd(order_key, {entry.id: entry_score(entry) for entry in entries})
+        pipe.hset(entries_key, mapping=payloads)
+        pipe.hset(ENTRY_ROOMS_KEY, mapping={entry.id: room_id for entry in entries})
+    pipe.set(ready_key, 1, ex=settings.CONSULTATION_QUEUE_REBUILD_SECONDS)
+    pipe.execute()
+    return [json.loads(payloads[entry.id]) for entry in entries]
+
+
+def clear_room(room_id):
+    """Drop a room's mirror; the next read rebuilds it."""
+    try:
+        get_client().delete(*_keys(room_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not clear consultation queue mirror of room {room_id}: {e}")
+
+
+def get_room_queue(room_id, build=True):
+    """
+    A room's active queue as serialized entries, in order. When the room is
+    not mirrored yet it is built, or ``None`` is returned if ``build`` is
+    false.
+    """
+    order_key, entries_key, ready_key = _keys(room_id)
+    try:
+        client = get_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(ready_key)
+        pipe.zrange(order_key, 0, -1)
+        ready, members = pipe.execute()
+        if not ready:
+            return rebuild_room(room_id) if build else None
+        payloads = client.hmget(entries_key, members) if members else []
+        if any(payload is None for payload in payloads):
+            # Read between a score update and its payload; build afresh
+            return rebuild_room(room_id)
+        return [json.loads(payload) for payload in payloads]
+    except redis.RedisError as e:
+        logger.warning(f"Consultation queue mirror unavailable, reading room {room_id} from the database: {e}")
+        if not build:
+            return None
+        entries = load_active(room_id)
+        return ConsultationQueueSerializer(entries, many=True).data
+
+
+def publish(room_id, queue):
+    """Push a room's queue to its websocket subscribers."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            room_group(room_id), {'type': 'queue.update', 'room': room_id, 'queue': list(queue)}
+        )
+    except (redis.RedisError, OSError) as e:
+        logger.warning(f"Could not push consultation queue of room {room_id}: {e}")
+
+
+def sync_entry(entry_id, room_id):
+    """
+    Bring the mirror in line with a queue entry after it was saved or
+    deleted, then push the queues of the rooms it touched.
+    """
+    entry = ConsultationQueue.objects.select_related('room', 'patient', 'visit').filter(pk=entry_id).first()
+    try:
+        client = get_client()
+        previous = client.hget(ENTRY_ROOMS_KEY, entry_id)
+        rooms = {room_id}
+        if previous is not None:
+            rooms.add(int(previous))
+        if entry is not None:
+            rooms.add(entry.room_id)
+
+        pipe = client.pipeline()
+        for touched in rooms:
+            order_key, entries_key, _ = _keys(touched)
+            pipe.zrem(order_key, entry_id)
+            pipe.hdel(entries_key, entry_id)
+        pipe.hdel(ENTRY_ROOMS_KEY, entry_id)
+        if entry is not None and entry.is_active:
+            order_key, entries_key, _ = _keys(entry.room_id)
+            pipe.hset(entries_key, entry_id, _payloads([entry])[entry_id])
+            pipe.zadd(order_key, {entry_id: entry_score(entry)})
+            pipe.hset(ENTRY_ROOMS_KEY, entry_id, entry.room_id)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not update consultation queue mirror for entry {entry_id}: {e}")
+        return
+    refresh_rooms(rooms, rebuild=False)
+
+
+def refresh_rooms(room_ids, rebuild=True):
+    """Rebuild (or just re-read) rooms' mirrors and push their queues."""
+    for room_id in room_ids:
+        try:
+            queue = rebuild_room(room_id) if rebuild else get_room_queue(room_id)
+        except redis.RedisError as e:
+            logger.warning(f"Could not rebuild consultation queue mirror of room {room_id}: {e}")
+            continue
+        publish(room_id, queue)
@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the Redis mirror of consultation queues.
+Reloads every active room's queue from the database and pushes it to the
+room's websocket subscribers, e.g. after Redis lost its data.
+Run with: python manage.py rebuild_consultation_queues
+"""
+import redis
+from django.core.management.base import BaseCommand, CommandError
+from consultation import live_queue
+from consultation.models import ConsultationRoom
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis mirror of active consultation queues'
+
+    def handle(self, *args, **options):
+        room_ids = list(ConsultationRoom.objects.filter(is_active=True).values_list('id', flat=True))
+        try:
+            live_queue.get_client().ping()
+        except redis.RedisError as e:
+            raise CommandError(f'Consultation queue Redis is unavailable: {e}')
+        live_queue.refresh_rooms(room_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the queues of {len(room_ids)} room(s)'))
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+
+def seed_duration_stats(apps, schema_editor):
+    """Start the rolling means from the plain means of past completed sessions."""
+    ConsultationSession = apps.get_model('consultation', 'ConsultationSession')
+    SessionDurationStat = apps.get_model('consultation', 'SessionDurationStat')
+    duration = models.ExpressionWrapper(models.F('ended_at') - models.F('started_at'), output_field=models.DurationField())
+    sessions = ConsultationSession.objects.filter(
+        status='completed',
+        ended_at__gt=models.F('started_at'),
+        ended_at__lte=models.F('started_at') + timedelta(minutes=settings.CONSULTATION_DURATION_MAX_MINUTES),
+    )
+
+    stats = []
+    for group, fields in (('room', ['room_id']), ('doctor', ['doctor_id']), ('room_doctor', ['room_id', 'doctor_id'])):
+        rows = sessions
+        if group != 'room':
+            rows = rows.filter(doctor__isnull=False)
+        for row in rows.values(*fields).annotate(count=models.Count('id'), mean=models.Avg(duration)).order_by():
+            stats.append(SessionDurationStat(
+                room_id=row.get('room_id'),
+                doctor_id=row.get('doctor_id'),
+                sample_count=row['count'],
+                mean_seconds=row['mean'].total_seconds(),
+            ))
+    SessionDurationStat.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('consultation', '0003_add_clinic_to_consultation_room'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionDurationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('mean_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='consultation_duration_stats', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='duration_stats', to='consultation.consultationroom')),
+            ],
+            options={
+                'db_table': 'consultation_duration_stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sessiondurationstat',
+            constraint=models.UniqueConstraint(fields=('room', 'doctor'), name='consultation_duration_room_doctor_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessiondurationstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('doctor__isnull', True)), fields=('room',), name='consultation_duration_room_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessiondurationstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('room__isnull', True)), fields=('doctor',), name='consultation_duration_doctor_uniq'),
+        ),
+        migrations.RunPython(seed_duration_stats, migrations.RunPython.noop),
+    ]
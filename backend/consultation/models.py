@@ -140,6 +140,35 @@ class ConsultationQueue(models.Model):
         return f"{self.room.name} - {self.patient.get_full_name()}"
 
 
+class SessionDurationStat(models.Model):
+    """
+    Rolling consultation length for a room, a doctor, or a doctor in a room
+    (exactly one of ``room``/``doctor`` is empty for the first two). Updated
+    as each session ends; see ``consultation.wait_times``.
+    """
+
+    room = models.ForeignKey(ConsultationRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='duration_stats')
+    doctor = models.ForeignKey('accounts.User', on_delete=models.CASCADE, null=True, blank=True, related_name='consultation_duration_stats')
+    sample_count = models.PositiveIntegerField(default=0)
+    mean_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'consultation_duration_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'doctor'], name='consultation_duration_room_doctor_uniq'),
+            models.UniqueConstraint(
+                fields=['room'], condition=models.Q(doctor__isnull=True), name='consultation_duration_room_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['doctor'], condition=models.Q(room__isnull=True), name='consultation_duration_doctor_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.room or 'Any room'} / {self.doctor or 'Any doctor'}: {self.mean_seconds / 60:.1f} min"
+
+
 class Referral(models.Model):
     """
     Patient referrals to other specialties or facilities.
@@ -0,0 +1,10 @@
+"""
+Websocket routes for the Consultation app.
+"""
+from django.urls import path
+
+from .consumers import RoomQueueConsumer
+
+websocket_urlpatterns = [
+    path('ws/consultation/rooms/<int:room_id>/queue/', RoomQueueConsumer.as_asgi()),
+]
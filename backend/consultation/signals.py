@@ -0,0 +1,40 @@
+"""
+Signals keeping the Redis mirror of consultation queues in sync.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from patients.models import Patient
+from .models import ConsultationRoom, ConsultationQueue
+from . import live_queue
+
+
+@receiver(post_save, sender=ConsultationQueue)
+@receiver(post_delete, sender=ConsultationQueue)
+def sync_live_queue(sender, instance, **kwargs):
+    """Mirror a queue entry change and push its room's queue once it commits."""
+    transaction.on_commit(partial(live_queue.sync_entry, instance.pk, instance.room_id))
+
+
+@receiver(post_save, sender=ConsultationRoom)
+def refresh_room_queue(sender, instance, created, **kwargs):
+    """Entries carry the room name; rebuild a renamed room's queue, or drop a deactivated one."""
+    if not instance.is_active:
+        transaction.on_commit(partial(live_queue.clear_room, instance.pk))
+    elif not created:
+        transaction.on_commit(partial(live_queue.refresh_rooms, [instance.pk]))
+
+
+@receiver(post_save, sender=Patient)
+def refresh_patient_queues(sender, instance, created, **kwargs):
+    """Entries carry the patient name; rebuild the queues a patient waits in."""
+    if created:
+        return
+    room_ids = set(
+        ConsultationQueue.objects.filter(patient=instance, is_active=True).values_list('room_id', flat=True)
+    )
+    if room_ids:
+        transaction.on_commit(partial(live_queue.refresh_rooms, room_ids))
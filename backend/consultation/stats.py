@@ -0,0 +1,184 @@
+"""
+Consultation statistics for the dashboard.
+
+Every figure comes from a grouped query rather than one query per day,
+clinic or session: a single conditional aggregate covers today, the week,
+the month and the requested range (durations averaged in the database),
+``TruncDate`` buckets the per-day counts and one ``GROUP BY room__clinic``
+gives the clinic breakdown. Results are cached briefly per doctor filter
+and range, since every dashboard polls them.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from laboratory.models import LabOrder
+from nursing.models import NursingOrder
+from pharmacy.models import Prescription
+from .models import ConsultationSession, ConsultationQueue, Referral
+
+CACHE_KEY_PREFIX = 'consultation:stats:'
+RECENT_SESSIONS = 5
+# Longest date range a stats request may cover
+MAX_RANGE_DAYS = 366
+
+SESSION_DURATION = ExpressionWrapper(F('ended_at') - F('started_at'), output_field=DurationField())
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()), timezone.get_current_timezone())
+
+
+def _minutes(duration):
+    return round(duration.total_seconds() / 60, 1) if duration else 0
+
+
+def _window_stats(aggregates, name):
+    return {
+        'sessions': aggregates[f'{name}_sessions'],
+        'patients': aggregates[f'{name}_patients'],
+    }
+
+
+def _time_ago(dt, now):
+    if not dt:
+        return 'Unknown'
+    diff = now - dt
+    if diff.days > 0:
+        return f'{diff.days} day{"s" if diff.days > 1 else ""} ago'
+    hours = diff.seconds // 3600
+    if hours > 0:
+        return f'{hours} hour{"s" if hours > 1 else ""} ago'
+    minutes = diff.seconds // 60
+    return f'{minutes} min{"s" if minutes > 1 else ""} ago'
+
+
+def compute_stats(doctor_id=None, date_from=None, date_to=None, now=None):
+    """
+    Consultation statistics for today, the last week, the current month and
+    ``date_from`` through ``date_to`` (by default the month to date), for
+    one doctor or everyone.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    today_start = _start_of(today)
+    week_start = today_start - timedelta(days=7)
+    month_start = _start_of(today.replace(day=1))
+    date_from = date_from or today.replace(day=1)
+    date_to = date_to or today
+    range_start, range_end = _start_of(date_from), _start_of(date_to + timedelta(days=1))
+
+    sessions = ConsultationSession.objects.all()
+    if doctor_id:
+        sessions = sessions.filter(doctor_id=doctor_id)
+
+    windows = {
+        'today': Q(started_at__gte=today_start),
+        'week': Q(started_at__gte=week_start),
+        'month': Q(started_at__gte=month_start),
+        'range': Q(started_at__gte=range_start, started_at__lt=range_end),
+    }
+    completed = Q(status='completed', ended_at__isnull=False)
+    aggregates = {}
+    for name, window in windows.items():
+        aggregates[f'{name}_sessions'] = Count('id', filter=window)
+        aggregates[f'{name}_patients'] = Count('patient', filter=window, distinct=True)
+    aggregates.update(
+        today_active=Count('id', filter=windows['today'] & Q(status='active')),
+        today_completed=Count('id', filter=windows['today'] & Q(status='completed')),
+        range_completed=Count('id', filter=windows['range'] & Q(status='completed')),
+        today_avg_duration=Avg(SESSION_DURATION, filter=windows['today'] & completed),
+        range_avg_duration=Avg(SESSION_DURATION, filter=windows['range'] & completed),
+    )
+    totals = sessions.filter(windows['week'] | windows['month'] | windows['range']).aggregate(**aggregates)
+
+    # Orders placed in the visits of today's and this month's sessions
+    month_visits = sessions.filter(windows['month'], visit__isnull=False).values('visit_id')
+    today_visits = sessions.filter(windows['today'], visit__isnull=False).values('visit_id')
+    prescriptions = Prescription.objects.filter(visit_id__in=month_visits).aggregate(
+        month=Count('id'), today=Count('id', filter=Q(visit_id__in=today_visits))
+    )
+    lab_orders = LabOrder.objects.filter(visit_id__in=month_visits).aggregate(
+        month=Count('id'), today=Count('id', filter=Q(visit_id__in=today_visits))
+    )
+    nursing_orders = NursingOrder.objects.filter(visit_id__in=today_visits).count()
+
+    # Sessions per day, for the week chart (the seven days before today) and the range
+    daily = dict(
+        sessions.filter(Q(started_at__gte=week_start, started_at__lt=today_start) | windows['range'])
+        .annotate(day=TruncDate('started_at')).values('day').annotate(count=Count('id'))
+        .order_by().values_list('day', 'count')
+    )
+    week_by_day = []
+    for offset in range(7):
+        day = week_start.date() + timedelta(days=offset)
+        week_by_day.append({'day': day.strftime('%a'), 'count': daily.get(day, 0)})
+    range_by_day = []
+    day = date_from
+    while day <= date_to:
+        range_by_day.append({'date': day.isoformat(), 'count': daily.get(day, 0)})
+        day += timedelta(days=1)
+
+    clinic_breakdown = [
+        {'clinic': row['room__clinic__name'], 'count': row['count']}
+        for row in sessions.filter(windows['range'], room__is_active=True, room__clinic__is_active=True)
+        .values('room__clinic__name').annotate(count=Count('id')).order_by('room__clinic__name')
+    ]
+
+    recent_sessions = []
+    for session in sessions.filter(status='completed').select_related('patient').order_by('-ended_at')[:RECENT_SESSIONS]:
+        duration = (session.ended_at - session.started_at).total_seconds() / 60 if session.ended_at else 0
+        recent_sessions.append({
+            'id': session.id,
+            'patient': session.patient.get_full_name(),
+            'diagnosis': session.assessment or 'N/A',
+            'duration': int(round(duration)),
+            'time': _time_ago(session.ended_at or session.started_at, now),
+        })
+
+    today_stats = {
+        **_window_stats(totals, 'today'),
+        'active': totals['today_active'],
+        'completed': totals['today_completed'],
+        'avg_duration': _minutes(totals['today_avg_duration']),
+        'prescriptions': prescriptions['today'],
+        'lab_orders': lab_orders['today'],
+        'nursing_orders': nursing_orders,
+    }
+    return {
+        'today': today_stats,
+        'week': {**_window_stats(totals, 'week'), 'by_day': week_by_day},
+        'month': {
+            **_window_stats(totals, 'month'),
+            'prescriptions': prescriptions['month'],
+            'lab_orders': lab_orders['month'],
+        },
+        'range': {
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            **_window_stats(totals, 'range'),
+            'completed': totals['range_completed'],
+            'avg_duration': _minutes(totals['range_avg_duration']),
+            'by_day': range_by_day,
+        },
+        'clinic_breakdown': clinic_breakdown,
+        'recent_sessions': recent_sessions,
+        'queue_count': ConsultationQueue.objects.filter(is_active=True).count(),
+        'pending_referrals': Referral.objects.filter(status__in=['draft', 'sent']).count(),
+        'active_sessions': today_stats['active'],
+        'completed_today': today_stats['completed'],
+    }
+
+
+def get_stats(doctor_id=None, date_from=None, date_to=None):
+    """``compute_stats``, cached for ``CONSULTATION_STATS_CACHE_SECONDS``."""
+    key = f"{CACHE_KEY_PREFIX}{doctor_id or 'all'}:{date_from or ''}:{date_to or ''}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(doctor_id, date_from, date_to)
+        cache.set(key, stats, settings.CONSULTATION_STATS_CACHE_SECONDS)
+    return stats
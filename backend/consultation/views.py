@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from .models import ConsultationRoom, ConsultationSession, ConsultationQueue, Referral
 from .serializers import (
@@ -17,6 +18,9 @@ from .serializers import (
     ReferralSerializer,
 )
 from audit.services import AuditService
+from . import live_queue
+from . import stats as consultation_stats
+from . import wait_times as consultation_wait_times
 
 
 class ConsultationRoomViewSet(viewsets.ModelViewSet):
@@ -35,11 +39,12 @@ class ConsultationRoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def queue(self, request, pk=None):
-        """Get queue for a room."""
-        room = self.get_object()
-        queue_items = room.queue_items.filter(is_active=True).order_by('priority', 'queued_at')
-        serializer = ConsultationQueueSerializer(queue_items, many=True)
-        return Response(serializer.data)
+        """Get queue for a room, from the live queue mirror."""
+        queue = live_queue.get_room_queue(int(pk), build=False) if str(pk).isdigit() else None
+        if queue is None:
+            room = self.get_object()
+            queue = live_queue.get_room_queue(room.id)
+        return Response(queue)
 
 
 class ConsultationSessionViewSet(viewsets.ModelViewSet):
@@ -73,12 +78,20 @@ class ConsultationSessionViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def end(self, request, pk=None):
-        """End a consultation session and log audit."""
+        """End an active consultation session and log audit."""
         session = self.get_object()
         old_status = session.status
+        ended_at = timezone.now()
+        # Conditional, so concurrent ends record the session's length once
+        ended = ConsultationSession.objects.filter(pk=session.pk, status='active').update(
+            status='completed', ended_at=ended_at
+        )
+        if not ended:
+            session.refresh_from_db(fields=['status'])
+            return Response({'error': f'Session is {session.status}'}, status=status.HTTP_409_CONFLICT)
         session.status = 'completed'
-        session.ended_at = timezone.now()
-        session.save()
+        session.ended_at = ended_at
+        consultation_wait_times.record_session(session)
         AuditService.log_activity(
             user=self.request.user,
             action='update',
@@ -95,147 +108,37 @@ class ConsultationSessionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get consultation statistics for dashboard."""
-        from django.db.models import Count, Q, Avg, Sum
-        from datetime import timedelta
-        from django.utils import timezone as tz
-        
-        now = tz.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=7)
-        month_start = today_start.replace(day=1)
-        
-        # Get current user's sessions if filtering by doctor
-        doctor_id = request.query_params.get('doctor', None)
-        if doctor_id:
-            sessions_qs = ConsultationSession.objects.filter(doctor_id=doctor_id)
-        else:
-            sessions_qs = ConsultationSession.objects.all()
-        
-        # Today's stats
-        today_sessions = sessions_qs.filter(started_at__gte=today_start)
-        today_stats = {
-            'sessions': today_sessions.count(),
-            'active': today_sessions.filter(status='active').count(),
-            'completed': today_sessions.filter(status='completed').count(),
-            'patients': today_sessions.values('patient').distinct().count(),
-        }
-        
-        # Calculate average duration for today's completed sessions
-        completed_today = today_sessions.filter(status='completed', ended_at__isnull=False)
-        avg_duration = 0
-        if completed_today.exists():
-            durations = []
-            for session in completed_today:
-                if session.ended_at and session.started_at:
-                    duration = (session.ended_at - session.started_at).total_seconds() / 60
-                    durations.append(duration)
-            if durations:
-                avg_duration = sum(durations) / len(durations)
-        
-        today_stats['avg_duration'] = round(avg_duration, 1)
-        
-        # Get prescriptions, lab orders, nursing orders count for today
-        from pharmacy.models import Prescription
-        from laboratory.models import LabOrder
-        from nursing.models import NursingOrder
-        
-        today_visits = set(today_sessions.values_list('visit_id', flat=True).exclude(visit__isnull=True))
-        today_stats['prescriptions'] = Prescription.objects.filter(visit_id__in=today_visits).count() if today_visits else 0
-        today_stats['lab_orders'] = LabOrder.objects.filter(visit_id__in=today_visits).count() if today_visits else 0
-        today_stats['nursing_orders'] = NursingOrder.objects.filter(visit_id__in=today_visits).count() if today_visits else 0
-        
-        # Week stats
-        week_sessions = sessions_qs.filter(started_at__gte=week_start)
-        week_stats = {
-            'sessions': week_sessions.count(),
-            'patients': week_sessions.values('patient').distinct().count(),
-        }
-        
-        # Week by day
-        week_by_day = []
-        for i in range(7):
-            day_start = week_start + timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            day_sessions = week_sessions.filter(started_at__gte=day_start, started_at__lt=day_end)
-            week_by_day.append({
-                'day': day_start.strftime('%a'),
-                'count': day_sessions.count(),
-            })
+        """
+        Get consultation statistics for dashboard.
         
-        # Month stats
-        month_sessions = sessions_qs.filter(started_at__gte=month_start)
-        month_visits = set(month_sessions.values_list('visit_id', flat=True).exclude(visit__isnull=True))
-        month_stats = {
-            'sessions': month_sessions.count(),
-            'patients': month_sessions.values('patient').distinct().count(),
-            'prescriptions': Prescription.objects.filter(visit_id__in=month_visits).count() if month_visits else 0,
-            'lab_orders': LabOrder.objects.filter(visit_id__in=month_visits).count() if month_visits else 0,
-        }
+        Query params: ``doctor``, and ``date_from``/``date_to`` (YYYY-MM-DD,
+        by default the month to date) for the ``range`` figures and the
+        clinic breakdown.
+        """
+        params = request.query_params
+        doctor_id = params.get('doctor') or None
+        if doctor_id and not doctor_id.isdigit():
+            return Response({'error': 'doctor must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Clinic breakdown (by room clinic ForeignKey)
-        from organization.models import Clinic
-        clinic_breakdown = []
-        for clinic in Clinic.objects.filter(is_active=True):
-            clinic_rooms = ConsultationRoom.objects.filter(clinic=clinic, is_active=True)
-            clinic_sessions = month_sessions.filter(room__in=clinic_rooms)
-            if clinic_sessions.exists():
-                clinic_breakdown.append({
-                    'clinic': clinic.name,
-                    'count': clinic_sessions.count(),
-                })
+        try:
+            date_from = parse_date(params['date_from']) if params.get('date_from') else None
+            date_to = parse_date(params['date_to']) if params.get('date_to') else None
+        except ValueError:
+            date_from = date_to = None
+        if (params.get('date_from') and date_from is None) or (params.get('date_to') and date_to is None):
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        range_from = date_from or today.replace(day=1)
+        range_to = date_to or today
+        if range_to < range_from:
+            return Response({'error': 'date_to must not be before date_from'}, status=status.HTTP_400_BAD_REQUEST)
+        if (range_to - range_from).days >= consultation_stats.MAX_RANGE_DAYS:
+            return Response(
+                {'error': f'The date range may cover at most {consultation_stats.MAX_RANGE_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         
-        # Recent sessions (last 5)
-        recent_sessions = sessions_qs.filter(status='completed').order_by('-ended_at')[:5]
-        recent_sessions_data = []
-        for session in recent_sessions:
-            duration = 0
-            if session.ended_at and session.started_at:
-                duration = round((session.ended_at - session.started_at).total_seconds() / 60, 0)
-            
-            # Calculate time ago
-            dt = session.ended_at or session.started_at
-            time_ago = 'Unknown'
-            if dt:
-                diff = timezone.now() - dt
-                if diff.days > 0:
-                    time_ago = f'{diff.days} day{"s" if diff.days > 1 else ""} ago'
-                else:
-                    hours = diff.seconds // 3600
-                    if hours > 0:
-                        time_ago = f'{hours} hour{"s" if hours > 1 else ""} ago'
-                    else:
-                        minutes = diff.seconds // 60
-                        time_ago = f'{minutes} min{"s" if minutes > 1 else ""} ago'
-            
-            recent_sessions_data.append({
-                'id': session.id,
-                'patient': session.patient.get_full_name(),
-                'diagnosis': session.assessment or 'N/A',
-                'duration': int(duration),
-                'time': time_ago,
-            })
-        
-        # Queue stats
-        queue_count = ConsultationQueue.objects.filter(is_active=True).count()
-        
-        # Referrals stats
-        pending_referrals = Referral.objects.filter(status__in=['draft', 'sent']).count()
-        
-        return Response({
-            'today': today_stats,
-            'week': {
-                **week_stats,
-                'by_day': week_by_day,
-            },
-            'month': month_stats,
-            'clinic_breakdown': clinic_breakdown,
-            'recent_sessions': recent_sessions_data,
-            'queue_count': queue_count,
-            'pending_referrals': pending_referrals,
-            'active_sessions': today_stats['active'],
-            'completed_today': today_stats['completed'],
-        })
+        return Response(consultation_stats.get_stats(doctor_id, date_from, date_to))
 
 
 class ConsultationQueueViewSet(viewsets.ModelViewSet):
@@ -248,9 +151,46 @@ class ConsultationQueueViewSet(viewsets.ModelViewSet):
     ordering_fields = ['priority', 'queued_at']
     ordering = ['priority', 'queued_at']
     
+    # Query parameters a room's active queue can be listed with from the live queue mirror
+    LIVE_LIST_PARAMS = {'room', 'is_active', 'page', 'page_size'}
+    
     def get_queryset(self):
         return ConsultationQueue.objects.all().select_related('room', 'patient', 'visit')
     
+    def list(self, request, *args, **kwargs):
+        """List queue entries; a room's active queue is read from the live queue mirror."""
+        params = request.query_params
+        if (
+            set(params) <= self.LIVE_LIST_PARAMS
+            and params.get('room', '').isdigit()
+            and params.get('is_active', '').lower() in ('true', '1')
+        ):
+            room_id = int(params['room'])
+            queue = live_queue.get_room_queue(room_id, build=False)
+            if queue is None and ConsultationRoom.objects.filter(pk=room_id).exists():
+                queue = live_queue.get_room_queue(room_id)
+            if queue is not None:
+                page = self.paginate_queryset(queue)
+                if page is not None:
+                    return self.get_paginated_response(page)
+                return Response(queue)
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'], url_path='wait-times')
+    def wait_times(self, request):
+        """
+        Estimated wait of every queued patient, grouped by room in queue
+        order. Query params: ``room`` to estimate a single room.
+        """
+        room_id = request.query_params.get('room')
+        if room_id and not room_id.isdigit():
+            return Response({'error': 'room must be a room id'}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        return Response({
+            'generated_at': now,
+            'rooms': consultation_wait_times.estimate_waits(int(room_id) if room_id else None, now=now),
+        })
+    
     @action(detail=True, methods=['post'])
     def call(self, request, pk=None):
         """Call a patient from the queue."""
@@ -0,0 +1,139 @@
+"""
+Queue wait estimates from historical consultation lengths.
+
+Each finished session updates rolling mean lengths (``SessionDurationStat``)
+for its room, its doctor and the doctor in that room, so estimating never
+rescans past sessions. The mean is cumulative for the first sessions, then
+exponentially weighted by ``CONSULTATION_DURATION_SMOOTHING`` so it follows
+recent practice.
+
+A room's wait is simulated over its ``capacity`` consultation slots: slots
+busy with an active session free up once that session has run the mean
+length, and each queued patient, in queue order, takes the slot that frees
+first. Estimating every queue takes three queries.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ConsultationQueue, ConsultationSession, SessionDurationStat
+
+
+def rolling_mean(mean, count, value):
+    """The mean after adding ``value`` to ``count`` earlier samples."""
+    weight = max(settings.CONSULTATION_DURATION_SMOOTHING, 1 / (count + 1))
+    return mean + weight * (value - mean)
+
+
+def record_session(session):
+    """Fold a completed session's length into the room, doctor and room/doctor means."""
+    if session.status != 'completed' or not session.ended_at or not session.started_at:
+        return
+    seconds = (session.ended_at - session.started_at).total_seconds()
+    if seconds <= 0 or seconds > settings.CONSULTATION_DURATION_MAX_MINUTES * 60:
+        # Sessions left open long after the patient left would skew the mean
+        return
+
+    scopes = [(session.room_id, None)]
+    if session.doctor_id:
+        scopes += [(None, session.doctor_id), (session.room_id, session.doctor_id)]
+    with transaction.atomic():
+        for room_id, doctor_id in scopes:
+            stat, created = SessionDurationStat.objects.select_for_update().get_or_create(
+                room_id=room_id, doctor_id=doctor_id, defaults={'sample_count': 1, 'mean_seconds': seconds}
+            )
+            if not created:
+                stat.mean_seconds = rolling_mean(stat.mean_seconds, stat.sample_count, seconds)
+                stat.sample_count += 1
+                stat.save(update_fields=['mean_seconds', 'sample_count', 'updated_at'])
+
+
+def expected_length(stats, room_id, doctor_id):
+    """
+    ``(seconds, basis)`` of the consultation length expected in a room: the
+    most specific mean with enough samples, else the best sampled one, else
+    the configured default.
+    """
+    candidates = []
+    if doctor_id:
+        candidates += [('room_doctor', (room_id, doctor_id)), ('doctor', (None, doctor_id))]
+    candidates.append(('room', (room_id, None)))
+    sampled = [(basis, stats[key]) for basis, key in candidates if key in stats and stats[key].sample_count]
+    for basis, stat in sampled:
+        if stat.sample_count >= settings.CONSULTATION_DURATION_MIN_SAMPLES:
+            return stat.mean_seconds, basis
+    if sampled:
+        basis, stat = max(sampled, key=lambda item: item[1].sample_count)
+        return stat.mean_seconds, basis
+    return settings.CONSULTATION_DEFAULT_DURATION_MINUTES * 60.0, 'default'
+
+
+def estimate_waits(room_id=None, now=None):
+    """
+    Estimated waits of every active queue entry (or those of one room),
+    grouped by room in queue order.
+    """
+    now = now or timezone.now()
+    entries = (
+        ConsultationQueue.objects.filter(is_active=True, room__is_active=True)
+        .select_related('room', 'patient').order_by('room__room_number', 'priority', 'queued_at')
+    )
+    if room_id is not None:
+        entries = entries.filter(room_id=room_id)
+    queues = {}
+    for entry in entries:
+        queues.setdefault(entry.room_id, []).append(entry)
+    if not queues:
+        return []
+
+    in_progress = {}
+    for session_room_id, doctor_id, started_at in (
+        ConsultationSession.objects.filter(room_id__in=list(queues), status='active')
+        .order_by('started_at').values_list('room_id', 'doctor_id', 'started_at')
+    ):
+        in_progress.setdefault(session_room_id, []).append((doctor_id, started_at))
+    doctor_ids = {doctor_id for sessions in in_progress.values() for doctor_id, _ in sessions if doctor_id}
+    stats = {
+        (stat.room_id, stat.doctor_id): stat
+        for stat in SessionDurationStat.objects.filter(Q(room_id__in=list(queues)) | Q(doctor_id__in=doctor_ids))
+    }
+
+    results = []
+    for queue_room_id, queue in queues.items():
+        room = queue[0].room
+        sessions = in_progress.get(queue_room_id, [])
+        # The latest session's doctor is taken to be the one seeing the queue
+        doctor_id = sessions[-1][0] if sessions else None
+        length, basis = expected_length(stats, queue_room_id, doctor_id)
+
+        capacity = max(room.capacity, 1)
+        free_at = [max(length - (now - started_at).total_seconds(), 0.0) for _, started_at in sessions[-capacity:]]
+        free_at += [0.0] * (capacity - len(free_at))
+        heapq.heapify(free_at)
+
+        estimates = []
+        for position, entry in enumerate(queue, start=1):
+            wait = heapq.heappop(free_at)
+            heapq.heappush(free_at, wait + length)
+            estimates.append({
+                'id': entry.id,
+                'patient': entry.patient_id,
+                'patient_name': entry.patient.get_full_name(),
+                'priority': entry.priority,
+                'position': position,
+                'estimated_wait_minutes': round(wait / 60),
+                'estimated_start': now + timedelta(seconds=wait),
+            })
+        results.append({
+            'room': queue_room_id,
+            'room_name': room.name,
+            'doctor': doctor_id,
+            'expected_minutes': round(length / 60, 1),
+            'basis': basis,
+            'entries': estimates,
+        })
+    return results
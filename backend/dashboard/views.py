@@ -6,7 +6,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models import Count, Q
+from django.db.models import Avg, Count, Q
 
 from patients.models import Patient, Visit
 from laboratory.models import LabOrder, LabTest
@@ -26,6 +26,16 @@ class DashboardStatsView(views.APIView):
         start_of_day = timezone.make_aware(datetime.combine(today, datetime.min.time()))
         end_of_day = timezone.make_aware(datetime.combine(today, datetime.max.time()))
         
+        radiology_studies = RadiologyStudy.objects.aggregate(
+            awaiting_report=Count('id', filter=Q(status__in=['acquired', 'processing'])),
+            pending_verification=Count('id', filter=Q(status='reported')),
+            completed_today=Count('id', filter=Q(verified_at__date=today, status='verified')),
+            avg_report_seconds_today=Avg(
+                'acquire_to_report_seconds', filter=Q(reported_at__gte=start_of_day, reported_at__lte=end_of_day)
+            ),
+        )
+        avg_report_seconds = radiology_studies['avg_report_seconds_today']
+        
         stats = {
             'patients': {
                 'total': Patient.objects.filter(is_active=True).count(),
@@ -62,11 +72,10 @@ class DashboardStatsView(views.APIView):
                 'pending_orders': RadiologyOrder.objects.filter(
                     studies__status__in=['pending', 'scheduled']
                 ).distinct().count(),
-                'pending_verification': RadiologyStudy.objects.filter(status='reported').count(),
-                'completed_today': RadiologyStudy.objects.filter(
-                    verified_at__date=today,
-                    status='verified'
-                ).count(),
+                'awaiting_report': radiology_studies['awaiting_report'],
+                'pending_verification': radiology_studies['pending_verification'],
+                'completed_today': radiology_studies['completed_today'],
+                'avg_report_minutes_today': round(avg_report_seconds / 60, 1) if avg_report_seconds is not None else None,
             },
             'consultation': {
                 'active_sessions': ConsultationSession.objects.filter(status='active').count(),
@@ -11,18 +11,20 @@ import os
 
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emr_backend.settings')
 
 # Initialize Django ASGI application early
 django_asgi_app = get_asgi_application()
 
+from common.websocket_auth import JWTAuthMiddlewareStack  # noqa: E402
+from consultation.routing import websocket_urlpatterns as consultation_websocket_urlpatterns  # noqa: E402
+
 # ASGI application with WebSocket support
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": AuthMiddlewareStack(
-        URLRouter([])  # Add WebSocket routes here when needed
+    "websocket": JWTAuthMiddlewareStack(
+        URLRouter(consultation_websocket_urlpatterns)
     ),
 })
 
@@ -6,6 +6,7 @@ from datetime import timedelta
 from pathlib import Path
 import os
 
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 
@@ -181,6 +182,18 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Internal nginx location serving MEDIA_ROOT for access-checked downloads
+# (X-Accel-Redirect); empty streams files through Django
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+
+# Chunked uploads: largest part and file accepted, how long an unfinished
+# upload is kept and how long assembling one may take before it is
+# considered abandoned
+CHUNKED_UPLOAD_MAX_PART_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_PART_BYTES", str(16 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.getenv("CHUNKED_UPLOAD_EXPIRY_HOURS", "24"))
+CHUNKED_UPLOAD_ASSEMBLY_TIMEOUT_MINUTES = int(os.getenv("CHUNKED_UPLOAD_ASSEMBLY_TIMEOUT_MINUTES", "60"))
+
 
 # ---------------------------------------------------------------------------
 # Django REST Framework & OpenAPI
@@ -252,6 +265,24 @@ CHANNEL_LAYERS = {
 }
 
 
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+_redis_password = os.getenv("REDIS_PASSWORD")
+_redis_auth = f":{_redis_password}@" if _redis_password else ""
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv(
+            "CACHE_URL",
+            f"redis://{_redis_auth}{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/2"
+        ),
+    }
+}
+
+
 # ---------------------------------------------------------------------------
 # Celery Configuration
 # ---------------------------------------------------------------------------
@@ -271,6 +302,85 @@ CELERY_TIMEZONE = os.getenv("TIME_ZONE", "UTC")
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
+CELERY_BEAT_SCHEDULE = {
+    "pharmacy-recompute-reorder-points": {
+        "task": "pharmacy.tasks.recompute_reorder_points",
+        "schedule": crontab(hour=1, minute=30),
+    },
+    "pharmacy-snapshot-stock-balances": {
+        "task": "pharmacy.tasks.snapshot_stock_balances",
+        "schedule": crontab(hour=0, minute=20),
+    },
+    "pharmacy-refresh-expired-stock-summaries": {
+        "task": "pharmacy.tasks.refresh_expired_stock_summaries",
+        "schedule": crontab(hour=0, minute=5),
+    },
+    "pharmacy-compute-inventory-alerts": {
+        "task": "pharmacy.tasks.compute_inventory_alerts",
+        "schedule": crontab(minute="*/15"),
+    },
+    "laboratory-process-analyzer-messages": {
+        "task": "laboratory.tasks.process_analyzer_messages",
+        "schedule": crontab(minute="*"),
+    },
+    "common-purge-expired-uploads": {
+        "task": "common.tasks.purge_expired_uploads",
+        "schedule": crontab(hour=3, minute=0),
+    },
+}
+
+# Inventory batches expiring within this many days raise an alert
+PHARMACY_EXPIRY_ALERT_DAYS = int(os.getenv("PHARMACY_EXPIRY_ALERT_DAYS", "30"))
+
+# Lab delta checks: defaults for analytes without their own thresholds in the
+# template reference ranges (empty disables the threshold), and how far back
+# a previous result is compared
+LAB_DELTA_CHECK_ABSOLUTE = os.getenv("LAB_DELTA_CHECK_ABSOLUTE", "")
+LAB_DELTA_CHECK_PERCENT = os.getenv("LAB_DELTA_CHECK_PERCENT", "50")
+LAB_DELTA_CHECK_WINDOW_DAYS = int(os.getenv("LAB_DELTA_CHECK_WINDOW_DAYS", "365"))
+
+# Lab worklist turnaround targets in minutes from ordering, by order priority
+LAB_WORKLIST_SLA_MINUTES = {
+    "stat": int(os.getenv("LAB_SLA_STAT_MINUTES", "60")),
+    "urgent": int(os.getenv("LAB_SLA_URGENT_MINUTES", "240")),
+    "routine": int(os.getenv("LAB_SLA_ROUTINE_MINUTES", "1440")),
+}
+
+# Radiology reporting turnaround targets in minutes from acquisition, by
+# order priority
+RADIOLOGY_REPORT_SLA_MINUTES = {
+    "stat": int(os.getenv("RADIOLOGY_SLA_STAT_MINUTES", "60")),
+    "urgent": int(os.getenv("RADIOLOGY_SLA_URGENT_MINUTES", "240")),
+    "routine": int(os.getenv("RADIOLOGY_SLA_ROUTINE_MINUTES", "2880")),
+}
+
+# How many days ahead radiology availability searches look for free slots
+RADIOLOGY_SCHEDULING_HORIZON_DAYS = int(os.getenv("RADIOLOGY_SCHEDULING_HORIZON_DAYS", "60"))
+
+# Sample accession numbers: prefix + YYMMDD + daily sequence, and how long
+# rendered barcode labels stay cached
+LAB_ACCESSION_PREFIX = os.getenv("LAB_ACCESSION_PREFIX", "L")
+LAB_LABEL_CACHE_SECONDS = int(os.getenv("LAB_LABEL_CACHE_SECONDS", str(7 * 24 * 3600)))
+
+# Redis mirror of the active consultation queues, and how long a room's
+# mirror is trusted before it is rebuilt from the database on next read
+CONSULTATION_QUEUE_REDIS_URL = os.getenv(
+    "CONSULTATION_QUEUE_REDIS_URL",
+    f"redis://{_redis_auth}{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/3"
+)
+CONSULTATION_QUEUE_REBUILD_SECONDS = int(os.getenv("CONSULTATION_QUEUE_REBUILD_SECONDS", "3600"))
+
+# How long consultation dashboard statistics are cached
+CONSULTATION_STATS_CACHE_SECONDS = int(os.getenv("CONSULTATION_STATS_CACHE_SECONDS", "60"))
+
+# Queue wait estimates: weight of each finished session in the rolling mean
+# consultation length, sessions needed before a room/doctor mean is trusted,
+# longest session counted (longer ones were left open) and the length
+# assumed with no history
+CONSULTATION_DURATION_SMOOTHING = float(os.getenv("CONSULTATION_DURATION_SMOOTHING", "0.1"))
+CONSULTATION_DURATION_MIN_SAMPLES = int(os.getenv("CONSULTATION_DURATION_MIN_SAMPLES", "5"))
+CONSULTATION_DURATION_MAX_MINUTES = int(os.getenv("CONSULTATION_DURATION_MAX_MINUTES", "240"))
+CONSULTATION_DEFAULT_DURATION_MINUTES = int(os.getenv("CONSULTATION_DEFAULT_DURATION_MINUTES", "15"))
 
 
 # ---------------------------------------------------------------------------
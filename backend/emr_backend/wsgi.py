@@ -15,3 +15,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'emr_backend.settings')
 
 application = get_wsgi_application()
 
+# Warm per-worker in-memory indexes so the first requests are fast
+from pharmacy.autocomplete import warm_index  # noqa: E402
+
+warm_index()
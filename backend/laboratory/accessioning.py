@@ -0,0 +1,33 @@
+"""
+Sample accession numbers.
+
+An accession number identifies one collected sample: a prefix, the
+collection date and a daily sequence, e.g. ``L26101900042``. Numbers for a
+batch are reserved with one locked update of the day's counter row, so
+concurrent collections never issue the same number.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AccessionCounter
+
+SEQUENCE_DIGITS = 5
+
+
+def format_accession(day, sequence):
+    return f"{settings.LAB_ACCESSION_PREFIX}{day:%y%m%d}{sequence:0{SEQUENCE_DIGITS}d}"
+
+
+def issue_accession_numbers(count, day=None):
+    """Reserve ``count`` consecutive accession numbers for ``day`` (today by default)."""
+    if count <= 0:
+        return []
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        AccessionCounter.objects.bulk_create([AccessionCounter(day=day)], ignore_conflicts=True)
+        counter = AccessionCounter.objects.select_for_update().get(day=day)
+        first = counter.last_value + 1
+        counter.last_value += count
+        counter.save(update_fields=['last_value'])
+    return [format_accession(day, sequence) for sequence in range(first, first + count)]
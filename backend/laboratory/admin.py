@@ -2,7 +2,14 @@
 Admin configuration for the Laboratory app.
 """
 from django.contrib import admin
-from .models import LabTemplate, LabOrder, LabTest, LabResult
+from .models import LabTemplate, LabPanelComponent, LabOrder, LabTest, LabResult, LabResultValue, AnalyzerMessage
+
+
+class LabPanelComponentInline(admin.TabularInline):
+    model = LabPanelComponent
+    fk_name = 'panel'
+    autocomplete_fields = ['component']
+    extra = 0
 
 
 @admin.register(LabTemplate)
@@ -10,6 +17,7 @@ class LabTemplateAdmin(admin.ModelAdmin):
     list_display = ['code', 'name', 'sample_type', 'is_active', 'created_at']
     list_filter = ['sample_type', 'is_active']
     search_fields = ['name', 'code']
+    inlines = [LabPanelComponentInline]
 
 
 @admin.register(LabOrder)
@@ -21,14 +29,29 @@ class LabOrderAdmin(admin.ModelAdmin):
 
 @admin.register(LabTest)
 class LabTestAdmin(admin.ModelAdmin):
-    list_display = ['code', 'name', 'order', 'status', 'processing_method', 'created_at']
+    list_display = ['code', 'name', 'order', 'accession_number', 'status', 'processing_method', 'created_at']
     list_filter = ['status', 'processing_method', 'sample_type']
-    search_fields = ['name', 'code', 'order__order_id']
+    search_fields = ['name', 'code', 'order__order_id', 'accession_number']
 
 
 @admin.register(LabResult)
 class LabResultAdmin(admin.ModelAdmin):
     list_display = ['test', 'patient', 'overall_status', 'priority', 'created_at']
-    list_filter = ['overall_status', 'priority']
+    list_filter = ['overall_status', 'priority', 'delta_failed']
     search_fields = ['patient__surname', 'patient__first_name', 'test__name']
 
+
+@admin.register(LabResultValue)
+class LabResultValueAdmin(admin.ModelAdmin):
+    list_display = ['analyte_code', 'value', 'unit', 'flag', 'patient', 'observed_at']
+    list_filter = ['flag']
+    search_fields = ['analyte_code', 'analyte_name', 'patient__surname', 'patient__first_name']
+    raw_id_fields = ['test', 'patient']
+
+
+@admin.register(AnalyzerMessage)
+class AnalyzerMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'protocol', 'control_id', 'source', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'protocol']
+    search_fields = ['control_id', 'source', 'raw']
+    readonly_fields = ['received_at', 'processed_at', 'outcomes']
@@ -0,0 +1,413 @@
+"""
+Analyzer result ingest for the Laboratory app.
+
+Chemistry and haematology analyzers send results as HL7 v2 ORU^R01
+messages (over MLLP/TCP) or ASTM E1394 records (dropped as files). The
+pipeline has two halves so bursts from the instruments never reach the web
+workers:
+
+* Receivers (``analyzer_listener``) parse each message just enough to
+  validate it, store it in the ``AnalyzerMessage`` queue and acknowledge it
+  once stored: an HL7 ``ACK`` with ``MSA|AA`` over TCP, or moving a dropped
+  file to ``processed/``. Malformed messages are rejected (``MSA|AR``,
+  ``error/``) without being queued.
+* A worker (``process_analyzer_messages`` task) drains the queue in batches:
+  it matches every observation of a batch to a ``LabTest`` with one query,
+  by order number or sample accession number and test code, and writes
+  all results of the batch through ``LabWorkflowService.submit_results``, i.e. one
+  ``bulk_update`` and one result upsert per batch.
+"""
+import logging
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalyzerMessage, LabTest
+from .reference_ranges import get_index
+
+logger = logging.getLogger(__name__)
+
+# MLLP framing: <VT> message <FS><CR>
+MLLP_START = b'\x0b'
+MLLP_END = b'\x1c\x0d'
+
+BATCH_SIZE = 200
+# Attempts before a message that keeps failing is left as failed
+MAX_ATTEMPTS = 3
+
+Observation = namedtuple('Observation', ['order_ref', 'test_code', 'analyte_code', 'analyte_name', 'value', 'unit'])
+ParsedMessage = namedtuple('ParsedMessage', ['protocol', 'control_id', 'header', 'observations'])
+
+_ASTM_FRAME_RE = re.compile(r'^\x02?\d?(?=[A-Z]\|)')
+_ASTM_TRAILER_RE = re.compile(r'[\x17\x03][0-9A-Fa-f]{2}$')
+
+
+class AnalyzerMessageError(ValueError):
+    """Raised for a message that cannot be parsed."""
+
+
+def _component(field, index, separator='^'):
+    """Return a component of a field (0-based), or ''."""
+    parts = field.split(separator)
+    return parts[index].strip() if index < len(parts) else ''
+
+
+def _field(fields, index):
+    return fields[index].strip() if index < len(fields) else ''
+
+
+def detect_protocol(raw):
+    """Return ``'hl7'`` or ``'astm'`` from the first record of a message."""
+    text = raw.lstrip('\x0b\x02\r\n 0123456789')
+    if text.startswith('MSH'):
+        return 'hl7'
+    if text.startswith('H|'):
+        return 'astm'
+    raise AnalyzerMessageError('Unrecognized message: expected an HL7 MSH or ASTM H record')
+
+
+def parse_hl7(raw):
+    """
+    Parse an HL7 v2 ORU message. Observations take the order reference from
+    OBR-2 (placer order number, falling back to ORC-2 and then OBR-3) and
+    the test code from OBR-4; OBX-3 identifies the analyte, OBX-5 holds the
+    value and OBX-6 the unit.
+    """
+    segments = [segment for segment in re.split(r'\r\n|\r|\n', raw.strip('\x0b\x1c\r\n')) if segment.strip()]
+    if not segments or not segments[0].startswith('MSH'):
+        raise AnalyzerMessageError('HL7 message must start with MSH')
+
+    msh = segments[0]
+    if len(msh) < 4 or msh[3].isspace():
+        raise AnalyzerMessageError('HL7 MSH segment is missing its field separator')
+    separator = msh[3]
+    components = msh[4] if len(msh) > 4 else '^'
+    component_separator = components[0]
+    header = msh.split(separator)
+    # MSH-1 is the separator itself, so MSH-n is header[n - 1]
+    message_type = _field(header, 8)
+    control_id = _field(header, 9)
+    if not message_type.startswith('ORU'):
+        raise AnalyzerMessageError(f"Unsupported HL7 message type '{message_type}'")
+
+    observations = []
+    orc_ref = ''
+    order_ref = ''
+    test_code = ''
+    for segment in segments[1:]:
+        fields = segment.split(separator)
+        kind = fields[0].strip()
+        if kind == 'ORC':
+            orc_ref = _component(_field(fields, 2), 0, component_separator)
+        elif kind == 'OBR':
+            order_ref = (
+                _component(_field(fields, 2), 0, component_separator)
+                or orc_ref
+                or _component(_field(fields, 3), 0, component_separator)
+            )
+            test_code = _component(_field(fields, 4), 0, component_separator)
+        elif kind == 'OBX':
+            if not order_ref:
+                raise AnalyzerMessageError('OBX segment without an order reference')
+            identifier = _field(fields, 3)
+            value = _field(fields, 5)
+            if value == '':
+                continue
+            observations.append(Observation(
+                order_ref,
+                test_code,
+                _component(identifier, 0, component_separator),
+                _component(identifier, 1, component_separator),
+                value,
+                _component(_field(fields, 6), 0, component_separator),
+            ))
+
+    return ParsedMessage('hl7', control_id, header, observations)
+
+
+def parse_astm(raw):
+    """
+    Parse ASTM E1394 records. O records give the order reference (O-3,
+    specimen ID) and test code (O-5, ``^^^code``); following R records give
+    the analyte (R-3), value (R-4) and unit (R-5). Low-level frame numbers
+    and checksums are stripped if present.
+    """
+    records = []
+    for line in re.split(r'\r\n|\r|\n', raw):
+        line = _ASTM_TRAILER_RE.sub('', _ASTM_FRAME_RE.sub('', line.strip('\x05\x04\x02\r\n ')))
+        if line:
+            records.append(line)
+    if not records or not records[0].startswith('H'):
+        raise AnalyzerMessageError('ASTM message must start with an H record')
+
+    header = records[0]
+    if len(header) < 2 or header[1].isspace():
+        raise AnalyzerMessageError('ASTM H record is missing its field delimiter')
+    separator = header[1]
+    component_separator = header[3] if len(header) > 3 else '^'
+    header_fields = header.split(separator)
+    control_id = _field(header_fields, 2)
+
+    observations = []
+    order_ref = ''
+    test_code = ''
+    for record in records[1:]:
+        fields = record.split(separator)
+        kind = fields[0].strip()
+        if kind == 'O':
+            order_ref = _component(_field(fields, 2), 0, component_separator)
+            test_code = _component(_field(fields, 4), 3, component_separator)
+        elif kind == 'R':
+            if not order_ref:
+                raise AnalyzerMessageError('R record without an order reference')
+            value = _field(fields, 3)
+            if value == '':
+                continue
+            identifier = _field(fields, 2)
+            observations.append(Observation(
+                order_ref,
+                test_code,
+                _component(identifier, 3, component_separator) or identifier.strip(component_separator),
+                _component(identifier, 4, component_separator),
+                value,
+                _field(fields, 4),
+            ))
+
+    return ParsedMessage('astm', control_id, header_fields, observations)
+
+
+def parse_message(raw, protocol=None):
+    """Parse a raw HL7 or ASTM message into a ``ParsedMessage``."""
+    protocol = protocol or detect_protocol(raw)
+    return parse_hl7(raw) if protocol == 'hl7' else parse_astm(raw)
+
+
+def hl7_ack(parsed, code='AA', text=''):
+    """Build an HL7 ACK for a parsed (or unparseable) message."""
+    header = parsed.header if parsed is not None else []
+    control_id = parsed.control_id if parsed is not None else ''
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    version = _field(header, 11) or '2.5'
+    msh = '|'.join([
+        'MSH', '^~\\&',
+        _field(header, 4), _field(header, 5),  # receiving app / facility become the senders
+        _field(header, 2), _field(header, 3),
+        timestamp, '', 'ACK^R01', f'ACK{timestamp}', 'P', version,
+    ])
+    msa = '|'.join(['MSA', code, control_id, text.replace('|', ' ')[:80]])
+    return f'{msh}\r{msa}\r'
+
+
+def enqueue(raw, source='', protocol=None):
+    """
+    Validate a message and store it in the queue. Returns
+    ``(AnalyzerMessage, ParsedMessage)``; raises ``AnalyzerMessageError``
+    for malformed messages, which are not queued.
+    """
+    parsed = parse_message(raw, protocol)
+    message = AnalyzerMessage.objects.create(
+        protocol=parsed.protocol,
+        source=source[:255],
+        control_id=parsed.control_id[:100],
+        raw=raw,
+    )
+    return message, parsed
+
+
+def split_messages(text):
+    """
+    Split a dropped file holding several HL7 messages or ASTM transmissions.
+    Segments may end in CR (the HL7 standard), LF or CRLF.
+    """
+    if detect_protocol(text) == 'hl7':
+        start = r'(?:^|(?<=\r))(?=MSH)'
+    else:
+        start = r'(?:^|(?<=\r))(?=\x02?\d?H\|)'
+    return [part for part in re.split(start, text.strip(), flags=re.M) if part.strip()]
+
+
+class TestMatcher:
+    """
+    Match observations to tests, loading every candidate test with one
+    query. The order reference may be a lab order ID or a sample's
+    accession number.
+    """
+
+    def __init__(self, order_refs):
+        self.index = get_index()
+        self.tests = {}
+        order_refs = set(order_refs)
+        tests = LabTest.objects.filter(
+            Q(order__order_id__in=list(order_refs)) | Q(accession_number__in=list(order_refs))
+        ).select_related('order').order_by('id')
+        for test in tests:
+            # An accession number names exactly one sample
+            if test.accession_number in order_refs:
+                self.tests.setdefault(test.accession_number, []).append(test)
+            if test.order.order_id in order_refs:
+                self.tests.setdefault(test.order.order_id, []).append(test)
+
+    def match(self, observation):
+        """Return ``(test, result key)`` for an observation, or ``(None, error)``."""
+        candidates = self.tests.get(observation.order_ref, [])
+        if not candidates:
+            return None, 'Order not found'
+
+        code = observation.test_code.upper()
+        analyte = (observation.analyte_code or observation.analyte_name).upper()
+        by_code = [test for test in candidates if code and test.code.upper() == code]
+        by_analyte = [test for test in candidates if analyte and self._analyte_key(test, observation)]
+        matches = by_code or by_analyte or (candidates if len(candidates) == 1 else [])
+        if not matches:
+            return None, f"No test for '{observation.test_code or observation.analyte_code}'"
+        # Prefer a test still open for results when the order repeats a code
+        test = next((test for test in matches if test.status != 'verified'), matches[0])
+        return test, self._analyte_key(test, observation) or observation.analyte_name or observation.analyte_code
+
+    def _analyte_key(self, test, observation):
+        """The template's analyte name for an observation, if the template defines it."""
+        analytes = self.index.analytes_for(test)
+        for key in (observation.analyte_name, observation.analyte_code):
+            analyte = analytes.get(key.strip().lower()) if key else None
+            if analyte is not None:
+                return analyte.name
+        code = observation.analyte_code.upper()
+        for analyte in analytes.values():
+            if code and analyte.code.upper() == code:
+                return analyte.name
+        return None
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    """
+    Process one batch of queued messages. Returns the number of messages
+    taken from the queue (0 when it is empty).
+    """
+    from .services import LabWorkflowService
+
+    with transaction.atomic():
+        messages = list(
+            AnalyzerMessage.objects.select_for_update(skip_locked=True).filter(status='queued').order_by('id')[:batch_size]
+        )
+        if not messages:
+            return 0
+
+        parsed = {}
+        for message in messages:
+            message.attempts += 1
+            try:
+                parsed[message.id] = parse_message(message.raw, message.protocol)
+            except AnalyzerMessageError as e:
+                message.status = 'failed'
+                message.error = str(e)
+
+        matcher = TestMatcher({
+            observation.order_ref for result in parsed.values() for observation in result.observations
+        })
+
+        # Merge every matched observation of the batch into one payload per test
+        payloads = {}
+        pending = {}
+        for message in messages:
+            if message.id not in parsed:
+                continue
+            outcomes = []
+            for observation in parsed[message.id].observations:
+                outcome = {
+                    'order': observation.order_ref,
+                    'test': observation.test_code,
+                    'analyte': observation.analyte_code or observation.analyte_name,
+                }
+                test, key = matcher.match(observation)
+                if test is None:
+                    outcomes.append({**outcome, 'success': False, 'error': key})
+                    continue
+                outcome['test_id'] = test.id
+                payload = payloads.setdefault(test.id, {'results': {}, 'merge': True})
+                payload['results'][key] = observation.value
+                outcomes.append(outcome)
+            pending[message.id] = outcomes
+
+        applied, test_outcomes = LabWorkflowService.submit_results(payloads, None) if payloads else ([], [])
+        errors = {outcome['test_id']: outcome.get('error') for outcome in test_outcomes if not outcome['success']}
+
+        now = timezone.now()
+        for message in messages:
+            if message.id not in pending:
+                continue
+            outcomes = pending[message.id]
+            for outcome in outcomes:
+                if 'test_id' in outcome:
+                    error = errors.get(outcome['test_id'])
+                    outcome['success'] = error is None
+                    if error:
+                        outcome['error'] = error
+            succeeded = sum(1 for outcome in outcomes if outcome['success'])
+            if outcomes and succeeded == len(outcomes):
+                message.status = 'processed'
+            elif succeeded:
+                message.status = 'partial'
+            elif outcomes and all('test_id' not in outcome for outcome in outcomes):
+                message.status = 'unmatched'
+            else:
+                message.status = 'failed'
+            message.outcomes = outcomes
+            message.error = '' if message.status == 'processed' else 'Some observations were not applied'
+            message.processed_at = now
+
+        AnalyzerMessage.objects.bulk_update(
+            messages, ['status', 'attempts', 'error', 'outcomes', 'processed_at']
+        )
+
+    logger.info(f"Analyzer ingest: {len(messages)} message(s), {len(applied)} test(s) updated")
+    return len(messages)
+
+
+def _record_failure(error):
+    """
+    Count a failed attempt against the oldest queued message, giving up on
+    it after ``MAX_ATTEMPTS``. Returns 0 when the queue is empty.
+    """
+    with transaction.atomic():
+        message = AnalyzerMessage.objects.select_for_update(skip_locked=True).filter(
+            status='queued'
+        ).order_by('id').first()
+        if message is None:
+            return 0
+        message.attempts += 1
+        message.error = str(error)[:1000]
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = 'failed'
+            message.processed_at = timezone.now()
+        message.save(update_fields=['attempts', 'error', 'status', 'processed_at'])
+    return 1
+
+
+def process_queue(batch_size=BATCH_SIZE):
+    """
+    Drain the queue batch by batch. A batch that fails as a whole is retried
+    one message at a time so a single bad message cannot block the queue.
+    Returns the number of messages taken from the queue.
+    """
+    processed = 0
+    while True:
+        try:
+            count = process_batch(batch_size)
+        except Exception:
+            logger.exception("Analyzer batch failed; retrying its messages one at a time")
+            count = 0
+            for _ in range(batch_size):
+                try:
+                    taken = process_batch(1)
+                except Exception as e:
+                    taken = _record_failure(e)
+                if not taken:
+                    break
+                count += taken
+        processed += count
+        if count < batch_size:
+            return processed
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class LaboratoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'laboratory'
-
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        import laboratory.signals  # noqa
@@ -0,0 +1,95 @@
+"""
+Delta checks for the Laboratory app.
+
+When results are submitted, every numeric analyte value is compared with the
+patient's most recent earlier value of the same analyte. The previous values
+of a whole batch are fetched with one query: a correlated subquery per value
+that seeks the ``(patient, analyte_code, observed_at)`` index of
+``LabResultValue``. A change fails the check when it exceeds the analyte's
+``delta_absolute`` / ``delta_percent`` thresholds from the template
+reference ranges, or the ``LAB_DELTA_CHECK_*`` defaults for analytes without
+their own. When both an absolute and a percent threshold apply, both must be
+exceeded, so small values are not flagged for large relative swings.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import LabResultValue
+from .reference_ranges import parse_number
+
+# Statuses whose values count as a previous result
+REPORTED_STATUSES = ['results_ready', 'verified']
+
+
+def default_thresholds():
+    """The ``(absolute, percent)`` thresholds for analytes without their own."""
+    return (
+        parse_number(settings.LAB_DELTA_CHECK_ABSOLUTE),
+        parse_number(settings.LAB_DELTA_CHECK_PERCENT),
+    )
+
+
+def delta_failed(absolute_change, percent_change, absolute_threshold, percent_threshold):
+    """Whether a change exceeds the thresholds that apply to it."""
+    exceeded = []
+    if absolute_threshold is not None:
+        exceeded.append(abs(absolute_change) > absolute_threshold)
+    if percent_threshold is not None and percent_change is not None:
+        exceeded.append(abs(percent_change) > percent_threshold)
+    return bool(exceeded) and all(exceeded)
+
+
+def check_deltas(tests, evaluations):
+    """
+    Compare the projected values of ``tests`` with each patient's previous
+    values. ``evaluations`` are the reference-range evaluations of the tests
+    and supply per-analyte thresholds.
+
+    Returns ``{test id: {analyte name: delta entry}}`` for analytes with a
+    previous value within ``LAB_DELTA_CHECK_WINDOW_DAYS``.
+    """
+    window = timedelta(days=settings.LAB_DELTA_CHECK_WINDOW_DAYS)
+    previous = LabResultValue.objects.filter(
+        patient_id=OuterRef('patient_id'),
+        analyte_code=OuterRef('analyte_code'),
+        observed_at__lt=OuterRef('observed_at'),
+        observed_at__gte=OuterRef('observed_at') - window,
+        numeric_value__isnull=False,
+        test__status__in=REPORTED_STATUSES,
+    ).order_by('-observed_at')
+
+    rows = LabResultValue.objects.filter(
+        test__in=tests, numeric_value__isnull=False
+    ).annotate(
+        previous_value=Subquery(previous.values('numeric_value')[:1]),
+        previous_observed_at=Subquery(previous.values('observed_at')[:1]),
+        previous_test_id=Subquery(previous.values('test_id')[:1]),
+    ).filter(previous_value__isnull=False).values(
+        'test_id', 'analyte_name', 'numeric_value',
+        'previous_value', 'previous_observed_at', 'previous_test_id',
+    )
+
+    defaults = default_thresholds()
+    deltas = {}
+    for row in rows:
+        entry = evaluations[row['test_id']][0].get(row['analyte_name'], {})
+        thresholds = (entry.get('delta_absolute'), entry.get('delta_percent'))
+        if thresholds == (None, None):
+            thresholds = defaults
+
+        absolute_change = row['numeric_value'] - row['previous_value']
+        percent_change = (
+            round(absolute_change / abs(row['previous_value']) * 100, 1) if row['previous_value'] else None
+        )
+        deltas.setdefault(row['test_id'], {})[row['analyte_name']] = {
+            'value': row['numeric_value'],
+            'previous_value': row['previous_value'],
+            'previous_observed_at': row['previous_observed_at'].isoformat(),
+            'previous_test_id': row['previous_test_id'],
+            'absolute_change': round(absolute_change, 4),
+            'percent_change': percent_change,
+            'failed': delta_failed(absolute_change, percent_change, *thresholds),
+        }
+    return deltas
@@ -0,0 +1,177 @@
+"""
+Barcode labels for collected samples.
+
+Each label carries the sample's accession number as a Code 128 barcode
+(subset B, drawn with Pillow) with the patient, test and collection date
+printed around it. Rendered labels are cached as PNG bytes by accession
+number, so reprinting a batch only draws labels not seen before. A batch
+is returned either as one PNG sheet or as a PDF with one label per page for
+label printers.
+"""
+import io
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'laboratory:label:'
+OUTPUT_FORMATS = ('png', 'pdf')
+
+# Module widths (bar, space, bar, ...) of each Code 128 symbol value
+CODE128_PATTERNS = [
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+]
+CODE128_START_B = 104
+CODE128_STOP = 106
+QUIET_ZONE_MODULES = 10
+
+MODULE_WIDTH = 3
+BAR_HEIGHT = 110
+LABEL_WIDTH = 600
+LABEL_HEIGHT = 300
+MARGIN = 16
+SHEET_GAP = 20
+PDF_RESOLUTION = 300
+
+
+def code128_modules(text):
+    """
+    Encode ASCII text with Code 128 subset B. Returns the module widths of
+    the symbol, alternating bar and space, starting with a bar.
+    """
+    values = []
+    for char in text:
+        code = ord(char)
+        if code < 32 or code > 127:
+            raise ValueError(f"Cannot encode {char!r} in Code 128 subset B")
+        values.append(code - 32)
+    checksum = (CODE128_START_B + sum(position * value for position, value in enumerate(values, 1))) % 103
+    symbols = [CODE128_START_B, *values, checksum, CODE128_STOP]
+    return [int(width) for symbol in symbols for width in CODE128_PATTERNS[symbol]]
+
+
+def draw_barcode(draw, text, left, top, module_width=MODULE_WIDTH, height=BAR_HEIGHT):
+    """Draw a Code 128 barcode with its top-left corner (quiet zone included) at ``left, top``."""
+    x = left + QUIET_ZONE_MODULES * module_width
+    for position, width in enumerate(code128_modules(text)):
+        if position % 2 == 0:
+            draw.rectangle([x, top, x + width * module_width - 1, top + height - 1], fill=0)
+        x += width * module_width
+
+
+def barcode_width(text, module_width=MODULE_WIDTH):
+    return (sum(code128_modules(text)) + 2 * QUIET_ZONE_MODULES) * module_width
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def label_lines(test):
+    """The text printed on a test's label."""
+    patient = test.order.patient
+    collected = timezone.localtime(test.collected_at).strftime('%Y-%m-%d %H:%M') if test.collected_at else ''
+    return {
+        'header': patient.get_full_name()[:34],
+        'subheader': f"{patient.patient_id}   {collected}",
+        'footer': f"{test.code} - {test.sample_type}"[:40],
+    }
+
+
+def render_label(test):
+    """Draw the label of a collected test as a grayscale image."""
+    lines = label_lines(test)
+    accession = test.accession_number
+    module_width = MODULE_WIDTH
+    while module_width > 1 and barcode_width(accession, module_width) > LABEL_WIDTH - 2 * MARGIN:
+        module_width -= 1
+
+    image = Image.new('L', (LABEL_WIDTH, LABEL_HEIGHT), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((MARGIN, MARGIN), lines['header'], font=_font(26), fill=0)
+    draw.text((MARGIN, MARGIN + 32), lines['subheader'], font=_font(20), fill=0)
+    left = (LABEL_WIDTH - barcode_width(accession, module_width)) // 2
+    top = MARGIN + 64
+    draw_barcode(draw, accession, left, top, module_width)
+    text_top = top + BAR_HEIGHT + 6
+    draw.text((LABEL_WIDTH // 2, text_top), accession, font=_font(24), fill=0, anchor='ma')
+    draw.text((MARGIN, text_top + 34), lines['footer'], font=_font(20), fill=0)
+    return image
+
+
+def label_png(test):
+    """Return a test's label as PNG bytes."""
+    buffer = io.BytesIO()
+    render_label(test).save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def label_images(tests):
+    """
+    Return the label images of tests (which must have accession numbers),
+    drawing only those missing from the cache.
+    """
+    keys = {test.id: f"{CACHE_KEY_PREFIX}{test.accession_number}" for test in tests}
+    cached = cache.get_many(list(keys.values()))
+
+    rendered = {}
+    for test in tests:
+        if keys[test.id] not in cached:
+            rendered[keys[test.id]] = label_png(test)
+    if rendered:
+        cache.set_many(rendered, timeout=settings.LAB_LABEL_CACHE_SECONDS)
+        logger.info(f"Rendered {len(rendered)} of {len(tests)} lab label(s)")
+
+    images = []
+    for test in tests:
+        data = cached.get(keys[test.id]) or rendered[keys[test.id]]
+        images.append(Image.open(io.BytesIO(data)))
+    return images
+
+
+def render_sheet(tests, output='png', columns=2):
+    """
+    Render labels for tests. ``png`` tiles them on one sheet, ``columns``
+    wide; ``pdf`` puts one label on each page. Returns ``(bytes, content type)``.
+    """
+    images = label_images(tests)
+    buffer = io.BytesIO()
+    if output == 'pdf':
+        images = [image.convert('L') for image in images]
+        images[0].save(buffer, 'PDF', save_all=True, append_images=images[1:], resolution=PDF_RESOLUTION)
+        return buffer.getvalue(), 'application/pdf'
+
+    columns = max(1, min(columns, len(images)))
+    rows = -(-len(images) // columns)
+    sheet = Image.new(
+        'L',
+        (columns * LABEL_WIDTH + (columns + 1) * SHEET_GAP, rows * LABEL_HEIGHT + (rows + 1) * SHEET_GAP),
+        255,
+    )
+    draw = ImageDraw.Draw(sheet)
+    for position, image in enumerate(images):
+        row, column = divmod(position, columns)
+        left = SHEET_GAP + column * (LABEL_WIDTH + SHEET_GAP)
+        top = SHEET_GAP + row * (LABEL_HEIGHT + SHEET_GAP)
+        sheet.paste(image, (left, top))
+        draw.rectangle([left - 1, top - 1, left + LABEL_WIDTH, top + LABEL_HEIGHT], outline=200)
+    sheet.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue(), 'image/png'
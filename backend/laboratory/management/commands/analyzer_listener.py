@@ -0,0 +1,147 @@
+"""
+Management command receiving analyzer result messages.
+Listens for HL7 v2 messages over MLLP/TCP and/or watches a drop directory
+for HL7 or ASTM files. Every message is validated, stored in the analyzer
+queue and only then acknowledged (ACK AA, or the file moved to processed/);
+results are written by the process_analyzer_messages task, or by this
+process itself with --inline.
+Run with: python manage.py analyzer_listener [--port 2575] [--watch DIR] [--inline]
+"""
+import os
+import shutil
+import socketserver
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from laboratory import analyzer
+
+
+class MLLPHandler(socketserver.StreamRequestHandler):
+    """Receive MLLP-framed messages on one connection and acknowledge each."""
+
+    def handle(self):
+        peer = f'{self.client_address[0]}:{self.client_address[1]}'
+        buffer = b''
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buffer += data
+            while analyzer.MLLP_END in buffer:
+                frame, buffer = buffer.split(analyzer.MLLP_END, 1)
+                start = frame.find(analyzer.MLLP_START)
+                raw = frame[start + 1:] if start >= 0 else frame
+                ack = self.server.command.receive(raw.decode('utf-8', errors='replace'), peer)
+                self.request.sendall(analyzer.MLLP_START + ack.encode() + analyzer.MLLP_END)
+
+
+class MLLPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    help = 'Receive analyzer results over MLLP/TCP or from a drop directory and queue them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0', help='Address to listen on (default: 0.0.0.0)')
+        parser.add_argument('--port', type=int, default=2575, help='MLLP port; 0 disables the listener (default: 2575)')
+        parser.add_argument('--watch', help='Directory polled for dropped .hl7/.astm/.txt files')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between directory polls (default: 2)')
+        parser.add_argument(
+            '--inline',
+            action='store_true',
+            help='Process the queue in this process instead of dispatching the Celery task',
+        )
+
+    def handle(self, *args, **options):
+        self.inline = options['inline']
+        self.pending = threading.Event()
+        if not options['port'] and not options['watch']:
+            raise CommandError('Nothing to do: give --port and/or --watch')
+
+        threads = []
+        if options['port']:
+            server = MLLPServer((options['host'], options['port']), MLLPHandler)
+            server.command = self
+            threads.append(threading.Thread(target=server.serve_forever, daemon=True))
+            self.stdout.write(f"Listening for MLLP on {options['host']}:{options['port']}")
+        if options['watch']:
+            folder = options['watch']
+            for sub in ('processed', 'error'):
+                os.makedirs(os.path.join(folder, sub), exist_ok=True)
+            threads.append(threading.Thread(target=self.watch, args=(folder, options['interval']), daemon=True))
+            self.stdout.write(f'Watching {folder}')
+        threads.append(threading.Thread(target=self.dispatch, daemon=True))
+
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+
+    def receive(self, raw, source):
+        """Queue one message; return the HL7 ACK to send back."""
+        close_old_connections()
+        parsed = None
+        try:
+            message, parsed = analyzer.enqueue(raw, source=source)
+        except analyzer.AnalyzerMessageError as e:
+            self.stderr.write(f'Rejected message from {source}: {e}')
+            return analyzer.hl7_ack(parsed, 'AR', str(e))
+        except Exception as e:
+            self.stderr.write(f'Could not queue message from {source}: {e}')
+            return analyzer.hl7_ack(parsed, 'AE', 'Temporary error, resend')
+        self.pending.set()
+        return analyzer.hl7_ack(parsed if parsed.protocol == 'hl7' else None, 'AA')
+
+    def watch(self, folder, interval):
+        """Queue dropped files, moving each to processed/ or error/."""
+        while True:
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if not os.path.isfile(path) or not name.lower().endswith(('.hl7', '.astm', '.txt')):
+                    continue
+                close_old_connections()
+                try:
+                    with open(path, encoding='utf-8', errors='replace') as f:
+                        messages = analyzer.split_messages(f.read())
+                    # Queue a file's messages all or none
+                    for raw in messages:
+                        analyzer.parse_message(raw)
+                    with transaction.atomic():
+                        for raw in messages:
+                            analyzer.enqueue(raw, source=name)
+                    destination = 'processed'
+                except analyzer.AnalyzerMessageError as e:
+                    self.stderr.write(f'Rejected {name}: {e}')
+                    destination = 'error'
+                except Exception as e:
+                    # Left in place and retried on the next poll
+                    self.stderr.write(f'Could not queue {name}: {e}')
+                    continue
+                shutil.move(path, os.path.join(folder, destination, name))
+                self.pending.set()
+            time.sleep(interval)
+
+    def dispatch(self):
+        """Start processing when messages arrive, at most once a second."""
+        from laboratory.tasks import process_analyzer_messages
+
+        while True:
+            self.pending.wait()
+            self.pending.clear()
+            try:
+                if self.inline:
+                    close_old_connections()
+                    count = analyzer.process_queue()
+                    self.stdout.write(f'Processed {count} message(s)')
+                else:
+                    process_analyzer_messages.delay()
+            except Exception as e:
+                self.stderr.write(f'Processing failed: {e}')
+            time.sleep(1)
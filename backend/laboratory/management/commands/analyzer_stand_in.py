@@ -0,0 +1,114 @@
+"""
+Management command standing in for a lab analyzer.
+Generates result messages for open tests (values drawn around the template
+reference ranges) and sends them to analyzer_listener over MLLP, printing
+each acknowledgement, or writes them to a drop directory.
+Run with: python manage.py analyzer_stand_in [--orders LAB-1,LAB-2] [--protocol hl7|astm]
+          [--host localhost --port 2575 | --drop-dir DIR] [--count N]
+"""
+import os
+import random
+import socket
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from laboratory import analyzer
+from laboratory.models import LabTest
+from laboratory.reference_ranges import get_index
+
+
+def sample_value(analyte):
+    """A plausible value: usually inside the reference interval, sometimes outside."""
+    low, high = analyte.limits.low, analyte.limits.high
+    if low is None and high is None:
+        low, high = 1.0, 100.0
+    low = low if low is not None else high / 2
+    high = high if high is not None else low * 2
+    spread = (high - low) or 1.0
+    return round(random.uniform(low - spread * 0.2, high + spread * 0.2), 2)
+
+
+def build_hl7(test, analytes, control_id):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    segments = [
+        f'MSH|^~\\&|STANDIN|LAB|EMR|HOSPITAL|{timestamp}||ORU^R01|{control_id}|P|2.5',
+        f'PID|1||{test.order.patient_id}',
+        f'OBR|1|{test.accession_number or test.order.order_id}||{test.code}^{test.name}',
+    ]
+    for number, analyte in enumerate(analytes, start=1):
+        segments.append(
+            f'OBX|{number}|NM|{analyte.code}^{analyte.name}||{sample_value(analyte)}|{analyte.unit}|||||F'
+        )
+    return '\r'.join(segments) + '\r'
+
+
+def build_astm(test, analytes, control_id):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    records = [
+        f'H|\\^&|{control_id}||STANDIN|||||||P|1|{timestamp}',
+        f'P|1||{test.order.patient_id}',
+        f'O|1|{test.accession_number or test.order.order_id}||^^^{test.code}',
+    ]
+    for number, analyte in enumerate(analytes, start=1):
+        records.append(f'R|{number}|^^^{analyte.code}^{analyte.name}|{sample_value(analyte)}|{analyte.unit}||N||F')
+    records.append('L|1|N')
+    return '\r'.join(records) + '\r'
+
+
+class Command(BaseCommand):
+    help = 'Simulate an analyzer sending results for open lab tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', help='Comma-separated order numbers (default: all tests awaiting results)')
+        parser.add_argument('--protocol', choices=['hl7', 'astm'], default='hl7')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--port', type=int, default=2575)
+        parser.add_argument('--drop-dir', help='Write files here instead of sending over MLLP')
+        parser.add_argument('--count', type=int, default=100, help='Maximum number of tests (default: 100)')
+
+    def handle(self, *args, **options):
+        if options['drop_dir'] is None and options['protocol'] == 'astm':
+            raise CommandError('ASTM is only supported with --drop-dir')
+
+        tests = LabTest.objects.filter(status__in=['sample_collected', 'processing']).select_related('order')
+        if options['orders']:
+            tests = tests.filter(order__order_id__in=[ref.strip() for ref in options['orders'].split(',')])
+        tests = list(tests.order_by('id')[:options['count']])
+        if not tests:
+            self.stdout.write('No tests awaiting results')
+            return
+
+        index = get_index()
+        build = build_hl7 if options['protocol'] == 'hl7' else build_astm
+        messages = []
+        for number, test in enumerate(tests, start=1):
+            analytes = list(index.analytes_for(test).values())
+            if not analytes:
+                self.stdout.write(f'  Skipping {test.code} ({test.order.order_id}): template has no reference ranges')
+                continue
+            messages.append((test, build(test, analytes, f'STANDIN{number:05d}')))
+
+        if options['drop_dir']:
+            os.makedirs(options['drop_dir'], exist_ok=True)
+            for test, raw in messages:
+                name = f"{test.order.order_id}-{test.id}.{options['protocol']}"
+                # Write then rename so the watcher never reads a partial file
+                path = os.path.join(options['drop_dir'], name)
+                with open(path + '.part', 'w') as f:
+                    f.write(raw)
+                os.replace(path + '.part', path)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {len(messages)} file(s) to {options["drop_dir"]}'))
+            return
+
+        with socket.create_connection((options['host'], options['port']), timeout=30) as connection:
+            for test, raw in messages:
+                connection.sendall(analyzer.MLLP_START + raw.encode() + analyzer.MLLP_END)
+                response = b''
+                while analyzer.MLLP_END not in response:
+                    data = connection.recv(65536)
+                    if not data:
+                        raise CommandError('Listener closed the connection')
+                    response += data
+                msa = [line for line in response.decode().strip('\x0b\x1c\r').split('\r') if line.startswith('MSA')]
+                self.stdout.write(f"  {test.order.order_id} {test.code}: {msa[0] if msa else 'no MSA'}")
+        self.stdout.write(self.style.SUCCESS(f'✓ Sent {len(messages)} message(s)'))
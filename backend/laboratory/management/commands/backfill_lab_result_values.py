@@ -0,0 +1,65 @@
+"""
+Management command to project historical lab results into LabResultValue.
+Parses the results JSON of every test with submitted results, one test id
+range per chunk, and rewrites its per-analyte rows with one bulk insert per
+chunk. Safe to re-run: each test's rows are replaced, not duplicated.
+Run with: python manage.py backfill_lab_result_values [--since YYYY-MM-DD] [--chunk-size N]
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from laboratory.models import LabTest
+from laboratory.reference_ranges import evaluate_tests
+from laboratory.services import LabWorkflowService
+
+
+class Command(BaseCommand):
+    help = 'Project submitted lab results into per-analyte LabResultValue rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only project tests created on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Tests projected per chunk (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        tests = LabTest.objects.filter(
+            status__in=['results_ready', 'verified']
+        ).exclude(results={}).select_related('order').order_by('id')
+        since = options.get('since')
+        if since:
+            try:
+                since = datetime.strptime(since, '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            tests = tests.filter(created_at__gte=timezone.make_aware(since, timezone.get_current_timezone()))
+
+        projected = 0
+        last_id = 0
+        while True:
+            chunk = list(tests.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            evaluations = evaluate_tests(chunk)
+            with transaction.atomic():
+                LabWorkflowService.replace_result_values(chunk, evaluations, timezone.now())
+
+            projected += len(chunk)
+            self.stdout.write(f'  Projected {projected} test(s) (up to id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Projected the results of {projected} test(s)'))
@@ -0,0 +1,105 @@
+"""
+Management command to evaluate historical lab results against reference ranges.
+Flags every analyte of tests with submitted results and stores the flags and
+overall status on their verification records, one test id range per chunk
+with one upsert per chunk. The status a verifier chose on an already
+verified result is kept unless --overwrite is given.
+Run with: python manage.py evaluate_lab_results [--since YYYY-MM-DD] [--dry-run] [--overwrite]
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from laboratory.models import LabTest, LabResult
+from laboratory.reference_ranges import evaluate_tests
+from laboratory.services import LabWorkflowService
+
+
+class Command(BaseCommand):
+    help = 'Evaluate submitted lab results against template reference ranges'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only evaluate tests created on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the classification without writing it',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Also replace the overall status of verified results',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Tests evaluated per chunk (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options.get('dry_run', False)
+        overwrite = options.get('overwrite', False)
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        tests = LabTest.objects.filter(
+            status__in=['results_ready', 'verified']
+        ).exclude(results={}).select_related('order').order_by('id')
+        since = options.get('since')
+        if since:
+            try:
+                since = datetime.strptime(since, '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            tests = tests.filter(created_at__gte=timezone.make_aware(since, timezone.get_current_timezone()))
+
+        now = timezone.now()
+        evaluated = 0
+        counts = {}
+        last_id = 0
+        while True:
+            chunk = list(tests.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            existing = dict(
+                LabResult.objects.filter(test_id__in=[test.id for test in chunk]).values_list(
+                    'test_id', 'overall_status'
+                )
+            )
+            evaluations = evaluate_tests(chunk)
+            records = []
+            for test in chunk:
+                record = LabWorkflowService.result_record(test, evaluations[test.id], now)
+                if test.status == 'verified' and existing.get(test.id) and not overwrite:
+                    record.overall_status = existing[test.id]
+                records.append(record)
+                key = record.overall_status or 'unclassified'
+                counts[key] = counts.get(key, 0) + 1
+
+            if not dry_run:
+                with transaction.atomic():
+                    LabResult.objects.bulk_create(
+                        records,
+                        update_conflicts=True,
+                        unique_fields=['test'],
+                        update_fields=['flags', 'overall_status', 'evaluated_at'],
+                    )
+            evaluated += len(chunk)
+            self.stdout.write(f'  Evaluated {evaluated} test(s) (up to id {last_id})')
+
+        for overall_status, count in sorted(counts.items()):
+            self.stdout.write(f'  {overall_status}: {count}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'\nDry run: {evaluated} result(s) would be evaluated'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Evaluated {evaluated} result(s)'))
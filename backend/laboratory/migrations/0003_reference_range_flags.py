@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0002_labtest_rejected_at_labtest_rejected_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labresult',
+            name='evaluated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='labresult',
+            name='flags',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['overall_status'], name='lab_results_overall_959f52_idx'),
+        ),
+    ]
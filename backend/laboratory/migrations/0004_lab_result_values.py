@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0008_medicalhistory_normalized_allergies'),
+        ('laboratory', '0003_reference_range_flags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabResultValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analyte_code', models.CharField(max_length=50)),
+                ('analyte_name', models.CharField(max_length=200)),
+                ('value', models.CharField(max_length=255)),
+                ('numeric_value', models.FloatField(blank=True, null=True)),
+                ('unit', models.CharField(blank=True, max_length=50)),
+                ('flag', models.CharField(blank=True, choices=[('normal', 'Normal'), ('low', 'Low'), ('high', 'High'), ('critical', 'Critical')], max_length=20)),
+                ('reference_low', models.FloatField(blank=True, null=True)),
+                ('reference_high', models.FloatField(blank=True, null=True)),
+                ('observed_at', models.DateTimeField()),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lab_result_values', to='patients.patient')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_values', to='laboratory.labtest')),
+            ],
+            options={
+                'db_table': 'lab_result_values',
+                'ordering': ['observed_at'],
+                'indexes': [models.Index(fields=['patient', 'analyte_code', 'observed_at'], name='lab_result__patient_b76ae6_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='labresultvalue',
+            constraint=models.UniqueConstraint(fields=('test', 'analyte_code'), name='unique_lab_result_value_per_test'),
+        ),
+    ]
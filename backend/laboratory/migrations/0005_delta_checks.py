@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0004_lab_result_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labresult',
+            name='delta_failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='labresult',
+            name='delta_flags',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['delta_failed'], name='lab_results_delta_f_2cf333_idx'),
+        ),
+    ]
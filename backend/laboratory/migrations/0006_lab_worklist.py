@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+def copy_order_priority_ranks(apps, schema_editor):
+    """Copy each order's priority rank onto its tests (routine is the default)."""
+    LabTest = apps.get_model('laboratory', 'LabTest')
+    for priority, rank in (('stat', 0), ('urgent', 1)):
+        LabTest.objects.filter(order__priority=priority).update(priority_rank=rank)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0005_delta_checks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labtest',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.AddIndex(
+            model_name='labtest',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sample_collected', 'processing', 'rejected'])), fields=['priority_rank', 'created_at', 'id'], name='lab_tests_worklist_idx'),
+        ),
+        migrations.RunPython(copy_order_priority_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0006_lab_worklist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyzerMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('protocol', models.CharField(choices=[('hl7', 'HL7 v2'), ('astm', 'ASTM')], max_length=10)),
+                ('source', models.CharField(blank=True, help_text='Peer address or dropped file name', max_length=255)),
+                ('control_id', models.CharField(blank=True, max_length=100)),
+                ('raw', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processed', 'Processed'), ('partial', 'Partially Processed'), ('unmatched', 'Unmatched'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('outcomes', models.JSONField(blank=True, default=list)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'lab_analyzer_messages',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='lab_analyze_status_924f16_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0007_analyzer_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labtest',
+            name='panel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='panel_tests', to='laboratory.labtemplate'),
+        ),
+        migrations.CreateModel(
+            name='LabPanelComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='panels', to='laboratory.labtemplate')),
+                ('panel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='laboratory.labtemplate')),
+            ],
+            options={
+                'db_table': 'lab_panel_components',
+                'ordering': ['panel', 'position', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='labpanelcomponent',
+            constraint=models.UniqueConstraint(fields=('panel', 'component'), name='lab_panel_components_unique'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0008_lab_panels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'lab_accession_counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='labtest',
+            name='accession_number',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+    ]
@@ -27,6 +27,27 @@ class LabTemplate(models.Model):
         return f"{self.code} - {self.name}"
 
 
+class LabPanelComponent(models.Model):
+    """
+    A test included in a panel. Ordering a panel template expands it into
+    one test per component.
+    """
+    
+    panel = models.ForeignKey(LabTemplate, on_delete=models.CASCADE, related_name='components')
+    component = models.ForeignKey(LabTemplate, on_delete=models.CASCADE, related_name='panels')
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'lab_panel_components'
+        ordering = ['panel', 'position', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['panel', 'component'], name='lab_panel_components_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.panel.code} > {self.component.code}"
+
+
 class LabOrder(models.Model):
     """
     Laboratory test order from a doctor/consultation.
@@ -38,6 +59,9 @@ class LabOrder(models.Model):
         ('stat', 'STAT'),
     ]
     
+    # Worklist rank of each priority; lower is worked first
+    PRIORITY_RANKS = {'stat': 0, 'urgent': 1, 'routine': 2}
+    
     order_id = models.CharField(max_length=50, unique=True, db_index=True)
     patient = models.ForeignKey('patients.Patient', on_delete=models.CASCADE, related_name='lab_orders')
     doctor = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='ordered_labs')
@@ -74,12 +98,37 @@ class LabOrder(models.Model):
             import random
             suffix = f"{random.randint(1000, 9999)}"
             self.order_id = f"LAB-{timestamp}-{suffix}"
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        
+        # Keep the worklist rank copied onto the tests in line with the priority
+        if not adding:
+            rank = self.PRIORITY_RANKS.get(self.priority, LabTest.DEFAULT_PRIORITY_RANK)
+            self.tests.exclude(priority_rank=rank).update(priority_rank=rank)
     
     def __str__(self):
         return f"{self.order_id} - {self.patient.get_full_name()}"
 
 
+class AccessionCounter(models.Model):
+    """
+    Last accession sequence number issued on a day.
+    """
+    
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'lab_accession_counters'
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
+
+# Statuses of tests still waiting for bench work
+OPEN_TEST_STATUSES = ['pending', 'sample_collected', 'processing', 'rejected']
+
+
 class LabTest(models.Model):
     """
     Individual test within a lab order.
@@ -99,13 +148,22 @@ class LabTest(models.Model):
         ('outsourced', 'Outsourced'),
     ]
     
+    OPEN_STATUSES = OPEN_TEST_STATUSES
+    DEFAULT_PRIORITY_RANK = LabOrder.PRIORITY_RANKS['routine']
+    
     order = models.ForeignKey(LabOrder, on_delete=models.CASCADE, related_name='tests')
     template = models.ForeignKey(LabTemplate, on_delete=models.PROTECT, related_name='tests', null=True, blank=True)
+    # Panel the test was expanded from, if it was ordered as part of one
+    panel = models.ForeignKey(LabTemplate, on_delete=models.SET_NULL, related_name='panel_tests', null=True, blank=True)
     
     name = models.CharField(max_length=200)
     code = models.CharField(max_length=50)
     sample_type = models.CharField(max_length=50)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Issued when the sample is collected; printed as the sample's barcode
+    accession_number = models.CharField(max_length=20, unique=True, null=True, blank=True)
+    # Copy of the order's priority rank so the worklist sorts on one table
+    priority_rank = models.PositiveSmallIntegerField(default=DEFAULT_PRIORITY_RANK)
     
     # Processing information
     processing_method = models.CharField(max_length=20, choices=PROCESSING_METHOD_CHOICES, blank=True, null=True)
@@ -142,8 +200,19 @@ class LabTest(models.Model):
         indexes = [
             models.Index(fields=['order', 'status']),
             models.Index(fields=['status']),
+            models.Index(
+                fields=['priority_rank', 'created_at', 'id'],
+                name='lab_tests_worklist_idx',
+                condition=models.Q(status__in=OPEN_TEST_STATUSES),
+            ),
         ]
     
+    def save(self, *args, **kwargs):
+        """Take the worklist rank from the order's priority on creation."""
+        if self._state.adding:
+            self.priority_rank = LabOrder.PRIORITY_RANKS.get(self.order.priority, self.DEFAULT_PRIORITY_RANK)
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.code} - {self.name} ({self.order.order_id})"
 
@@ -171,12 +240,108 @@ class LabResult(models.Model):
         ('high', 'High'),
     ], default='medium')
     
+    # Per-analyte reference-range flags: {analyte: {value, flag, low, high, unit}}
+    flags = models.JSONField(default=dict, blank=True)
+    evaluated_at = models.DateTimeField(null=True, blank=True)
+    
+    # Change against the patient's previous result per analyte
+    delta_flags = models.JSONField(default=dict, blank=True)
+    delta_failed = models.BooleanField(default=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'lab_results'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['overall_status']),
+            models.Index(fields=['delta_failed']),
+        ]
     
     def __str__(self):
         return f"Result for {self.test.name} - {self.patient.get_full_name()}"
 
+
+
+class LabResultValue(models.Model):
+    """
+    One analyte value of a submitted test, projected from ``LabTest.results``
+    so cumulative reports read an index instead of parsing every test.
+    Rewritten whenever the test's results are (re)submitted.
+    """
+    
+    FLAG_CHOICES = [
+        ('normal', 'Normal'),
+        ('low', 'Low'),
+        ('high', 'High'),
+        ('critical', 'Critical'),
+    ]
+    
+    test = models.ForeignKey(LabTest, on_delete=models.CASCADE, related_name='result_values')
+    patient = models.ForeignKey('patients.Patient', on_delete=models.CASCADE, related_name='lab_result_values')
+    analyte_code = models.CharField(max_length=50)
+    analyte_name = models.CharField(max_length=200)
+    value = models.CharField(max_length=255)
+    numeric_value = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=50, blank=True)
+    flag = models.CharField(max_length=20, choices=FLAG_CHOICES, blank=True)
+    reference_low = models.FloatField(null=True, blank=True)
+    reference_high = models.FloatField(null=True, blank=True)
+    # Sample collection time, or submission time when collection was not recorded
+    observed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'lab_result_values'
+        ordering = ['observed_at']
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'analyte_code'], name='unique_lab_result_value_per_test'),
+        ]
+        indexes = [
+            models.Index(fields=['patient', 'analyte_code', 'observed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.analyte_code} = {self.value} ({self.observed_at:%Y-%m-%d})"
+
+
+class AnalyzerMessage(models.Model):
+    """
+    A result message received from an analyzer, queued for processing.
+    Receivers store the raw message and acknowledge it at once; a worker
+    later matches its results to tests and writes them in batches.
+    """
+    
+    PROTOCOL_CHOICES = [
+        ('hl7', 'HL7 v2'),
+        ('astm', 'ASTM'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processed', 'Processed'),
+        ('partial', 'Partially Processed'),
+        ('unmatched', 'Unmatched'),
+        ('failed', 'Failed'),
+    ]
+    
+    protocol = models.CharField(max_length=10, choices=PROTOCOL_CHOICES)
+    source = models.CharField(max_length=255, blank=True, help_text="Peer address or dropped file name")
+    control_id = models.CharField(max_length=100, blank=True)
+    raw = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Per-observation outcome: [{order, test, analyte, test_id, success, error}]
+    outcomes = models.JSONField(default=list, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'lab_analyzer_messages'
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_protocol_display()} {self.control_id or self.pk} ({self.status})"
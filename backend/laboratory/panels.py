@@ -0,0 +1,125 @@
+"""
+Lab panel definitions.
+
+A panel is a template with ``LabPanelComponent`` rows naming the templates
+it includes. Ordering a panel creates one test per active component, in
+component order, each recording the panel it came from.
+
+Panel definitions are loaded once per worker process together with the
+component templates' fields, so expanding an order needs no queries. Like
+the compiled reference ranges, they are rebuilt when the shared version key
+in the cache changes; signals bump it whenever a template or panel
+component is written.
+"""
+import logging
+import threading
+
+from common.cache_utils import get_version, bump_version
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'laboratory:panels:version'
+
+
+class PanelIndex:
+    """Component templates of every panel, as rows ready to hydrate."""
+
+    def __init__(self, version, field_names, components):
+        self.version = version
+        self.field_names = field_names
+        # panel template id -> [component template row]
+        self.components = components
+
+    @classmethod
+    def build(cls, version):
+        """Load every panel's active component templates with one query."""
+        from .models import LabTemplate, LabPanelComponent
+
+        field_names = [field.attname for field in LabTemplate._meta.concrete_fields]
+        components = {}
+        rows = LabPanelComponent.objects.filter(component__is_active=True).order_by(
+            'panel_id', 'position', 'id'
+        ).values_list('panel_id', *[f'component__{name}' for name in field_names])
+        for panel_id, *values in rows:
+            components.setdefault(panel_id, []).append(tuple(values))
+
+        logger.info(f"Loaded {len(components)} lab panel(s)")
+        return cls(version, field_names, components)
+
+    def is_panel(self, template_id):
+        return template_id in self.components
+
+    def components_of(self, template_id):
+        """Return fresh ``LabTemplate`` instances for a panel's components."""
+        from .models import LabTemplate
+
+        return [
+            LabTemplate.from_db('default', self.field_names, values)
+            for values in self.components.get(template_id, [])
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's panel definitions, reloading them if outdated."""
+    global _index
+
+    version = get_version(VERSION_CACHE_KEY)
+
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = PanelIndex.build(version)
+            index = _index
+    return index
+
+
+def invalidate_index():
+    """Force every worker to reload panel definitions on next use."""
+    bump_version(VERSION_CACHE_KEY)
+
+
+def _code_key(code):
+    return (code or '').strip().upper()
+
+
+def expand_tests(tests_data):
+    """
+    Expand panel items of an order's ``tests_data`` into their components.
+
+    Each component test takes its name, code and sample type from the
+    component template and its status and notes from the panel item. A test
+    code is ordered once: a component already ordered on its own or through
+    an earlier panel, and a test listed on its own after a panel that
+    includes it, are not added again. Returns a list of test field dicts.
+    """
+    index = get_index()
+    expanded = []
+    seen = set()
+    for test_data in tests_data:
+        template = test_data.get('template')
+        if template is None or not index.is_panel(template.id):
+            code = _code_key(test_data.get('code'))
+            if code and code in seen:
+                continue
+            seen.add(code)
+            expanded.append(test_data)
+            continue
+        for component in index.components_of(template.id):
+            code = _code_key(component.code)
+            if code and code in seen:
+                continue
+            seen.add(code)
+            expanded.append({
+                **{key: value for key, value in test_data.items() if key in ('status', 'notes')},
+                'template': component,
+                'panel': template,
+                'name': component.name,
+                'code': component.code,
+                'sample_type': component.sample_type,
+            })
+    return expanded
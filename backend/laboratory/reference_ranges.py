@@ -0,0 +1,290 @@
+"""
+Reference-range evaluation for the Laboratory app.
+
+``LabTemplate.normal_range`` maps analyte names to their definition::
+
+    {"Hemoglobin": {"unit": "g/dL", "min": "12", "max": "16", "range": "12-16",
+                    "dataType": "numeric",
+                    "critical_low": "7", "critical_high": "20",
+                    "partitions": [
+                        {"sex": "male", "age_min": 18, "min": "13.5", "max": "17.5"},
+                        {"age_max": 18, "min": "11", "max": "15"}
+                    ]}}
+
+``min``/``max`` give the default reference interval and ``critical_low`` /
+``critical_high`` the critical limits. ``partitions`` optionally override
+any of them for a sex and/or an age band in years (``age_min`` inclusive,
+``age_max`` exclusive); the first matching partition wins. An optional
+``code`` names the analyte, otherwise one is derived from its name.
+``delta_absolute`` and ``delta_percent`` set the analyte's delta-check
+thresholds (see ``delta_checks``).
+
+Templates are compiled once per worker process into lookup structures with
+limits already parsed to numbers. The compiled ranges are rebuilt when the
+shared version key in the cache changes; signals bump that key whenever a
+template is written.
+"""
+import logging
+import re
+import threading
+from collections import namedtuple
+
+from django.utils import timezone
+
+from common.cache_utils import get_version, bump_version
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'laboratory:reference_ranges:version'
+
+# Analyte flags, and the overall status they roll up to on the result record
+FLAG_NORMAL = 'normal'
+FLAG_LOW = 'low'
+FLAG_HIGH = 'high'
+FLAG_CRITICAL = 'critical'
+ABNORMAL_FLAGS = (FLAG_LOW, FLAG_HIGH)
+
+_NUMBER_RE = re.compile(r'^\s*(?:[<>]=?|[≤≥])?\s*([-+]?\d*\.?\d+)')
+_CODE_RE = re.compile(r'[^A-Z0-9]+')
+
+Limits = namedtuple('Limits', ['low', 'high', 'critical_low', 'critical_high'])
+Partition = namedtuple('Partition', ['sex', 'age_min', 'age_max', 'limits'])
+
+
+def parse_number(value):
+    """
+    Return the numeric part of a result or limit as a float, or ``None``.
+    Accepts numbers and strings such as ``"5.4"``, ``"1,200"`` or ``"<0.5"``.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.match(str(value).replace(',', ''))
+    return float(match.group(1)) if match else None
+
+
+def analyte_code(name):
+    """Derive a stable analyte code from its display name."""
+    return _CODE_RE.sub('_', str(name).upper()).strip('_')
+
+
+def _limits(definition, fallback=None):
+    """Parse the limits of a definition, inheriting missing ones from ``fallback``."""
+    fallback = fallback or Limits(None, None, None, None)
+    values = []
+    for key, inherited in zip(('min', 'max', 'critical_low', 'critical_high'), fallback):
+        value = parse_number(definition.get(key)) if key in definition else None
+        values.append(value if value is not None else inherited)
+    return Limits(*values)
+
+
+class CompiledAnalyte:
+    """The parsed reference intervals of one analyte."""
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.code = definition.get('code') or analyte_code(name)
+        self.unit = definition.get('unit', '')
+        self.limits = _limits(definition)
+        self.delta_absolute = parse_number(definition.get('delta_absolute'))
+        self.delta_percent = parse_number(definition.get('delta_percent'))
+        self.partitions = []
+        for partition in definition.get('partitions') or []:
+            if not isinstance(partition, dict):
+                continue
+            sex = (partition.get('sex') or '').lower() or None
+            self.partitions.append(Partition(
+                sex,
+                parse_number(partition.get('age_min')),
+                parse_number(partition.get('age_max')),
+                _limits(partition, self.limits),
+            ))
+
+    def limits_for(self, sex=None, age=None):
+        """Return the limits applying to a patient of ``sex`` aged ``age`` years."""
+        for partition in self.partitions:
+            if partition.sex and partition.sex != sex:
+                continue
+            if partition.age_min is not None and (age is None or age < partition.age_min):
+                continue
+            if partition.age_max is not None and (age is None or age >= partition.age_max):
+                continue
+            return partition.limits
+        return self.limits
+
+    def evaluate(self, value, sex=None, age=None):
+        """
+        Flag a result value. Returns an entry dict for the value, whose
+        ``flag`` is ``None`` when the value is not numeric or no limit applies.
+        """
+        limits = self.limits_for(sex, age)
+        number = parse_number(value)
+        flag = None
+        if number is not None:
+            if (limits.critical_low is not None and number < limits.critical_low) or (
+                limits.critical_high is not None and number > limits.critical_high
+            ):
+                flag = FLAG_CRITICAL
+            elif limits.low is not None and number < limits.low:
+                flag = FLAG_LOW
+            elif limits.high is not None and number > limits.high:
+                flag = FLAG_HIGH
+            elif limits.low is not None or limits.high is not None:
+                flag = FLAG_NORMAL
+        return {
+            'code': self.code,
+            'value': value,
+            'numeric': number,
+            'unit': self.unit,
+            'flag': flag,
+            'low': limits.low,
+            'high': limits.high,
+            'delta_absolute': self.delta_absolute,
+            'delta_percent': self.delta_percent,
+        }
+
+
+class ReferenceRangeIndex:
+    """Compiled analytes of every template, by template id and by code."""
+
+    def __init__(self, version, by_id, by_code):
+        self.version = version
+        # template id / code -> {normalized analyte name -> CompiledAnalyte}
+        self.by_id = by_id
+        self.by_code = by_code
+
+    @classmethod
+    def build(cls, version):
+        """Compile every template's reference ranges with one query."""
+        from .models import LabTemplate
+
+        by_id = {}
+        by_code = {}
+        for template_id, code, normal_range in LabTemplate.objects.values_list('id', 'code', 'normal_range'):
+            analytes = {}
+            if isinstance(normal_range, dict):
+                for name, definition in normal_range.items():
+                    if isinstance(definition, dict):
+                        analytes[str(name).strip().lower()] = CompiledAnalyte(name, definition)
+            by_id[template_id] = analytes
+            by_code[code] = analytes
+
+        logger.info(f"Compiled reference ranges of {len(by_id)} lab template(s)")
+        return cls(version, by_id, by_code)
+
+    def analytes_for(self, test):
+        """Return the compiled analytes for a test, matched by template or code."""
+        if test.template_id is not None and test.template_id in self.by_id:
+            return self.by_id[test.template_id]
+        return self.by_code.get(test.code, {})
+
+    def evaluate(self, test, sex=None, age=None):
+        """
+        Evaluate every value in ``test.results``.
+        Returns ``({analyte name: entry}, overall_status)``; ``overall_status``
+        is blank when no value could be evaluated.
+        """
+        results = test.results if isinstance(test.results, dict) else {}
+        analytes = self.analytes_for(test)
+
+        entries = {}
+        for name, value in results.items():
+            if value is None or value == '':
+                continue
+            analyte = analytes.get(str(name).strip().lower())
+            if analyte is None:
+                number = parse_number(value)
+                entries[name] = {
+                    'code': analyte_code(name), 'value': value, 'numeric': number,
+                    'unit': '', 'flag': None, 'low': None, 'high': None,
+                    'delta_absolute': None, 'delta_percent': None,
+                }
+            else:
+                entries[name] = analyte.evaluate(value, sex, age)
+        return entries, overall_status([entry['flag'] for entry in entries.values()])
+
+
+def overall_status(flags):
+    """Roll analyte flags up to a result's ``overall_status``."""
+    flags = set(flags)
+    if FLAG_CRITICAL in flags:
+        return 'critical'
+    if flags & set(ABNORMAL_FLAGS):
+        return 'abnormal'
+    if FLAG_NORMAL in flags:
+        return 'normal'
+    return ''
+
+
+def age_on(date_of_birth, on_date):
+    """Age in whole years on a date."""
+    if date_of_birth is None:
+        return None
+    return on_date.year - date_of_birth.year - (
+        (on_date.month, on_date.day) < (date_of_birth.month, date_of_birth.day)
+    )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's compiled reference ranges, rebuilding them if outdated."""
+    global _index
+
+    version = get_version(VERSION_CACHE_KEY)
+
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = ReferenceRangeIndex.build(version)
+            index = _index
+    return index
+
+
+def invalidate_index():
+    """Force every worker to recompile reference ranges on the next evaluation."""
+    bump_version(VERSION_CACHE_KEY)
+
+
+def evaluate_tests(tests):
+    """
+    Evaluate the results of several tests against their reference ranges.
+
+    Patient sex and date of birth are loaded with one query; age is taken on
+    the collection date (or today). Returns
+    ``{test id: ({analyte name: entry}, overall_status)}``.
+    """
+    from patients.models import Patient
+
+    tests = list(tests)
+    patient_ids = {test.order.patient_id for test in tests}
+    patients = {
+        row['id']: row
+        for row in Patient.objects.filter(id__in=patient_ids).values('id', 'gender', 'date_of_birth')
+    }
+
+    index = get_index()
+    today = timezone.now().date()
+    evaluations = {}
+    for test in tests:
+        patient = patients.get(test.order.patient_id, {})
+        on_date = timezone.localdate(test.collected_at) if test.collected_at else today
+        evaluations[test.id] = index.evaluate(
+            test,
+            sex=(patient.get('gender') or '').lower() or None,
+            age=age_on(patient.get('date_of_birth'), on_date),
+        )
+    return evaluations
+
+
+def result_flags(entries):
+    """The entries stored on ``LabResult.flags``: only values that were evaluated."""
+    return {
+        name: {key: entry[key] for key in ('value', 'flag', 'low', 'high', 'unit')}
+        for name, entry in entries.items()
+        if entry['flag'] is not None
+    }
@@ -1,13 +1,31 @@
 """
 Serializers for the Laboratory app.
 """
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from .models import LabTemplate, LabOrder, LabTest, LabResult
+from .models import (
+    LabTemplate, LabPanelComponent, LabOrder, LabTest, LabResult, LabResultValue, AnalyzerMessage,
+)
+from .panels import expand_tests
+
+
+class LabPanelComponentSerializer(serializers.ModelSerializer):
+    """Serializer for LabPanelComponent model."""
+    
+    component_code = serializers.CharField(source='component.code', read_only=True)
+    component_name = serializers.CharField(source='component.name', read_only=True)
+    
+    class Meta:
+        model = LabPanelComponent
+        fields = ['id', 'component', 'component_code', 'component_name', 'position']
 
 
 class LabTemplateSerializer(serializers.ModelSerializer):
     """Serializer for LabTemplate model."""
     
+    components = LabPanelComponentSerializer(many=True, read_only=True)
+    
     class Meta:
         model = LabTemplate
         fields = '__all__'
@@ -155,14 +173,22 @@ class LabOrderSerializer(serializers.ModelSerializer):
         return value
     
     def create(self, validated_data):
-        """Create lab order with nested tests."""
-        tests_data = validated_data.pop('tests_data', [])
-        order = LabOrder.objects.create(**validated_data)
-        
-        # Create lab tests
-        for test_data in tests_data:
-            LabTest.objects.create(order=order, **test_data)
+        """
+        Create lab order with nested tests. Panels are expanded into their
+        component tests and all tests are inserted with one query; the
+        returned order has them prefetched, with their templates, so it
+        serializes with one more query.
+        """
+        tests_data = expand_tests(validated_data.pop('tests_data', []))
+        with transaction.atomic():
+            order = LabOrder.objects.create(**validated_data)
+            # bulk_create bypasses LabTest.save, so copy the worklist rank here
+            rank = LabOrder.PRIORITY_RANKS.get(order.priority, LabTest.DEFAULT_PRIORITY_RANK)
+            LabTest.objects.bulk_create(
+                [LabTest(order=order, priority_rank=rank, **test_data) for test_data in tests_data]
+            )
         
+        prefetch_related_objects([order], Prefetch('tests', queryset=LabTest.objects.select_related('template')))
         return order
     
     class Meta:
@@ -211,5 +237,20 @@ class LabResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = LabResult
         fields = '__all__'
-        read_only_fields = ['created_at']
+        read_only_fields = ['flags', 'delta_flags', 'delta_failed', 'evaluated_at', 'created_at']
+
+
+class LabResultValueSerializer(serializers.ModelSerializer):
+    """Serializer for LabResultValue model."""
+    
+    class Meta:
+        model = LabResultValue
+        fields = '__all__'
 
+
+class AnalyzerMessageSerializer(serializers.ModelSerializer):
+    """Serializer for AnalyzerMessage model."""
+    
+    class Meta:
+        model = AnalyzerMessage
+        fields = '__all__'
@@ -0,0 +1,341 @@
+"""
+Services for the Laboratory app.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import LabTest, LabResult, LabResultValue
+from .accessioning import issue_accession_numbers
+from .delta_checks import check_deltas
+from .reference_ranges import evaluate_tests, result_flags
+
+logger = logging.getLogger(__name__)
+
+
+class LabWorkflowError(Exception):
+    """Raised when a batch workflow request is malformed as a whole."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or []
+
+
+class LabWorkflowService:
+    """
+    Batch workflow transitions for lab tests.
+
+    Each batch locks and loads every referenced test with one query, checks
+    the state transition per test, writes the valid ones with
+    ``bulk_update`` and reports an outcome for every item. Invalid items do
+    not prevent the valid ones from being applied.
+    """
+
+    # action -> (statuses a test may be in, status it moves to)
+    TRANSITIONS = {
+        'collect_sample': (['pending', 'rejected'], 'sample_collected'),
+        'process': (['sample_collected'], 'processing'),
+        'submit_results': (['sample_collected', 'processing', 'results_ready', 'rejected'], 'results_ready'),
+        'verify': (['results_ready'], 'verified'),
+    }
+
+    @staticmethod
+    def parse_items(items, defaults=None):
+        """
+        Validate the ``items`` payload: a non-empty list of objects with a
+        ``test_id``. Shared ``defaults`` are merged under each item.
+        Returns ``{test_id: payload}`` in request order.
+        """
+        if not isinstance(items, list) or not items:
+            raise LabWorkflowError('items must be a non-empty list')
+
+        parsed = {}
+        errors = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'error': 'Each item must be an object'})
+                continue
+            try:
+                test_id = int(item.get('test_id'))
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'Invalid test_id'})
+                continue
+            if test_id in parsed:
+                errors.append({'index': index, 'test_id': test_id, 'error': 'Duplicate test_id'})
+                continue
+            parsed[test_id] = {**(defaults or {}), **item}
+
+        if errors:
+            raise LabWorkflowError('Invalid items', details=errors)
+        return parsed
+
+    @staticmethod
+    def _apply(action, payloads, apply_item, fields):
+        """
+        Lock the tests, validate their transition and apply ``apply_item``
+        to each valid one. ``apply_item(test, payload)`` may return an error
+        string to reject the item. Returns ``(applied tests, outcomes)``.
+        """
+        allowed, target = LabWorkflowService.TRANSITIONS[action]
+
+        tests = {
+            test.id: test
+            for test in LabTest.objects.select_for_update(of=('self',)).select_related('order').filter(
+                id__in=list(payloads)
+            )
+        }
+
+        applied = []
+        outcomes = []
+        for test_id, payload in payloads.items():
+            test = tests.get(test_id)
+            if test is None:
+                outcomes.append({'test_id': test_id, 'success': False, 'error': 'Test not found'})
+                continue
+            if test.status not in allowed:
+                outcomes.append({
+                    'test_id': test_id,
+                    'success': False,
+                    'error': f"Test status '{test.status}' does not allow {action}",
+                })
+                continue
+            error = apply_item(test, payload)
+            if error:
+                outcomes.append({'test_id': test_id, 'success': False, 'error': error})
+                continue
+            test.status = target
+            test.updated_at = timezone.now()
+            applied.append(test)
+            outcomes.append({'test_id': test_id, 'success': True, 'status': target})
+
+        LabTest.objects.bulk_update(applied, fields + ['status', 'updated_at'])
+        logger.info(f"Batch {action}: {len(applied)} of {len(payloads)} test(s) applied")
+        return applied, outcomes
+
+    @staticmethod
+    def assign_accession_numbers(tests):
+        """
+        Issue a new accession number to each collected test; a recollected
+        sample is a new specimen and gets a new number.
+        """
+        numbers = issue_accession_numbers(len(tests))
+        for test, number in zip(tests, numbers):
+            test.accession_number = number
+        LabTest.objects.bulk_update(tests, ['accession_number'])
+    
+    @staticmethod
+    def collect_samples(payloads, user):
+        """
+        Mark samples as collected and issue their accession numbers. Items
+        accept ``collection_method`` and ``notes``.
+        """
+        now = timezone.now()
+
+        def apply_item(test, payload):
+            test.collected_by = user
+            test.collected_at = now
+            collection_info = []
+            if payload.get('collection_method'):
+                collection_info.append(f"Method: {payload['collection_method']}")
+            if payload.get('notes'):
+                collection_info.append(f"Notes: {payload['notes']}")
+            if collection_info:
+                test.notes = '\n'.join(collection_info)
+
+        with transaction.atomic():
+            applied, outcomes = LabWorkflowService._apply(
+                'collect_sample', payloads, apply_item, ['collected_by', 'collected_at', 'notes']
+            )
+            LabWorkflowService.assign_accession_numbers(applied)
+        accessions = {test.id: test.accession_number for test in applied}
+        for outcome in outcomes:
+            if outcome['success']:
+                outcome['accession_number'] = accessions[outcome['test_id']]
+        return applied, outcomes
+
+    @staticmethod
+    def process_tests(payloads, user):
+        """Mark tests as processing. Items accept ``processing_method`` and ``outsourced_lab``."""
+        now = timezone.now()
+        methods = [choice for choice, _ in LabTest.PROCESSING_METHOD_CHOICES]
+
+        def apply_item(test, payload):
+            processing_method = payload.get('processing_method')
+            if processing_method not in methods:
+                return f"processing_method must be one of {', '.join(methods)}"
+            test.processing_method = processing_method
+            test.outsourced_lab = payload.get('outsourced_lab', '') if processing_method == 'outsourced' else ''
+            test.processed_by = user
+            test.processed_at = now
+
+        with transaction.atomic():
+            return LabWorkflowService._apply(
+                'process', payloads, apply_item,
+                ['processing_method', 'outsourced_lab', 'processed_by', 'processed_at'],
+            )
+
+    @staticmethod
+    def submit_results(payloads, user):
+        """
+        Store results for tests and upsert their verification records.
+        Items require ``results`` (an object) and accept ``notes``. With
+        ``merge`` the results are added to those already stored and the
+        notes are kept unless given.
+        """
+        def apply_item(test, payload):
+            results = payload.get('results')
+            if not isinstance(results, dict) or not results:
+                return 'results must be a non-empty object'
+            merge = payload.get('merge', False)
+            if merge and isinstance(test.results, dict):
+                results = {**test.results, **results}
+            test.results = results
+            if not merge or 'notes' in payload:
+                test.notes = payload.get('notes', '')
+            # Resubmission of a rejected test clears the rejection
+            if test.status == 'rejected' or test.rejected_by_id is not None:
+                test.rejected_by = None
+                test.rejected_at = None
+                if test.verification_notes and test.verification_notes.startswith('REJECTED:'):
+                    test.verification_notes = ''
+
+        with transaction.atomic():
+            applied, outcomes = LabWorkflowService._apply(
+                'submit_results', payloads, apply_item,
+                ['results', 'notes', 'rejected_by', 'rejected_at', 'verification_notes'],
+            )
+            LabWorkflowService.upsert_result_records(applied)
+        return applied, outcomes
+
+    @staticmethod
+    def result_record(test, evaluation, now, deltas=None):
+        """
+        Build the verification record of a test from its reference-range
+        evaluation and delta checks. Critical results and failed delta
+        checks are raised to high priority.
+        """
+        entries, overall_status = evaluation
+        deltas = deltas or {}
+        failed = any(delta['failed'] for delta in deltas.values())
+        return LabResult(
+            test=test,
+            order_id=test.order_id,
+            patient_id=test.order.patient_id,
+            flags=result_flags(entries),
+            overall_status=overall_status,
+            delta_flags=deltas,
+            delta_failed=failed,
+            priority='high' if overall_status == 'critical' or failed else 'medium',
+            evaluated_at=now,
+        )
+
+    @staticmethod
+    def result_values(test, evaluation, now):
+        """
+        Build the ``LabResultValue`` rows of a test, one per analyte code,
+        observed at sample collection (or when the results were last saved).
+        """
+        entries, _ = evaluation
+        values = {}
+        for name, entry in entries.items():
+            code = entry['code'][:50]
+            if code in values:
+                continue
+            values[code] = LabResultValue(
+                test=test,
+                patient_id=test.order.patient_id,
+                analyte_code=code,
+                analyte_name=str(name)[:200],
+                value=str(entry['value'])[:255],
+                numeric_value=entry['numeric'],
+                unit=(entry['unit'] or '')[:50],
+                flag=entry['flag'] or '',
+                reference_low=entry['low'],
+                reference_high=entry['high'],
+                observed_at=test.collected_at or test.updated_at or now,
+            )
+        return list(values.values())
+
+    @staticmethod
+    def replace_result_values(tests, evaluations, now):
+        """Rewrite the projected analyte values of tests."""
+        LabResultValue.objects.filter(test__in=tests).delete()
+        LabResultValue.objects.bulk_create(
+            [
+                value
+                for test in tests
+                for value in LabWorkflowService.result_values(test, evaluations[test.id], now)
+            ],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def upsert_result_records(tests):
+        """
+        Evaluate the results of tests against their reference ranges,
+        project their analyte values, delta-check those against each
+        patient's previous values and create or refresh the verification
+        records with one upsert.
+        """
+        now = timezone.now()
+        evaluations = evaluate_tests(tests)
+        with transaction.atomic():
+            LabWorkflowService.replace_result_values(tests, evaluations, now)
+            deltas = check_deltas(tests, evaluations)
+            LabResult.objects.bulk_create(
+                [
+                    LabWorkflowService.result_record(test, evaluations[test.id], now, deltas.get(test.id))
+                    for test in tests
+                ],
+                update_conflicts=True,
+                unique_fields=['test'],
+                update_fields=[
+                    'order', 'patient', 'flags', 'overall_status', 'delta_flags', 'delta_failed',
+                    'priority', 'evaluated_at',
+                ],
+            )
+
+    @staticmethod
+    def verify_results(payloads, user):
+        """
+        Verify results. Items accept ``notes``, ``overall_status`` and
+        ``priority``, stored on the test's verification record; without them
+        the values set from the reference-range evaluation are kept.
+        """
+        now = timezone.now()
+        statuses = [choice for choice, _ in LabResult._meta.get_field('overall_status').choices]
+        priorities = [choice for choice, _ in LabResult._meta.get_field('priority').choices]
+        records = {}
+
+        def apply_item(test, payload):
+            record = records.get(test.id)
+            if record is None:
+                return 'Result record not found'
+            overall_status = payload.get('overall_status', record.overall_status or 'normal')
+            priority = payload.get('priority', record.priority)
+            if overall_status not in statuses:
+                return f"overall_status must be one of {', '.join(statuses)}"
+            if priority not in priorities:
+                return f"priority must be one of {', '.join(priorities)}"
+            test.verified_by = user
+            test.verified_at = now
+            test.verification_notes = payload.get('notes', '')
+            record.overall_status = overall_status
+            record.priority = priority
+
+        with transaction.atomic():
+            records.update(
+                (record.test_id, record)
+                for record in LabResult.objects.select_for_update().filter(test_id__in=list(payloads))
+            )
+            applied, outcomes = LabWorkflowService._apply(
+                'verify', payloads, apply_item, ['verified_by', 'verified_at', 'verification_notes']
+            )
+            LabResult.objects.bulk_update(
+                [records[test.id] for test in applied], ['overall_status', 'priority']
+            )
+        return applied, outcomes
@@ -0,0 +1,25 @@
+"""
+Signals keeping laboratory in-memory structures in sync.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import LabTemplate, LabPanelComponent
+from . import panels, reference_ranges
+
+
+@receiver(post_save, sender=LabTemplate)
+@receiver(post_delete, sender=LabTemplate)
+def invalidate_reference_ranges(sender, **kwargs):
+    """Have workers recompile reference ranges once the change commits."""
+    transaction.on_commit(reference_ranges.invalidate_index)
+
+
+@receiver(post_save, sender=LabTemplate)
+@receiver(post_delete, sender=LabTemplate)
+@receiver(post_save, sender=LabPanelComponent)
+@receiver(post_delete, sender=LabPanelComponent)
+def invalidate_panels(sender, **kwargs):
+    """Have workers reload panel definitions once the change commits."""
+    transaction.on_commit(panels.invalidate_index)
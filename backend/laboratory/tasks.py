@@ -0,0 +1,12 @@
+"""
+Celery tasks for the Laboratory app.
+"""
+from celery import shared_task
+
+from . import analyzer
+
+
+@shared_task(ignore_result=True)
+def process_analyzer_messages():
+    """Drain the analyzer message queue, writing results in batches."""
+    analyzer.process_queue()
@@ -0,0 +1,91 @@
+"""
+Tests for the Laboratory app.
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .analyzer import AnalyzerMessageError, parse_message, split_messages
+from .panels import PanelIndex, expand_tests
+
+HL7_MESSAGES = [
+    'MSH|^~\\&|ANALYZER|LAB|EMR|HOSP|20240101120000||ORU^R01|MSG1|P|2.5\r'
+    'OBR|1|ORD1||GLU\r'
+    'OBX|1|NM|GLU^Glucose||5.4|mmol/L\r',
+    'MSH|^~\\&|ANALYZER|LAB|EMR|HOSP|20240101120100||ORU^R01|MSG2|P|2.5\r'
+    'OBR|1|ORD2||NA\r'
+    'OBX|1|NM|NA^Sodium||140|mmol/L\r',
+]
+
+ASTM_TRANSMISSIONS = [
+    'H|\\^&|||ANALYZER\rO|1|ORD1||^^^GLU\rR|1|^^^GLU|5.4|mmol/L\rL|1|N\r',
+    'H|\\^&|||ANALYZER\rO|1|ORD2||^^^NA\rR|1|^^^NA|140|mmol/L\rL|1|N\r',
+]
+
+
+class SplitMessagesTests(SimpleTestCase):
+    """split_messages on files with CR, LF and CRLF segment endings."""
+
+    def test_hl7_messages_separated_by_cr(self):
+        messages = split_messages(''.join(HL7_MESSAGES))
+        self.assertEqual(len(messages), 2)
+        self.assertEqual([parse_message(message).control_id for message in messages], ['MSG1', 'MSG2'])
+
+    def test_hl7_messages_separated_by_crlf(self):
+        text = ''.join(HL7_MESSAGES).replace('\r', '\r\n')
+        self.assertEqual(len(split_messages(text)), 2)
+
+    def test_astm_transmissions_separated_by_cr(self):
+        messages = split_messages(''.join(ASTM_TRANSMISSIONS))
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(
+            [[obs.order_ref for obs in parse_message(message).observations] for message in messages],
+            [['ORD1'], ['ORD2']],
+        )
+
+    def test_astm_transmissions_separated_by_lf(self):
+        text = ''.join(ASTM_TRANSMISSIONS).replace('\r', '\n')
+        self.assertEqual(len(split_messages(text)), 2)
+
+
+class ParseMessageTests(SimpleTestCase):
+    """parse_message on truncated frames."""
+
+    def test_truncated_headers_are_rejected(self):
+        for raw, protocol in [
+            ('MSH', None), ('MSH\r', None), ('\x0bMSH\r\x1c\r', None), ('H', 'astm'), ('\x02H\r', 'astm'),
+        ]:
+            with self.subTest(raw=raw), self.assertRaises(AnalyzerMessageError):
+                parse_message(raw, protocol)
+
+
+class ExpandTestsTests(SimpleTestCase):
+    """expand_tests against a hand-built panel index."""
+
+    def setUp(self):
+        # Panel 10 (U&E) holds sodium (1) and potassium (2)
+        index = PanelIndex(
+            version='test',
+            field_names=['id', 'name', 'code', 'sample_type'],
+            components={10: [(1, 'Sodium', 'NA', 'Blood'), (2, 'Potassium', 'K', 'Blood')]},
+        )
+        patcher = mock.patch('laboratory.panels.get_index', return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.panel = SimpleNamespace(id=10)
+
+    def test_component_ordered_on_its_own_first_is_not_repeated(self):
+        tests = expand_tests([
+            {'name': 'Sodium', 'code': 'NA', 'sample_type': 'Blood', 'template': SimpleNamespace(id=1)},
+            {'name': 'U&E', 'code': 'UE', 'sample_type': 'Blood', 'template': self.panel},
+        ])
+        self.assertEqual([test['code'] for test in tests], ['NA', 'K'])
+
+    def test_test_ordered_on_its_own_after_its_panel_is_not_repeated(self):
+        tests = expand_tests([
+            {'name': 'U&E', 'code': 'UE', 'sample_type': 'Blood', 'template': self.panel},
+            {'name': 'Potassium', 'code': 'k', 'sample_type': 'Blood'},
+            {'name': 'Glucose', 'code': 'GLU', 'sample_type': 'Blood'},
+        ])
+        self.assertEqual([test['code'] for test in tests], ['NA', 'K', 'GLU'])
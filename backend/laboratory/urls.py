@@ -3,13 +3,18 @@ URL configuration for the Laboratory app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LabTemplateViewSet, LabOrderViewSet, LabTestViewSet, LabResultViewSet
+from .views import (
+    LabTemplateViewSet, LabOrderViewSet, LabTestViewSet, LabResultViewSet, LabResultValueViewSet,
+    AnalyzerMessageViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'templates', LabTemplateViewSet, basename='lab-template')
 router.register(r'orders', LabOrderViewSet, basename='lab-order')
 router.register(r'tests', LabTestViewSet, basename='lab-test')
 router.register(r'verification', LabResultViewSet, basename='lab-result')
+router.register(r'result-values', LabResultValueViewSet, basename='lab-result-value')
+router.register(r'analyzer-messages', AnalyzerMessageViewSet, basename='lab-analyzer-message')
 
 urlpatterns = [
     path('laboratory/', include(router.urls)),
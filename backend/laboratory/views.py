@@ -7,15 +7,50 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from .models import LabTemplate, LabOrder, LabTest, LabResult
+from common.pagination import InvalidCursor, keyset_page, parse_cursor_datetime
+
+from .models import LabTemplate, LabOrder, LabTest, LabResult, LabResultValue, AnalyzerMessage
 from .serializers import (
     LabTemplateSerializer,
     LabOrderSerializer,
     LabTestSerializer,
     LabResultSerializer,
+    LabResultValueSerializer,
+    AnalyzerMessageSerializer,
 )
+from .services import LabWorkflowService, LabWorkflowError
+from .labels import OUTPUT_FORMATS, render_sheet
+
+
+def run_batch(request, operation, shared_fields):
+    """
+    Run a batch workflow operation over ``request.data['items']``.
+    
+    Fields in ``shared_fields`` given at the top level of the request apply
+    to every item unless the item overrides them. Responds with an outcome
+    per item.
+    """
+    defaults = {field: request.data[field] for field in shared_fields if field in request.data}
+    try:
+        payloads = LabWorkflowService.parse_items(request.data.get('items'), defaults)
+    except LabWorkflowError as e:
+        payload = {'error': e.message}
+        if e.details:
+            payload['details'] = e.details
+        return Response(payload, status=e.status_code)
+    
+    applied, outcomes = operation(payloads, request.user)
+    return Response({
+        'succeeded': len(applied),
+        'failed': len(outcomes) - len(applied),
+        'results': outcomes,
+    })
 
 
 class LabTemplateViewSet(viewsets.ModelViewSet):
@@ -30,7 +65,7 @@ class LabTemplateViewSet(viewsets.ModelViewSet):
     ordering = ['name']
     
     def get_queryset(self):
-        return LabTemplate.objects.filter(is_active=True)
+        return LabTemplate.objects.filter(is_active=True).prefetch_related('components__component')
 
 
 class LabOrderViewSet(viewsets.ModelViewSet):
@@ -73,7 +108,9 @@ class LabOrderViewSet(viewsets.ModelViewSet):
             if collection_info:
                 test.notes = '\n'.join(collection_info)
             
-            test.save()
+            with transaction.atomic():
+                test.save()
+                LabWorkflowService.assign_accession_numbers([test])
             return Response(LabTestSerializer(test).data)
         except LabTest.DoesNotExist:
             return Response({'error': 'Test not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -129,14 +166,8 @@ class LabOrderViewSet(viewsets.ModelViewSet):
             
             test.save()
             
-            # Create or update result record for verification
-            LabResult.objects.update_or_create(
-                test=test,
-                defaults={
-                    'order': order,
-                    'patient': order.patient,
-                }
-            )
+            # Flag the results and create or update the record for verification
+            LabWorkflowService.upsert_result_records([test])
             
             return Response(LabTestSerializer(test).data)
         except LabTest.DoesNotExist:
@@ -149,7 +180,7 @@ class LabTestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = LabTestSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['order', 'status', 'processing_method']
+    filterset_fields = ['order', 'status', 'processing_method', 'accession_number']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
     
@@ -163,6 +194,173 @@ class LabTestViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    WORKLIST_ORDERING = ['priority_rank', 'created_at', 'id']
+    WORKLIST_DEFAULT_LIMIT = 50
+    WORKLIST_MAX_LIMIT = 200
+    
+    @action(detail=False, methods=['get'])
+    def worklist(self, request):
+        """
+        Bench worklist of open tests: STAT, then urgent, then routine, oldest
+        first within each priority.
+        
+        Query params: ``status`` and ``sample_type`` (comma-separated),
+        ``priority``, ``limit`` and ``cursor`` (the ``next_cursor`` of the
+        previous page). Rows are flagged ``overdue`` once they have waited
+        longer than the SLA for their priority.
+        """
+        queryset = LabTest.objects.filter(status__in=LabTest.OPEN_STATUSES)
+        
+        statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+        if statuses:
+            invalid = set(statuses) - set(LabTest.OPEN_STATUSES)
+            if invalid:
+                return Response(
+                    {'error': f"status must be among {', '.join(LabTest.OPEN_STATUSES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(status__in=statuses)
+        
+        sample_types = [value for value in request.query_params.get('sample_type', '').split(',') if value]
+        if sample_types:
+            queryset = queryset.filter(sample_type__in=sample_types)
+        
+        priority = request.query_params.get('priority')
+        if priority:
+            if priority not in LabOrder.PRIORITY_RANKS:
+                return Response({'error': 'Invalid priority'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(priority_rank=LabOrder.PRIORITY_RANKS[priority])
+        
+        try:
+            limit = min(int(request.query_params.get('limit', self.WORKLIST_DEFAULT_LIMIT)), self.WORKLIST_MAX_LIMIT)
+        except ValueError:
+            limit = self.WORKLIST_DEFAULT_LIMIT
+        limit = max(limit, 1)
+        
+        try:
+            rows, next_cursor = keyset_page(
+                queryset.values(
+                    'id', 'code', 'name', 'sample_type', 'status', 'priority_rank', 'created_at',
+                    'order__order_id', 'order__patient_id', 'order__patient__patient_id',
+                    'order__patient__first_name', 'order__patient__middle_name', 'order__patient__surname',
+                ),
+                self.WORKLIST_ORDERING,
+                (int, parse_cursor_datetime, int),
+                cursor=request.query_params.get('cursor'),
+                limit=limit,
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        priorities = {rank: priority for priority, rank in LabOrder.PRIORITY_RANKS.items()}
+        results = []
+        for row in rows:
+            priority = priorities.get(row['priority_rank'], 'routine')
+            waiting_minutes = int((now - row['created_at']).total_seconds() // 60)
+            sla_minutes = settings.LAB_WORKLIST_SLA_MINUTES.get(priority)
+            name_parts = [row['order__patient__first_name'], row['order__patient__middle_name'], row['order__patient__surname']]
+            results.append({
+                'id': row['id'],
+                'code': row['code'],
+                'name': row['name'],
+                'sample_type': row['sample_type'],
+                'status': row['status'],
+                'priority': priority,
+                'order_id': row['order__order_id'],
+                'patient_id': row['order__patient_id'],
+                'patient_number': row['order__patient__patient_id'],
+                'patient_name': ' '.join(part for part in name_parts if part),
+                'created_at': row['created_at'],
+                'waiting_minutes': waiting_minutes,
+                'overdue': sla_minutes is not None and waiting_minutes > sla_minutes,
+            })
+        
+        return Response({'results': results, 'next_cursor': next_cursor})
+    
+    @action(detail=False, methods=['get'], url_path=r'accession/(?P<accession_number>[^/.]+)')
+    def by_accession(self, request, accession_number=None):
+        """Resolve a scanned sample barcode to its test."""
+        test = self.get_queryset().filter(accession_number=accession_number.strip().upper()).first()
+        if test is None:
+            return Response({'error': 'No sample with this accession number'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(test).data)
+    
+    LABELS_MAX_TESTS = 200
+    
+    @action(detail=False, methods=['post'])
+    def labels(self, request):
+        """
+        Render barcode labels for a batch of collected tests.
+        
+        Expects ``test_ids``; ``output`` is ``png`` (one sheet, ``columns``
+        labels wide, default 2) or ``pdf`` (one label per page).
+        """
+        test_ids = request.data.get('test_ids')
+        if not isinstance(test_ids, list) or not test_ids:
+            return Response({'error': 'test_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(test_ids) > self.LABELS_MAX_TESTS:
+            return Response(
+                {'error': f'At most {self.LABELS_MAX_TESTS} labels per request'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        output = request.data.get('output', 'png')
+        if output not in OUTPUT_FORMATS:
+            return Response(
+                {'error': f"output must be one of {', '.join(OUTPUT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            test_ids = [int(test_id) for test_id in test_ids]
+            columns = int(request.data.get('columns', 2))
+        except (TypeError, ValueError):
+            return Response({'error': 'test_ids and columns must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        tests = LabTest.objects.select_related('order__patient').in_bulk(test_ids)
+        missing = [test_id for test_id in test_ids if test_id not in tests]
+        if missing:
+            return Response({'error': 'Tests not found', 'test_ids': missing}, status=status.HTTP_404_NOT_FOUND)
+        unlabelled = [test_id for test_id in test_ids if not tests[test_id].accession_number]
+        if unlabelled:
+            return Response(
+                {'error': 'Samples not collected yet', 'test_ids': unlabelled},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        content, content_type = render_sheet([tests[test_id] for test_id in test_ids], output, columns)
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'inline; filename="lab-labels.{output}"'
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def batch_collect_sample(self, request):
+        """
+        Mark samples as collected for several tests, across orders.
+        
+        Expects ``items``: a list of ``{test_id, collection_method, notes}``;
+        ``collection_method`` and ``notes`` may also be given once for all.
+        """
+        return run_batch(request, LabWorkflowService.collect_samples, ['collection_method', 'notes'])
+    
+    @action(detail=False, methods=['post'])
+    def batch_process(self, request):
+        """
+        Mark several tests as processing.
+        
+        Expects ``items``: a list of ``{test_id, processing_method, outsourced_lab}``;
+        shared values may be given at the top level.
+        """
+        return run_batch(request, LabWorkflowService.process_tests, ['processing_method', 'outsourced_lab'])
+    
+    @action(detail=False, methods=['post'])
+    def batch_submit_results(self, request):
+        """
+        Submit results for several tests.
+        
+        Expects ``items``: a list of ``{test_id, results, notes}``.
+        """
+        return run_batch(request, LabWorkflowService.submit_results, ['notes'])
+    
     def perform_update(self, serializer):
         """Handle status changes, especially rejection."""
         instance = serializer.instance
@@ -191,7 +389,7 @@ class LabResultViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = LabResultSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['patient', 'overall_status', 'priority']
+    filterset_fields = ['patient', 'overall_status', 'priority', 'delta_failed']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
     
@@ -213,9 +411,120 @@ class LabResultViewSet(viewsets.ReadOnlyModelViewSet):
         test.verification_notes = request.data.get('notes', '')
         test.save()
         
-        result.overall_status = request.data.get('overall_status', 'normal')
-        result.priority = request.data.get('priority', 'medium')
+        # Keep the status and priority from the reference-range evaluation unless overridden
+        result.overall_status = request.data.get('overall_status', result.overall_status or 'normal')
+        result.priority = request.data.get('priority', result.priority)
         result.save()
         
         return Response(LabResultSerializer(result).data)
+    
+    @action(detail=False, methods=['post'])
+    def batch_verify(self, request):
+        """
+        Verify several results.
+        
+        Expects ``items``: a list of ``{test_id, overall_status, priority, notes}``;
+        shared values may be given at the top level.
+        """
+        return run_batch(request, LabWorkflowService.verify_results, ['overall_status', 'priority', 'notes'])
+
+
+class LabResultValueViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for per-analyte result values and cumulative reports."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = LabResultValueSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['patient', 'test', 'analyte_code', 'flag']
+    ordering_fields = ['observed_at']
+    ordering = ['-observed_at']
+    
+    # Results that are reported; rejected or unsubmitted tests are left out
+    REPORTED_STATUSES = ['results_ready', 'verified']
+    
+    def get_queryset(self):
+        return LabResultValue.objects.filter(test__status__in=self.REPORTED_STATUSES)
+    
+    @action(detail=False, methods=['get'])
+    def cumulative(self, request):
+        """
+        Cumulative report: a time series per analyte for one patient.
+        
+        Query params: ``patient`` (required), ``analytes`` (comma-separated
+        codes), ``date_from`` and ``date_to`` (YYYY-MM-DD), ``verified_only``.
+        """
+        patient_id = request.query_params.get('patient')
+        if not patient_id or not patient_id.isdigit():
+            return Response({'error': 'patient is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = LabResultValue.objects.filter(patient_id=int(patient_id))
+        if request.query_params.get('verified_only', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.filter(test__status='verified')
+        else:
+            queryset = queryset.filter(test__status__in=self.REPORTED_STATUSES)
+        
+        analytes = [code.strip() for code in request.query_params.get('analytes', '').split(',') if code.strip()]
+        if analytes:
+            queryset = queryset.filter(analyte_code__in=analytes)
+        
+        for param, lookup in (('date_from', 'observed_at__date__gte'), ('date_to', 'observed_at__date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_date(value)
+                if parsed is None:
+                    return Response({'error': f'{param} must be a date in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{lookup: parsed})
+        
+        series = {}
+        for row in queryset.order_by('analyte_code', 'observed_at').values(
+            'analyte_code', 'analyte_name', 'unit', 'value', 'numeric_value', 'flag',
+            'reference_low', 'reference_high', 'observed_at', 'test_id',
+        ):
+            entry = series.get(row['analyte_code'])
+            if entry is None:
+                entry = series[row['analyte_code']] = {
+                    'analyte_code': row['analyte_code'],
+                    'analyte_name': row['analyte_name'],
+                    'unit': row['unit'],
+                    'points': [],
+                }
+            # The latest name and unit label the series
+            entry['analyte_name'] = row['analyte_name']
+            entry['unit'] = row['unit'] or entry['unit']
+            entry['points'].append({
+                'observed_at': row['observed_at'],
+                'value': row['value'],
+                'numeric_value': row['numeric_value'],
+                'flag': row['flag'],
+                'reference_low': row['reference_low'],
+                'reference_high': row['reference_high'],
+                'test_id': row['test_id'],
+            })
+        
+        return Response({'patient': int(patient_id), 'series': list(series.values())})
 
+
+class AnalyzerMessageViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for reviewing analyzer messages and re-queueing failed ones."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = AnalyzerMessageSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status', 'protocol']
+    ordering_fields = ['received_at']
+    ordering = ['-received_at']
+    
+    def get_queryset(self):
+        return AnalyzerMessage.objects.all()
+    
+    @action(detail=True, methods=['post'])
+    def requeue(self, request, pk=None):
+        """Queue a message again, e.g. after the missing order was registered."""
+        message = self.get_object()
+        if message.status in ('queued', 'processed'):
+            return Response({'error': f'Message is {message.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        message.status = 'queued'
+        message.attempts = 0
+        message.error = ''
+        message.save(update_fields=['status', 'attempts', 'error'])
+        return Response(AnalyzerMessageSerializer(message).data)
@@ -22,10 +22,19 @@ class NotificationService:
         return preferences
     
     @staticmethod
-    def should_send_notification(user, notification_type: str, priority: str) -> bool:
-        """Check if notification should be sent based on user preferences."""
+    def should_send_notification(
+        user,
+        notification_type: str,
+        priority: str,
+        preferences: Optional[NotificationPreferences] = None,
+    ) -> bool:
+        """
+        Check if notification should be sent based on user preferences.
+        
+        ``preferences`` may be passed when already loaded, to avoid a query.
+        """
         try:
-            prefs = NotificationService.get_or_create_preferences(user)
+            prefs = preferences or NotificationService.get_or_create_preferences(user)
             
             # Check if in-app notifications are enabled
             if not prefs.in_app_enabled:
@@ -142,6 +151,51 @@ class NotificationService:
         
         return notifications
     
+    @staticmethod
+    def notify_role_bulk(role_name: str, payloads: List[dict]) -> List[Notification]:
+        """
+        Create several notifications for every active user with a role.
+        
+        Each payload is a dict with ``title`` and ``message`` and optionally
+        ``notification_type``, ``priority``, ``action_url``, ``object_type``,
+        ``object_id`` and ``metadata``. Users and their preferences are loaded
+        in one query and all notifications are written with one bulk_create.
+        """
+        if not payloads:
+            return []
+        
+        users = User.objects.filter(
+            system_role=role_name, is_active=True
+        ).select_related('notification_preferences')
+        
+        notifications = []
+        for user in users:
+            try:
+                preferences = user.notification_preferences
+            except NotificationPreferences.DoesNotExist:
+                # Unsaved defaults; nothing to store until the user changes them
+                preferences = NotificationPreferences(user=user)
+            for payload in payloads:
+                notification_type = payload.get('notification_type', 'system')
+                priority = payload.get('priority', 'normal')
+                if not NotificationService.should_send_notification(user, notification_type, priority, preferences):
+                    continue
+                notifications.append(Notification(
+                    user=user,
+                    title=payload['title'],
+                    message=payload['message'],
+                    type=notification_type,
+                    priority=priority,
+                    action_url=payload.get('action_url', ''),
+                    object_type=payload.get('object_type', ''),
+                    object_id=payload.get('object_id', ''),
+                    metadata=payload.get('metadata') or {},
+                ))
+        
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        logger.info(f"Created {len(notifications)} notifications for role {role_name}")
+        return notifications
+    
     @staticmethod
     def notify_users(
         users: List[User],
@@ -2,7 +2,7 @@
 Admin configuration for the Patients app.
 """
 from django.contrib import admin
-from .models import Patient, Visit, VitalReading, MedicalHistory
+from .models import Patient, Visit, VitalReading, MedicalHistory, PatientDocument
 
 
 @admin.register(Patient)
@@ -69,3 +69,10 @@ class MedicalHistoryAdmin(admin.ModelAdmin):
     search_fields = ['patient__surname', 'patient__first_name']
     readonly_fields = ['updated_at']
 
+
+
+@admin.register(PatientDocument)
+class PatientDocumentAdmin(admin.ModelAdmin):
+    list_display = ['title', 'patient', 'content_type', 'size', 'uploaded_by', 'uploaded_at']
+    search_fields = ['title', 'patient__surname', 'patient__first_name']
+    readonly_fields = ['sha256', 'uploaded_at']
@@ -0,0 +1,78 @@
+"""
+Utility functions for normalizing recorded patient allergies.
+Allergies are captured as free text on the patient and as a list on the
+medical history; checks work on one normalized set built from both.
+"""
+import re
+
+# Entries that record the absence of allergies rather than an allergen
+NO_ALLERGY_ENTRIES = {
+    'none', 'nil', 'nill', 'no', 'n/a', 'na', 'nkda', 'nka',
+    'no known allergies', 'no known allergy', 'no known drug allergies',
+}
+
+_SEPARATOR_RE = re.compile(r'[,;\n]+')
+# "/" also separates allergens ("penicillin/sulfa") but is part of "n/a"
+_SLASH_RE = re.compile(r'/+')
+_SUFFIX_RE = re.compile(r'\s+(allergy|allergies|allergic)$')
+
+
+def normalize_allergy(entry: str) -> str:
+    """
+    Normalize a single allergy entry to a lower-case allergen name.
+    
+    Args:
+        entry: Raw allergy text, e.g. "Penicillin allergy "
+        
+    Returns:
+        Normalized allergen, e.g. "penicillin", or "" if the entry records
+        no allergy.
+    """
+    allergen = ' '.join((entry or '').lower().split())
+    allergen = _SUFFIX_RE.sub('', allergen)
+    if allergen in NO_ALLERGY_ENTRIES:
+        return ''
+    return allergen
+
+
+def split_allergies(text: str) -> list[str]:
+    """
+    Split free text into allergy entries. A part that as a whole records no
+    allergy (e.g. "N/A") is dropped rather than split at its slash.
+    """
+    entries = []
+    for part in _SEPARATOR_RE.split(text):
+        if normalize_allergy(part):
+            entries.extend(_SLASH_RE.split(part))
+    return entries
+
+
+def normalize_allergies(*sources) -> list[str]:
+    """
+    Build a sorted list of unique normalized allergens.
+    
+    Args:
+        sources: Free text (comma/semicolon/newline/slash separated) or lists of
+            strings or dicts with a "name"/"allergen" key.
+        
+    Returns:
+        Sorted list of normalized allergen names.
+    """
+    allergens = set()
+    for source in sources:
+        if not source:
+            continue
+        if isinstance(source, str):
+            entries = split_allergies(source)
+        else:
+            entries = []
+            for item in source:
+                if isinstance(item, dict):
+                    item = item.get('name') or item.get('allergen') or ''
+                if isinstance(item, str):
+                    entries.extend(split_allergies(item))
+        for entry in entries:
+            allergen = normalize_allergy(entry)
+            if allergen:
+                allergens.add(allergen)
+    return sorted(allergens)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:44
+
+from django.db import migrations, models
+
+
+def populate_normalized_allergies(apps, schema_editor):
+    """Build the normalized allergy set for existing medical histories."""
+    from patients.allergy_utils import normalize_allergies
+    
+    MedicalHistory = apps.get_model('patients', 'MedicalHistory')
+    
+    histories = list(MedicalHistory.objects.select_related('patient'))
+    for history in histories:
+        history.normalized_allergies = normalize_allergies(history.allergies, history.patient.allergies)
+    MedicalHistory.objects.bulk_update(histories, ['normalized_allergies'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0007_add_allergies_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalhistory',
+            name='normalized_allergies',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Normalized allergens from this history and the patient record, maintained on save'),
+        ),
+        migrations.RunPython(populate_normalized_allergies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('patients', '0008_medicalhistory_normalized_allergies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('file', models.FileField(upload_to='patients/documents/')),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='patients.patient')),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_patient_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'patient_documents',
+                'ordering': ['-uploaded_at'],
+                'indexes': [models.Index(fields=['patient', '-uploaded_at'], name='patient_doc_patient_1122cf_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def renormalize_allergies(apps, schema_editor):
+    """Rebuild normalized allergies that split "N/A"-style entries into bogus allergens."""
+    from patients.allergy_utils import normalize_allergies
+    
+    MedicalHistory = apps.get_model('patients', 'MedicalHistory')
+    
+    histories = []
+    for history in MedicalHistory.objects.select_related('patient').iterator(chunk_size=500):
+        normalized = normalize_allergies(history.allergies, history.patient.allergies)
+        if normalized != history.normalized_allergies:
+            history.normalized_allergies = normalized
+            histories.append(history)
+    MedicalHistory.objects.bulk_update(histories, ['normalized_allergies'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0009_patient_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(renormalize_allergies, migrations.RunPython.noop),
+    ]
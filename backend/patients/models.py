@@ -269,6 +269,13 @@ class Patient(models.Model):
                     raise ValueError(f"Unable to generate unique patient_id for {self.category}")
         
         super().save(*args, **kwargs)
+        
+        # Keep the normalized allergy set on the medical history in sync
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'allergies' in update_fields:
+            for history in MedicalHistory.objects.filter(patient=self):
+                history.patient = self
+                history.save(update_fields=['normalized_allergies'])
 
 
 class Visit(models.Model):
@@ -445,6 +452,12 @@ class MedicalHistory(models.Model):
     
     # Allergies
     allergies = models.JSONField(default=list, blank=True, help_text="List of allergies")
+    normalized_allergies = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        help_text="Normalized allergens from this history and the patient record, maintained on save"
+    )
     
     # Diagnoses
     diagnoses = models.JSONField(default=list, blank=True, help_text="List of diagnoses with status")
@@ -474,6 +487,59 @@ class MedicalHistory(models.Model):
         db_table = 'medical_history'
         verbose_name_plural = 'Medical Histories'
     
+    def save(self, *args, **kwargs):
+        """Refresh the normalized allergy set from both allergy sources."""
+        from .allergy_utils import normalize_allergies
+        self.normalized_allergies = normalize_allergies(self.allergies, self.patient.allergies)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'normalized_allergies' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['normalized_allergies']
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"Medical History for {self.patient.get_full_name()}"
 
+
+
+class PatientDocument(models.Model):
+    """
+    A file kept on a patient's record, such as a scanned report or an
+    outside referral letter.
+    """
+    
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='documents')
+    title = models.CharField(max_length=200)
+    file = models.FileField(upload_to='patients/documents/')
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    uploaded_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='uploaded_patient_documents'
+    )
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'patient_documents'
+        ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['patient', '-uploaded_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - {self.patient.get_full_name()}"
+    
+    @classmethod
+    def create_from_upload(cls, session, name, size, sha256):
+        """Store a completed chunked upload as a document of the patient given as target."""
+        return cls.objects.create(
+            patient_id=session.target_id,
+            title=session.title or session.filename,
+            file=name,
+            content_type=session.content_type,
+            size=size,
+            sha256=sha256,
+            uploaded_by=session.created_by,
+        )
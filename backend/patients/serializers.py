@@ -2,7 +2,7 @@
 Serializers for the Patients app.
 """
 from rest_framework import serializers
-from .models import Patient, Visit, VitalReading, MedicalHistory
+from .models import Patient, Visit, VitalReading, MedicalHistory, PatientDocument
 
 
 class PatientSerializer(serializers.ModelSerializer):
@@ -154,9 +154,22 @@ class MedicalHistorySerializer(serializers.ModelSerializer):
         model = MedicalHistory
         fields = [
             'id', 'patient', 'patient_name',
-            'allergies', 'diagnoses', 'current_medications',
+            'allergies', 'normalized_allergies', 'diagnoses', 'current_medications',
             'surgical_history', 'family_history', 'social_history',
             'updated_at', 'updated_by',
         ]
-        read_only_fields = ['id', 'updated_at']
+        read_only_fields = ['id', 'normalized_allergies', 'updated_at']
 
+
+class PatientDocumentSerializer(serializers.ModelSerializer):
+    """Serializer for PatientDocument model."""
+    
+    uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True, allow_null=True)
+    
+    class Meta:
+        model = PatientDocument
+        fields = [
+            'id', 'patient', 'title', 'file', 'content_type', 'size', 'sha256',
+            'uploaded_by', 'uploaded_by_name', 'uploaded_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,20 @@
+"""
+Tests for the Patients app.
+"""
+from django.test import SimpleTestCase
+
+from .allergy_utils import normalize_allergies
+
+
+class NormalizeAllergiesTests(SimpleTestCase):
+
+    def test_separators_split_entries(self):
+        self.assertEqual(normalize_allergies('Penicillin; sulfa / Latex allergy'), ['latex', 'penicillin', 'sulfa'])
+
+    def test_no_allergy_entries_are_not_split(self):
+        for text in ('n/a', 'N/A', ' N/A ', 'NKDA'):
+            self.assertEqual(normalize_allergies(text), [], text)
+        self.assertEqual(normalize_allergies(['N/A', {'name': 'n/a'}]), [])
+
+    def test_no_allergy_entry_among_allergens(self):
+        self.assertEqual(normalize_allergies('penicillin, n/a'), ['penicillin'])
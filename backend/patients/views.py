@@ -10,13 +10,14 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.shortcuts import get_object_or_404
 
-from .models import Patient, Visit, VitalReading, MedicalHistory
+from .models import Patient, Visit, VitalReading, MedicalHistory, PatientDocument
 from .serializers import (
     PatientSerializer,
     PatientListSerializer,
     VisitSerializer,
     VitalReadingSerializer,
     MedicalHistorySerializer,
+    PatientDocumentSerializer,
 )
 from audit.services import AuditService
 
@@ -199,3 +200,19 @@ class VitalReadingViewSet(viewsets.ModelViewSet):
         """Set recorded_by when creating a vital reading."""
         serializer.save(recorded_by=self.request.user)
 
+
+class PatientDocumentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for viewing patient documents. Documents are added through the
+    chunked upload API (``common/uploads/`` with target ``patient_document``).
+    """
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = PatientDocumentSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['patient']
+    ordering_fields = ['uploaded_at']
+    ordering = ['-uploaded_at']
+    
+    def get_queryset(self):
+        return PatientDocument.objects.all().select_related('uploaded_by')
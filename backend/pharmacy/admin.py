@@ -2,7 +2,16 @@
 Admin configuration for the Pharmacy app.
 """
 from django.contrib import admin
-from .models import Medication, MedicationInventory, Prescription, PrescriptionItem, Dispense
+from .models import (
+    Medication, MedicationIngredient, DrugInteractionRule, AllergenMapping, MedicationInventory,
+    MedicationStock, MedicationForecast, Prescription, PrescriptionItem, Dispense, StockMovement,
+    StockBalanceSnapshot, InventoryAlert, StockTakeSession, StockTakeCount,
+)
+
+
+class MedicationIngredientInline(admin.TabularInline):
+    model = MedicationIngredient
+    extra = 1
 
 
 @admin.register(Medication)
@@ -10,6 +19,20 @@ class MedicationAdmin(admin.ModelAdmin):
     list_display = ['code', 'name', 'generic_name', 'form', 'is_active', 'created_at']
     list_filter = ['form', 'is_active']
     search_fields = ['name', 'generic_name', 'code']
+    inlines = [MedicationIngredientInline]
+
+
+@admin.register(DrugInteractionRule)
+class DrugInteractionRuleAdmin(admin.ModelAdmin):
+    list_display = ['term_a', 'term_b', 'severity', 'is_active', 'updated_at']
+    list_filter = ['severity', 'is_active']
+    search_fields = ['term_a', 'term_b', 'description']
+
+
+@admin.register(AllergenMapping)
+class AllergenMappingAdmin(admin.ModelAdmin):
+    list_display = ['allergen', 'term']
+    search_fields = ['allergen', 'term']
 
 
 @admin.register(MedicationInventory)
@@ -19,6 +42,65 @@ class MedicationInventoryAdmin(admin.ModelAdmin):
     search_fields = ['medication__name', 'batch_number']
 
 
+@admin.register(MedicationStock)
+class MedicationStockAdmin(admin.ModelAdmin):
+    list_display = ['medication', 'on_hand', 'unexpired_on_hand', 'earliest_expiry', 'batch_count', 'updated_at']
+    search_fields = ['medication__name', 'medication__code']
+    readonly_fields = ['on_hand', 'unexpired_on_hand', 'earliest_expiry', 'batch_count', 'updated_at']
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'medication', 'batch_number', 'movement_type', 'quantity', 'balance_after', 'performed_by']
+    list_filter = ['movement_type', 'created_at']
+    search_fields = ['medication__name', 'batch_number', 'reference']
+    
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockBalanceSnapshot)
+class StockBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['inventory', 'taken_at', 'balance']
+    list_filter = ['taken_at']
+    search_fields = ['inventory__medication__name', 'inventory__batch_number']
+
+
+@admin.register(InventoryAlert)
+class InventoryAlertAdmin(admin.ModelAdmin):
+    list_display = ['inventory', 'alert_type', 'is_active', 'quantity', 'expiry_date', 'first_detected_at', 'resolved_at']
+    list_filter = ['alert_type', 'is_active']
+    search_fields = ['inventory__medication__name', 'inventory__batch_number', 'dedup_key']
+
+
+class StockTakeCountInline(admin.TabularInline):
+    model = StockTakeCount
+    extra = 0
+    raw_id_fields = ['inventory']
+    readonly_fields = ['system_quantity', 'counted_by', 'counted_at']
+
+
+@admin.register(StockTakeSession)
+class StockTakeSessionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'location', 'status', 'opened_by', 'opened_at', 'posted_at']
+    list_filter = ['status', 'location']
+    search_fields = ['name']
+    inlines = [StockTakeCountInline]
+
+
+@admin.register(MedicationForecast)
+class MedicationForecastAdmin(admin.ModelAdmin):
+    list_display = ['medication', 'avg_daily_demand', 'suggested_min_level', 'suggested_max_level', 'days_of_cover', 'computed_at']
+    search_fields = ['medication__name', 'medication__code']
+
+
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
     list_display = ['prescription_id', 'patient', 'doctor', 'status', 'prescribed_at']
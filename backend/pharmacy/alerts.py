@@ -0,0 +1,167 @@
+"""
+Scheduled inventory alerts for the Pharmacy app.
+
+A periodic job classifies every batch as low on stock, expiring within the
+alert window or expired with one query using conditional expressions, then
+reconciles the result with the active ``InventoryAlert`` rows: new
+conditions are inserted (and notified to pharmacists once), persisting ones
+refreshed and cleared ones resolved. The alert summary endpoint reads the
+stored rows instead of counting inventory on every request.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .models import MedicationInventory, InventoryAlert
+
+logger = logging.getLogger(__name__)
+
+PHARMACIST_ROLE = 'Pharmacist'
+COMPUTED_AT_CACHE_KEY = 'pharmacy:inventory_alerts:computed_at'
+# Batches named in a notification message; the rest are summarized as a count
+NOTIFICATION_BATCH_NAMES = 5
+
+ALERT_PRIORITIES = {'expired': 'high', 'low_stock': 'high', 'expiring': 'normal'}
+ALERT_TITLES = {
+    'low_stock': 'Low stock',
+    'expiring': 'Batches expiring soon',
+    'expired': 'Expired batches',
+}
+
+
+def _flag(condition):
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+def current_alert_conditions(days=None):
+    """
+    Return ``{dedup_key: row}`` for every batch alert condition holding now,
+    from one query over the inventory.
+    """
+    days = days if days is not None else settings.PHARMACY_EXPIRY_ALERT_DAYS
+    today = timezone.now().date()
+    expiry_threshold = today + timedelta(days=days)
+
+    rows = MedicationInventory.objects.annotate(
+        low_stock=_flag(Q(quantity__lte=F('min_stock_level'))),
+        expiring=_flag(Q(expiry_date__gte=today, expiry_date__lte=expiry_threshold)),
+        expired=_flag(Q(expiry_date__lt=today)),
+    ).filter(
+        Q(quantity__lte=F('min_stock_level')) | Q(expiry_date__lte=expiry_threshold)
+    ).values(
+        'id', 'medication__name', 'batch_number', 'quantity', 'min_stock_level', 'expiry_date',
+        'low_stock', 'expiring', 'expired',
+    )
+
+    conditions = {}
+    for row in rows:
+        for alert_type in ('low_stock', 'expiring', 'expired'):
+            if row[alert_type]:
+                conditions[InventoryAlert.make_dedup_key(alert_type, row['id'])] = {**row, 'alert_type': alert_type}
+    return conditions
+
+
+def _notification_payloads(new_alerts):
+    """One notification per alert type, naming the first few batches."""
+    by_type = {}
+    for alert in new_alerts:
+        by_type.setdefault(alert['alert_type'], []).append(alert)
+
+    payloads = []
+    for alert_type, alerts in by_type.items():
+        names = [f"{alert['medication__name']} (batch {alert['batch_number']})" for alert in alerts]
+        message = ', '.join(names[:NOTIFICATION_BATCH_NAMES])
+        if len(names) > NOTIFICATION_BATCH_NAMES:
+            message += f" and {len(names) - NOTIFICATION_BATCH_NAMES} more"
+        payloads.append({
+            'title': f"{ALERT_TITLES[alert_type]}: {len(alerts)} batch(es)",
+            'message': message,
+            'notification_type': 'alert',
+            'priority': ALERT_PRIORITIES[alert_type],
+            'object_type': 'inventory_alert',
+            'metadata': {'alert_type': alert_type, 'inventory_ids': [alert['id'] for alert in alerts]},
+        })
+    return payloads
+
+
+def compute_inventory_alerts(days=None, notify=True):
+    """
+    Refresh stored inventory alerts and notify pharmacists of new ones.
+    Returns ``{'created': n, 'updated': n, 'resolved': n}``.
+    """
+    from notifications.services import NotificationService
+
+    now = timezone.now()
+    conditions = current_alert_conditions(days)
+
+    with transaction.atomic():
+        active = {
+            alert.dedup_key: alert
+            for alert in InventoryAlert.objects.select_for_update().filter(is_active=True)
+        }
+
+        created = [
+            InventoryAlert(
+                inventory_id=row['id'],
+                alert_type=row['alert_type'],
+                dedup_key=key,
+                quantity=row['quantity'],
+                min_stock_level=row['min_stock_level'],
+                expiry_date=row['expiry_date'],
+                first_detected_at=now,
+                last_detected_at=now,
+                notified_at=now if notify else None,
+            )
+            for key, row in conditions.items()
+            if key not in active
+        ]
+        InventoryAlert.objects.bulk_create(created, batch_size=1000)
+
+        updated = []
+        for key, alert in active.items():
+            row = conditions.get(key)
+            if row is None:
+                continue
+            alert.quantity = row['quantity']
+            alert.min_stock_level = row['min_stock_level']
+            alert.expiry_date = row['expiry_date']
+            alert.last_detected_at = now
+            updated.append(alert)
+        InventoryAlert.objects.bulk_update(
+            updated, ['quantity', 'min_stock_level', 'expiry_date', 'last_detected_at'], batch_size=1000
+        )
+
+        resolved = InventoryAlert.objects.filter(
+            dedup_key__in=[key for key in active if key not in conditions], is_active=True
+        ).update(is_active=False, resolved_at=now)
+
+        if notify and created:
+            NotificationService.notify_role_bulk(
+                PHARMACIST_ROLE,
+                _notification_payloads([conditions[alert.dedup_key] for alert in created]),
+            )
+
+    cache.set(COMPUTED_AT_CACHE_KEY, now, None)
+
+    logger.info(
+        f"Inventory alerts: {len(created)} new, {len(updated)} ongoing, {resolved} resolved"
+    )
+    return {'created': len(created), 'updated': len(updated), 'resolved': resolved}
+
+
+def alert_summary():
+    """Counts of active alerts by type, from the stored alerts in one query."""
+    summary = InventoryAlert.objects.filter(is_active=True).aggregate(
+        low_stock_count=Count('id', filter=Q(alert_type='low_stock')),
+        expiring_count=Count('id', filter=Q(alert_type='expiring')),
+        expired_count=Count('id', filter=Q(alert_type='expired')),
+        # Batches can have several alerts at once
+        total_alerts=Count('inventory', distinct=True),
+    )
+    summary['computed_at'] = cache.get(COMPUTED_AT_CACHE_KEY)
+    return summary
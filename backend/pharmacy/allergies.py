@@ -0,0 +1,69 @@
+"""
+Drug-allergy conflict checking for the Pharmacy app.
+
+A patient's allergies are read from the normalized set stored on their
+medical history and expanded once into conflicting ingredient/class terms
+using the compiled index in ``pharmacy.interactions``. Each medication is then
+checked with a single set intersection.
+"""
+from patients.allergy_utils import normalize_allergies
+
+from .interactions import get_index
+
+
+def patient_allergens(patient_id):
+    """Return the patient's normalized allergens with a single query."""
+    from patients.models import Patient
+
+    row = Patient.objects.filter(pk=patient_id).values_list(
+        'medical_history__normalized_allergies', 'allergies'
+    ).first()
+    if row is None:
+        return []
+    normalized, allergy_text = row
+    if normalized is not None:
+        return normalized
+    # No medical history recorded yet: fall back to the patient's free text
+    return normalize_allergies(allergy_text)
+
+
+def check_allergy_conflicts(patient_id, medication_ids, allergens=None):
+    """
+    Check medications against a patient's recorded allergies.
+
+    Returns a list of conflict dicts, one per medication/allergen pair.
+    """
+    if allergens is None:
+        allergens = patient_allergens(patient_id)
+    if not allergens or not medication_ids:
+        return []
+
+    index = get_index()
+
+    # Expand allergens into conflicting terms once: term -> allergens
+    conflicting_terms = {}
+    for allergen in allergens:
+        for term in index.allergen_terms.get(allergen, frozenset()) | {allergen}:
+            conflicting_terms.setdefault(term, set()).add(allergen)
+    conflicting_keys = conflicting_terms.keys()
+
+    conflicts = []
+    for medication_id in dict.fromkeys(medication_ids):
+        terms = index.medication_terms.get(medication_id)
+        if not terms:
+            continue
+        matched = {}
+        for term in terms & conflicting_keys:
+            for allergen in conflicting_terms[term]:
+                matched.setdefault(allergen, []).append(term)
+        for allergen, matched_terms in sorted(matched.items()):
+            drug = index.medication_names[medication_id]
+            conflicts.append({
+                'medication_id': medication_id,
+                'drug': drug,
+                'allergen': allergen,
+                'matched_terms': sorted(matched_terms),
+                'severity': 'Major',
+                'description': f"{drug} ({', '.join(sorted(matched_terms))}) conflicts with the patient's recorded {allergen} allergy",
+            })
+    return conflicts
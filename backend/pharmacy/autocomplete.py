@@ -0,0 +1,311 @@
+"""
+In-memory medication autocomplete for prescribers.
+
+Each worker process holds a catalog index of active medications (word
+prefixes plus character trigrams for typo-tolerant matches) and a separate
+map of current stock status. Medication writes rotate a catalog version key
+in the shared cache and every process rebuilds its catalog on next use.
+
+Stock changes with every dispense, so it is not reloaded wholesale.
+Inventory writes append the changed medication ids to a numbered change log
+in the shared cache; a process replays the entries after the last one it
+applied and reloads just those medications. The stock version key marks
+the log's generation: when it rotates (bulk recomputes, or the log's
+counter was evicted) or entries are missing, the stock map is reloaded in
+full.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+from collections import Counter
+
+from django.core.cache import cache
+
+from common.cache_utils import get_versions, bump_version
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'pharmacy:autocomplete:catalog_version'
+STOCK_VERSION_KEY = 'pharmacy:autocomplete:stock_version'
+STOCK_SEQUENCE_KEY = 'pharmacy:autocomplete:stock_sequence'
+STOCK_CHANGE_KEY = 'pharmacy:autocomplete:stock_change:{}'
+# Change log entries kept, and the most replayed before a full reload instead
+STOCK_CHANGE_SECONDS = 24 * 3600
+MAX_REPLAYED_CHANGES = 200
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Prefixes up to this length are precomputed; longer ones use binary search
+PRECOMPUTED_PREFIX_LENGTH = 3
+MIN_TRIGRAM_SIMILARITY = 0.3
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(text):
+    padded = f"  {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """Prefix and trigram lookup structures over active medications."""
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+
+        token_entries = {}
+        trigram_entries = {}
+        for position, entry in enumerate(entries):
+            for field_rank, field in enumerate(('name', 'generic_name', 'code', 'strength')):
+                for token in tokenize(entry[field]):
+                    ranks = token_entries.setdefault(token, {})
+                    ranks[position] = min(ranks.get(position, field_rank), field_rank)
+            for gram in trigrams(f"{entry['name']} {entry['generic_name']}"):
+                trigram_entries.setdefault(gram, []).append(position)
+
+        # Sorted tokens support prefix search by bisection
+        self.tokens = sorted(token_entries)
+        self.token_entries = [token_entries[token] for token in self.tokens]
+        self.trigram_entries = trigram_entries
+        self.trigram_counts = [len(trigrams(f"{entry['name']} {entry['generic_name']}")) for entry in entries]
+
+        # Short prefixes match many tokens, so precompute them
+        self.short_prefixes = {}
+        # Fully ranked results for single short words, filled on first use
+        self.short_ranked = {}
+        for token, ranks in token_entries.items():
+            for length in range(1, min(len(token), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                merged = self.short_prefixes.setdefault(token[:length], {})
+                for position, rank in ranks.items():
+                    if position not in merged or rank < merged[position]:
+                        merged[position] = rank
+
+    @classmethod
+    def build(cls, version):
+        from .models import Medication
+
+        entries = list(
+            Medication.objects.filter(is_active=True)
+            .order_by('name')
+            .values('id', 'name', 'generic_name', 'code', 'strength', 'form', 'unit')
+        )
+        logger.info(f"Built medication autocomplete index for {len(entries)} medications")
+        return cls(version, entries)
+
+    def prefix_matches(self, prefix):
+        """Return ``{position: best field rank}`` for entries with a token starting with ``prefix``."""
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.short_prefixes.get(prefix, {})
+        matches = {}
+        start = bisect.bisect_left(self.tokens, prefix)
+        for i in range(start, len(self.tokens)):
+            if not self.tokens[i].startswith(prefix):
+                break
+            for position, rank in self.token_entries[i].items():
+                if position not in matches or rank < matches[position]:
+                    matches[position] = rank
+        return matches
+
+    def rank(self, phrase, candidates, limit=None):
+        """Order candidates: name starting with the phrase, then by matched field and name length."""
+        entries = self.entries
+        scored = (
+            (0 if entries[position]['name'].lower().startswith(phrase) else rank + 1, position)
+            for position, rank in (candidates or {}).items()
+        )
+
+        def key(item):
+            return (item[0], len(entries[item[1]]['name']), item[1])
+
+        if limit is None:
+            return sorted(scored, key=key)
+        return heapq.nsmallest(limit, scored, key=key)
+
+    def search(self, query, limit):
+        """Return ``(position, score)`` pairs, best matches first."""
+        words = tokenize(query)
+        if not words:
+            return []
+
+        # Every query word must prefix-match some token of the medication
+        candidates = None
+        for word in sorted(words, key=len, reverse=True):
+            matches = self.prefix_matches(word)
+            if candidates is None:
+                candidates = dict(matches)
+            else:
+                candidates = {
+                    position: max(rank, matches[position])
+                    for position, rank in candidates.items()
+                    if position in matches
+                }
+            if not candidates:
+                break
+
+        phrase = ' '.join(words)
+        if len(words) == 1 and len(phrase) <= PRECOMPUTED_PREFIX_LENGTH:
+            ranked = self.short_ranked.get(phrase)
+            if ranked is None:
+                ranked = self.short_ranked[phrase] = self.rank(phrase, candidates)
+            results = ranked[:limit]
+        else:
+            results = self.rank(phrase, candidates, limit)
+
+        # Fall back to trigram similarity for misspellings
+        if len(results) < limit and len(phrase) >= 3:
+            seen = {position for _, position in results}
+            query_grams = trigrams(phrase)
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self.trigram_entries.get(gram, ()))
+            fuzzy = []
+            for position, count in shared.items():
+                if position in seen:
+                    continue
+                similarity = count / (len(query_grams) + self.trigram_counts[position] - count)
+                if similarity >= MIN_TRIGRAM_SIMILARITY:
+                    fuzzy.append((10 - similarity, position))
+            results.extend(heapq.nsmallest(limit - len(results), fuzzy))
+
+        return results
+
+
+def stock_status(on_hand, reorder_point):
+    if on_hand <= 0:
+        return 'out_of_stock'
+    if reorder_point is not None and on_hand <= reorder_point:
+        return 'low_stock'
+    return 'in_stock'
+
+
+class StockStatus:
+    """Current stock status per medication, from the materialized summaries."""
+
+    def __init__(self, version, sequence, stock):
+        self.version = version
+        # Last change log entry reflected in ``stock``
+        self.sequence = sequence
+        self.stock = stock
+
+    @staticmethod
+    def load(medication_ids=None):
+        from .models import MedicationStock
+
+        rows = MedicationStock.objects.all()
+        if medication_ids is not None:
+            rows = rows.filter(medication_id__in=medication_ids)
+        return {
+            medication_id: (float(on_hand), stock_status(on_hand, reorder_point))
+            for medication_id, on_hand, reorder_point in rows.values_list(
+                'medication_id', 'unexpired_on_hand', 'medication__forecast__suggested_min_level'
+            )
+        }
+
+    @classmethod
+    def build(cls, version, sequence):
+        return cls(version, sequence, cls.load())
+
+    def apply_changes(self, sequence):
+        """
+        Reload the medications changed in log entries after ``self.sequence``
+        up to ``sequence``. Returns False if entries are missing and the map
+        must be rebuilt.
+        """
+        if sequence - self.sequence > MAX_REPLAYED_CHANGES:
+            return False
+        keys = [STOCK_CHANGE_KEY.format(number) for number in range(self.sequence + 1, sequence + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        medication_ids = {medication_id for ids in changes.values() for medication_id in ids}
+        stock = dict(self.stock)
+        stock.update(dict.fromkeys(medication_ids, (0.0, 'out_of_stock')))
+        stock.update(self.load(medication_ids))
+        # Swapped in whole so concurrent readers never see a partial update
+        self.stock = stock
+        self.sequence = sequence
+        return True
+
+    def get(self, medication_id):
+        return self.stock.get(medication_id, (0.0, 'out_of_stock'))
+
+
+_catalog = None
+_stock = None
+_lock = threading.Lock()
+
+
+def get_indexes():
+    """Return this process's catalog and stock indexes, bringing outdated ones up to date."""
+    global _catalog, _stock
+
+    versions = get_versions(CATALOG_VERSION_KEY, STOCK_VERSION_KEY, also=[STOCK_SEQUENCE_KEY])
+    catalog_version, stock_version = versions[CATALOG_VERSION_KEY], versions[STOCK_VERSION_KEY]
+    sequence = versions.get(STOCK_SEQUENCE_KEY) or 0
+
+    catalog, stock = _catalog, _stock
+    if (
+        catalog is None or catalog.version != catalog_version or
+        stock is None or stock.version != stock_version or stock.sequence != sequence
+    ):
+        with _lock:
+            if _catalog is None or _catalog.version != catalog_version:
+                _catalog = CatalogIndex.build(catalog_version)
+            if _stock is None or _stock.version != stock_version or _stock.sequence > sequence:
+                _stock = StockStatus.build(stock_version, sequence)
+            elif _stock.sequence < sequence and not _stock.apply_changes(sequence):
+                _stock = StockStatus.build(stock_version, sequence)
+            catalog, stock = _catalog, _stock
+    return catalog, stock
+
+
+def warm_index():
+    """Build the indexes at worker boot so the first keystroke is fast."""
+    try:
+        get_indexes()
+    except Exception as e:
+        logger.warning(f"Medication autocomplete index not warmed: {str(e)}")
+
+
+def invalidate_catalog():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_stock(medication_ids=None):
+    """
+    Record that the stock of ``medication_ids`` changed, or have every
+    process reload all stock when ``medication_ids`` is None.
+    """
+    if medication_ids is None:
+        bump_version(STOCK_VERSION_KEY)
+        return
+    try:
+        sequence = cache.incr(STOCK_SEQUENCE_KEY)
+    except ValueError:
+        # Counter missing (first use or evicted): start a new log generation
+        bump_version(STOCK_VERSION_KEY)
+        cache.add(STOCK_SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(STOCK_SEQUENCE_KEY)
+    cache.set(STOCK_CHANGE_KEY.format(sequence), sorted(medication_ids), STOCK_CHANGE_SECONDS)
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    """Return medication suggestions with strength, form and stock status."""
+    catalog, stock = get_indexes()
+    suggestions = []
+    for _, position in catalog.search(query, limit):
+        entry = catalog.entries[position]
+        current_stock, stock_status = stock.get(entry['id'])
+        suggestions.append({
+            **entry,
+            'current_stock': current_stock,
+            'stock_status': stock_status,
+        })
+    return suggestions
@@ -0,0 +1,121 @@
+"""
+Reorder-point forecasting from dispense history.
+
+Daily dispensed quantities per medication are aggregated in SQL over a
+trailing window. Mean and standard deviation of daily demand are derived
+from per-medication sums and sums of squares in a single pass (days with no
+dispensing count as zero demand), then turned into lead-time based reorder
+points:
+
+    safety stock  = z * sigma_daily * sqrt(lead time)
+    reorder point = mean_daily * lead time + safety stock
+    max level     = reorder point + mean_daily * review period
+"""
+import logging
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .autocomplete import invalidate_stock
+from .models import Medication, MedicationStock, MedicationForecast, Dispense
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_DAYS = 90
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_REVIEW_DAYS = 30
+# z-score for a 95% cycle service level
+DEFAULT_SERVICE_Z = 1.65
+
+
+def _decimal(value, places):
+    return Decimal(str(round(value, places)))
+
+
+def daily_demand_moments(window_days, end=None):
+    """
+    Return ``{medication_id: (sum, sum of squares)}`` of daily dispensed
+    quantities over the trailing window, from one grouped query.
+    """
+    end = end or timezone.now()
+    start = end - timedelta(days=window_days)
+
+    rows = (
+        Dispense.objects.filter(dispensed_at__gte=start, dispensed_at__lt=end)
+        .annotate(day=TruncDate('dispensed_at'))
+        .values('medication_id', 'day')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+
+    moments = {}
+    for row in rows:
+        medication_id = row['medication_id']
+        total = float(row['total'] or 0)
+        current_sum, current_squares = moments.get(medication_id, (0.0, 0.0))
+        moments[medication_id] = (current_sum + total, current_squares + total * total)
+    return moments
+
+
+def compute_reorder_points(
+    window_days=DEFAULT_WINDOW_DAYS,
+    lead_time_days=DEFAULT_LEAD_TIME_DAYS,
+    review_days=DEFAULT_REVIEW_DAYS,
+    service_z=DEFAULT_SERVICE_Z,
+):
+    """
+    Recompute forecasts for every active medication in one pass and store
+    them with a single upsert. Returns the number of forecasts written.
+    """
+    now = timezone.now()
+    moments = daily_demand_moments(window_days, end=now)
+    stock = dict(MedicationStock.objects.values_list('medication_id', 'unexpired_on_hand'))
+
+    forecasts = []
+    for medication_id in Medication.objects.filter(is_active=True).values_list('id', flat=True):
+        total, squares = moments.get(medication_id, (0.0, 0.0))
+        mean = total / window_days
+        variance = (squares - window_days * mean * mean) / (window_days - 1) if window_days > 1 else 0.0
+        std_dev = math.sqrt(max(variance, 0.0))
+
+        safety_stock = service_z * std_dev * math.sqrt(lead_time_days)
+        reorder_point = mean * lead_time_days + safety_stock
+        max_level = reorder_point + mean * review_days
+        on_hand = float(stock.get(medication_id) or 0)
+
+        forecasts.append(MedicationForecast(
+            medication_id=medication_id,
+            window_days=window_days,
+            avg_daily_demand=_decimal(mean, 3),
+            demand_std_dev=_decimal(std_dev, 3),
+            lead_time_days=lead_time_days,
+            safety_stock=_decimal(safety_stock, 2),
+            suggested_min_level=_decimal(math.ceil(reorder_point), 2),
+            suggested_max_level=_decimal(math.ceil(max_level), 2),
+            days_of_cover=_decimal(on_hand / mean, 1) if mean > 0 else None,
+            computed_at=now,
+        ))
+
+    with transaction.atomic():
+        MedicationForecast.objects.bulk_create(
+            forecasts,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['medication'],
+            update_fields=[
+                'window_days', 'avg_daily_demand', 'demand_std_dev', 'lead_time_days',
+                'safety_stock', 'suggested_min_level', 'suggested_max_level',
+                'days_of_cover', 'computed_at',
+            ],
+        )
+
+        # Reorder points feed the low-stock status shown in autocomplete
+        transaction.on_commit(invalidate_stock)
+
+    logger.info(f"Recomputed reorder points for {len(forecasts)} medication(s)")
+    return len(forecasts)
@@ -0,0 +1,210 @@
+"""
+Drug interaction checking for the Pharmacy app.
+
+Interaction rules (``DrugInteractionRule``), allergen mappings
+(``AllergenMapping``) and the ingredient/class terms of every medication
+(``MedicationIngredient``) are compiled into an in-memory index per worker
+process. Checking a prescription is then a set intersection per medication
+pair instead of a scan over every rule. The index is rebuilt when the shared
+version key in the cache changes; signals bump that key whenever rules,
+mappings, ingredients or medications are written.
+"""
+import logging
+import re
+import threading
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from common.cache_utils import get_version, bump_version
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'pharmacy:interaction_index:version'
+
+SEVERITY_ORDER = {'Major': 0, 'Moderate': 1, 'Minor': 2}
+
+# Prescriptions counted as "current" medication for a patient
+ACTIVE_PRESCRIPTION_STATUSES = ['pending', 'dispensing', 'partially_dispensed']
+RECENTLY_DISPENSED_DAYS = 30
+
+_WORD_RE = re.compile(r'[a-z]+')
+
+
+def name_terms(*names):
+    """
+    Derive fallback terms from medication names for medications with no
+    ingredient mapping: every word plus every pair of adjacent words, so
+    rules such as ``warfarin`` or ``ace inhibitor`` still match by name.
+    """
+    terms = set()
+    for name in names:
+        words = _WORD_RE.findall((name or '').lower())
+        terms.update(words)
+        terms.update(f'{first} {second}' for first, second in zip(words, words[1:]))
+    return terms
+
+
+class InteractionIndex:
+    """Compiled lookup structures for interaction rules and medication terms."""
+
+    def __init__(self, version, partners, medication_terms, medication_names, allergen_terms=None):
+        self.version = version
+        # term -> {partner term -> rule dict}; symmetric
+        self.partners = partners
+        # medication id -> frozenset of terms
+        self.medication_terms = medication_terms
+        # medication id -> display name
+        self.medication_names = medication_names
+        # normalized allergen -> frozenset of conflicting terms
+        self.allergen_terms = allergen_terms or {}
+
+    @classmethod
+    def build(cls, version):
+        """Load every active rule, allergen mapping and medication term with four queries."""
+        from .models import Medication, MedicationIngredient, DrugInteractionRule, AllergenMapping
+
+        partners = {}
+        for rule in DrugInteractionRule.objects.filter(is_active=True).values(
+            'id', 'term_a', 'term_b', 'severity', 'description', 'recommendation'
+        ):
+            partners.setdefault(rule['term_a'], {})[rule['term_b']] = rule
+            partners.setdefault(rule['term_b'], {})[rule['term_a']] = rule
+
+        mapped_terms = {}
+        for medication_id, name in MedicationIngredient.objects.values_list('medication_id', 'name'):
+            mapped_terms.setdefault(medication_id, set()).add(name)
+
+        medication_terms = {}
+        medication_names = {}
+        for medication_id, name, generic_name in Medication.objects.values_list('id', 'name', 'generic_name'):
+            medication_names[medication_id] = name
+            terms = mapped_terms.get(medication_id) or name_terms(generic_name, name)
+            medication_terms[medication_id] = frozenset(terms)
+
+        allergen_terms = {}
+        for allergen, term in AllergenMapping.objects.values_list('allergen', 'term'):
+            allergen_terms.setdefault(allergen, set()).add(term)
+
+        logger.info(
+            f"Built interaction index: {len(partners)} terms, {len(medication_terms)} medications, "
+            f"{len(allergen_terms)} allergens"
+        )
+        return cls(
+            version,
+            partners,
+            medication_terms,
+            medication_names,
+            {allergen: frozenset(terms) for allergen, terms in allergen_terms.items()},
+        )
+
+    def rules_between(self, medication_a, medication_b):
+        """Return the rules matching a pair of medications."""
+        terms_a = self.medication_terms.get(medication_a)
+        terms_b = self.medication_terms.get(medication_b)
+        if not terms_a or not terms_b:
+            return []
+
+        found = {}
+        for term in terms_a:
+            partners = self.partners.get(term)
+            if partners:
+                for other in partners.keys() & terms_b:
+                    rule = partners[other]
+                    found[rule['id']] = rule
+        return list(found.values())
+
+    def check(self, medication_ids, other_medications=()):
+        """
+        Check medications against each other and against ``other_medications``,
+        an iterable of ``(medication_id, prescription_id)`` the patient is
+        already taking. Returns interaction dicts, most severe first.
+        """
+        medication_ids = list(dict.fromkeys(medication_ids))
+        interactions = []
+
+        def describe(medication_a, medication_b, prescription_id=None):
+            for rule in self.rules_between(medication_a, medication_b):
+                interaction = {
+                    'drug1': self.medication_names[medication_a],
+                    'drug2': self.medication_names[medication_b],
+                    'severity': rule['severity'],
+                    'description': rule['description'],
+                    'recommendation': rule['recommendation'],
+                }
+                if prescription_id:
+                    interaction['prescription_id'] = prescription_id
+                interactions.append(interaction)
+
+        for i, medication_a in enumerate(medication_ids):
+            for medication_b in medication_ids[i + 1:]:
+                describe(medication_a, medication_b)
+
+        seen = set()
+        for medication_b, prescription_id in other_medications:
+            for medication_a in medication_ids:
+                key = (medication_a, medication_b, prescription_id)
+                if medication_a == medication_b or key in seen:
+                    continue
+                seen.add(key)
+                describe(medication_a, medication_b, prescription_id)
+
+        interactions.sort(key=lambda interaction: SEVERITY_ORDER.get(interaction['severity'], len(SEVERITY_ORDER)))
+        return interactions
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's interaction index, rebuilding it if outdated."""
+    global _index
+
+    version = get_version(VERSION_CACHE_KEY)
+
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = InteractionIndex.build(version)
+            index = _index
+    return index
+
+
+def invalidate_index():
+    """Force every worker to rebuild its index on the next check."""
+    bump_version(VERSION_CACHE_KEY)
+
+
+def active_patient_medications(patient_id, exclude_prescription=None):
+    """
+    Return ``(medication_id, prescription_id)`` pairs from the patient's
+    open prescriptions and those dispensed recently, in one query.
+    """
+    from .models import PrescriptionItem
+
+    recent = timezone.now() - timedelta(days=RECENTLY_DISPENSED_DAYS)
+    queryset = PrescriptionItem.objects.filter(prescription__patient_id=patient_id).filter(
+        Q(prescription__status__in=ACTIVE_PRESCRIPTION_STATUSES) |
+        Q(prescription__status='dispensed', prescription__dispensed_at__gte=recent)
+    )
+    if exclude_prescription is not None:
+        queryset = queryset.exclude(prescription_id=exclude_prescription)
+    return list(queryset.values_list('medication_id', 'prescription__prescription_id').distinct())
+
+
+def check_drug_interactions(medication_ids, patient_id=None, exclude_prescription=None):
+    """
+    Check for drug interactions between medications and, when ``patient_id``
+    is given, against the patient's other active prescriptions.
+    """
+    other_medications = []
+    if patient_id is not None:
+        other_medications = active_patient_medications(patient_id, exclude_prescription)
+
+    if len(medication_ids) < 2 and not other_medications:
+        return []
+
+    return get_index().check(medication_ids, other_medications)
@@ -0,0 +1,77 @@
+"""
+Stock ledger balances for the Pharmacy app.
+
+``StockMovement`` rows form an append-only ledger per inventory batch.
+Balances are never replayed from the first movement: a periodic job stores
+the balance of every batch in ``StockBalanceSnapshot``, and the balance at
+time X is the latest snapshot run at or before X plus the movements between
+that run and X, i.e. one snapshot read and one grouped movement aggregate.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import StockMovement, StockBalanceSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Snapshots cover movements up to a little in the past, so rows from
+# transactions still in flight when the job runs are not skipped
+SNAPSHOT_LAG = timedelta(minutes=10)
+
+
+def ledger_balances(as_of=None, **filters):
+    """
+    Return ``{inventory_id: balance}`` from the ledger at ``as_of``
+    (default: now).
+
+    ``filters`` are lookups applied to both snapshots and movements, e.g.
+    ``inventory__medication_id=5`` or ``inventory_id__in=[...]``. Batches
+    whose balance is zero may be omitted.
+    """
+    as_of = as_of or timezone.now()
+    movements = StockMovement.objects.filter(inventory__isnull=False, created_at__lte=as_of, **filters)
+
+    balances = {}
+    snapshot_at = StockBalanceSnapshot.objects.filter(taken_at__lte=as_of).aggregate(
+        latest=Max('taken_at')
+    )['latest']
+    if snapshot_at is not None:
+        balances = dict(
+            StockBalanceSnapshot.objects.filter(taken_at=snapshot_at, **filters).values_list('inventory_id', 'balance')
+        )
+        movements = movements.filter(created_at__gt=snapshot_at)
+
+    for inventory_id, change in movements.values('inventory_id').annotate(
+        change=Sum('quantity')
+    ).order_by().values_list('inventory_id', 'change'):
+        balances[inventory_id] = balances.get(inventory_id, Decimal('0')) + change
+    return balances
+
+
+def take_balance_snapshot(taken_at=None):
+    """
+    Store the ledger balance of every batch with stock at ``taken_at``
+    (default: now minus ``SNAPSHOT_LAG``). Returns the number of rows written.
+    """
+    taken_at = taken_at or timezone.now() - SNAPSHOT_LAG
+    balances = ledger_balances(as_of=taken_at)
+
+    with transaction.atomic():
+        StockBalanceSnapshot.objects.bulk_create(
+            [
+                StockBalanceSnapshot(inventory_id=inventory_id, taken_at=taken_at, balance=balance)
+                for inventory_id, balance in balances.items()
+                if balance
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    written = sum(1 for balance in balances.values() if balance)
+    logger.info(f"Stored stock balance snapshot of {written} batch(es) at {taken_at}")
+    return written
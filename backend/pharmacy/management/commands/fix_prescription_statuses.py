@@ -1,9 +1,21 @@
 """
 Management command to recalculate prescription statuses.
 This fixes prescriptions that have incorrect status values.
+
+With --all, statuses are recalculated set-based: prescriptions are split
+into primary key ranges and each range is fixed with a few UPDATE
+statements, optionally by several workers in parallel.
+Run with: python manage.py fix_prescription_statuses --all [--since YYYY-MM-DD] [--dry-run] [--workers N]
 """
-from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
 from pharmacy.models import Prescription
+from pharmacy.services import PrescriptionStatusService
 
 
 class Command(BaseCommand):
@@ -20,6 +32,28 @@ class Command(BaseCommand):
             action='store_true',
             help='Fix all prescriptions',
         )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='With --all, only fix prescriptions prescribed on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the changes without writing them',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Primary key range handled per chunk (default: 5000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of chunks processed in parallel (default: 1)',
+        )
 
     def handle(self, *args, **options):
         prescription_id = options.get('prescription_id')
@@ -32,7 +66,7 @@ class Command(BaseCommand):
                 prescription.recalculate_status()
                 prescription.refresh_from_db()
                 new_status = prescription.status
-                
+
                 if old_status != new_status:
                     self.stdout.write(
                         self.style.SUCCESS(
@@ -48,26 +82,7 @@ class Command(BaseCommand):
                     self.style.ERROR(f'Prescription {prescription_id} not found')
                 )
         elif fix_all:
-            prescriptions = Prescription.objects.all()
-            fixed_count = 0
-            
-            for prescription in prescriptions:
-                old_status = prescription.status
-                prescription.recalculate_status()
-                prescription.refresh_from_db()
-                new_status = prescription.status
-                
-                if old_status != new_status:
-                    fixed_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'✓ Prescription {prescription.prescription_id}: {old_status} → {new_status}'
-                        )
-                    )
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'\n✓ Fixed {fixed_count} prescription(s)')
-            )
+            self.fix_all(options)
         else:
             self.stdout.write(
                 self.style.ERROR(
@@ -75,3 +90,67 @@ class Command(BaseCommand):
                 )
             )
 
+    def fix_all(self, options):
+        dry_run = options.get('dry_run', False)
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        prescriptions = Prescription.objects.all()
+        since = options.get('since')
+        if since:
+            try:
+                since = datetime.strptime(since, '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            prescriptions = prescriptions.filter(
+                prescribed_at__gte=timezone.make_aware(since, timezone.get_current_timezone())
+            )
+
+        bounds = prescriptions.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('No prescriptions to fix')
+            return
+
+        chunks = [
+            (start, min(start + chunk_size - 1, bounds['last']))
+            for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        ]
+
+        def run_chunk(chunk):
+            try:
+                return PrescriptionStatusService.recalculate_range(prescriptions, *chunk, dry_run=dry_run)
+            finally:
+                # Each worker thread opens its own database connection
+                connection.close()
+
+        items_fixed = 0
+        transitions = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_chunk, chunk): chunk for chunk in chunks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                first_pk, last_pk = futures[future]
+                chunk_items, chunk_transitions = future.result()
+                items_fixed += chunk_items
+                for key, count in chunk_transitions.items():
+                    transitions[key] = transitions.get(key, 0) + count
+                self.stdout.write(
+                    f'  [{done}/{len(chunks)}] ids {first_pk}-{last_pk}: '
+                    f'{sum(chunk_transitions.values())} prescription(s), {chunk_items} item(s)'
+                )
+
+        for (old_status, new_status), count in sorted(transitions.items()):
+            self.stdout.write(f'  {old_status} → {new_status}: {count}')
+
+        fixed_count = sum(transitions.values())
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'\nDry run: {fixed_count} prescription(s) and {items_fixed} item(s) would be fixed'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'\n✓ Fixed {fixed_count} prescription(s) and {items_fixed} item(s)')
+            )
@@ -0,0 +1,56 @@
+"""
+Management command to recompute reorder points from dispense history.
+The same job runs nightly through Celery beat.
+Run with: python manage.py forecast_reorder_points
+"""
+from django.core.management.base import BaseCommand, CommandError
+from pharmacy.forecasting import (
+    compute_reorder_points,
+    DEFAULT_WINDOW_DAYS,
+    DEFAULT_LEAD_TIME_DAYS,
+    DEFAULT_REVIEW_DAYS,
+    DEFAULT_SERVICE_Z,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute demand forecasts and suggested stock levels for all medications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            default=DEFAULT_WINDOW_DAYS,
+            help=f'Days of dispense history to use (default: {DEFAULT_WINDOW_DAYS})',
+        )
+        parser.add_argument(
+            '--lead-time-days',
+            type=int,
+            default=DEFAULT_LEAD_TIME_DAYS,
+            help=f'Supplier lead time in days (default: {DEFAULT_LEAD_TIME_DAYS})',
+        )
+        parser.add_argument(
+            '--review-days',
+            type=int,
+            default=DEFAULT_REVIEW_DAYS,
+            help=f'Days of demand to cover above the reorder point (default: {DEFAULT_REVIEW_DAYS})',
+        )
+        parser.add_argument(
+            '--service-z',
+            type=float,
+            default=DEFAULT_SERVICE_Z,
+            help=f'Service level z-score for safety stock (default: {DEFAULT_SERVICE_Z})',
+        )
+
+    def handle(self, *args, **options):
+        if options['window_days'] < 1:
+            raise CommandError('--window-days must be at least 1')
+        if options['lead_time_days'] < 0 or options['review_days'] < 0:
+            raise CommandError('--lead-time-days and --review-days cannot be negative')
+        count = compute_reorder_points(
+            window_days=options['window_days'],
+            lead_time_days=options['lead_time_days'],
+            review_days=options['review_days'],
+            service_z=options['service_z'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ Recomputed reorder points for {count} medication(s)'))
@@ -0,0 +1,117 @@
+"""
+Management command to reconcile the stock ledger with inventory.
+Compares the ledger balance of every batch (latest snapshot plus later
+movements) with MedicationInventory.quantity, one batch id range per chunk
+with several chunks checked in parallel, and optionally records correcting
+adjustments.
+Run with: python manage.py reconcile_stock_ledger [--workers N] [--repair]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from pharmacy.ledger import ledger_balances
+from pharmacy.models import MedicationInventory, StockMovement
+
+
+def reconcile_range(first_id, last_id, as_of):
+    """Return ``(checked, drifted)`` for batches with ids in ``[first_id, last_id]``."""
+    try:
+        batches = MedicationInventory.objects.filter(id__gte=first_id, id__lte=last_id).values(
+            'id', 'medication_id', 'batch_number', 'quantity'
+        )
+        balances = ledger_balances(as_of=as_of, inventory_id__gte=first_id, inventory_id__lte=last_id)
+
+        checked = 0
+        drifted = []
+        for batch in batches:
+            checked += 1
+            ledger = balances.get(batch['id'], Decimal('0'))
+            if ledger != batch['quantity']:
+                drifted.append({**batch, 'ledger': ledger})
+        return checked, drifted
+    finally:
+        # Each worker thread opens its own database connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Detect (and optionally repair) drift between the stock ledger and inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Record adjustments bringing the ledger in line with inventory',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Batch id range checked per chunk (default: 10000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of chunks checked in parallel (default: 4)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        bounds = MedicationInventory.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('No inventory batches to reconcile')
+            return
+
+        chunks = [
+            (start, min(start + chunk_size - 1, bounds['last']))
+            for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        ]
+        as_of = timezone.now()
+
+        checked = 0
+        drifted = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_checked, chunk_drifted in executor.map(lambda chunk: reconcile_range(*chunk, as_of), chunks):
+                checked += chunk_checked
+                drifted.extend(chunk_drifted)
+
+        for batch in drifted:
+            self.stdout.write(
+                f"  Batch {batch['id']} ({batch['batch_number']}): "
+                f"ledger {batch['ledger']} → inventory {batch['quantity']}"
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'✓ Ledger matches inventory for all {checked} batch(es)'))
+            return
+
+        if not options.get('repair', False):
+            self.stdout.write(
+                self.style.WARNING(f'\n{len(drifted)} batch(es) drifted. Re-run with --repair to fix.')
+            )
+            return
+
+        with transaction.atomic():
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    inventory_id=batch['id'],
+                    medication_id=batch['medication_id'],
+                    batch_number=batch['batch_number'],
+                    movement_type='adjustment',
+                    quantity=batch['quantity'] - batch['ledger'],
+                    balance_after=batch['quantity'],
+                    notes='Ledger reconciliation',
+                    created_at=as_of,
+                )
+                for batch in drifted
+            ], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Recorded {len(drifted)} reconciling adjustment(s)'))
@@ -0,0 +1,67 @@
+"""
+Management command to verify materialized medication stock summaries.
+Compares every MedicationStock row with a fresh aggregate of the inventory
+and optionally repairs any drift.
+Run with: python manage.py verify_stock_summary [--repair]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from pharmacy.models import Medication, MedicationStock
+
+
+class Command(BaseCommand):
+    help = 'Detect (and optionally repair) drift between stock summaries and inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Rewrite summaries that do not match the inventory',
+        )
+
+    def handle(self, *args, **options):
+        repair = options.get('repair', False)
+
+        # One grouped aggregate over the whole inventory, one read of the summaries
+        expected = MedicationStock.compute()
+        for medication_id in Medication.objects.values_list('id', flat=True):
+            expected.setdefault(medication_id, {
+                'on_hand': 0,
+                'unexpired_on_hand': 0,
+                'earliest_expiry': None,
+                'batch_count': 0,
+            })
+        stored = {
+            row['medication_id']: row
+            for row in MedicationStock.objects.values('medication_id', *MedicationStock.SUMMARY_FIELDS)
+        }
+
+        drifted = []
+        for medication_id, values in expected.items():
+            current = stored.get(medication_id)
+            if current is None:
+                drifted.append(medication_id)
+                self.stdout.write(f'  Medication {medication_id}: summary missing')
+                continue
+            mismatches = [
+                f'{field} {current[field]} → {values[field]}'
+                for field in MedicationStock.SUMMARY_FIELDS
+                if current[field] != values[field]
+            ]
+            if mismatches:
+                drifted.append(medication_id)
+                self.stdout.write(f'  Medication {medication_id}: ' + ', '.join(mismatches))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'✓ All {len(expected)} stock summaries match inventory'))
+            return
+
+        if not repair:
+            self.stdout.write(
+                self.style.WARNING(f'\n{len(drifted)} stock summary(ies) drifted. Re-run with --repair to fix.')
+            )
+            return
+
+        with transaction.atomic():
+            MedicationStock.refresh(drifted)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Repaired {len(drifted)} stock summary(ies)'))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def populate_stock_summaries(apps, schema_editor):
+    """Build stock summaries for existing inventory with one grouped query."""
+    MedicationInventory = apps.get_model('pharmacy', 'MedicationInventory')
+    MedicationStock = apps.get_model('pharmacy', 'MedicationStock')
+    
+    today = timezone.now().date()
+    rows = MedicationInventory.objects.values('medication_id').annotate(
+        total=Sum('quantity'),
+        unexpired=Sum('quantity', filter=Q(expiry_date__gt=today)),
+        earliest=Min('expiry_date', filter=Q(expiry_date__gt=today, quantity__gt=0)),
+        batches=Count('id'),
+    ).order_by()
+    
+    MedicationStock.objects.bulk_create([
+        MedicationStock(
+            medication_id=row['medication_id'],
+            on_hand=row['total'] or 0,
+            unexpired_on_hand=row['unexpired'] or 0,
+            earliest_expiry=row['earliest'],
+            batch_count=row['batches'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_fix_empty_dispense_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_hand', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unexpired_on_hand', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earliest_expiry', models.DateField(blank=True, help_text='Earliest expiry among unexpired batches with stock', null=True)),
+                ('batch_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_summary', to='pharmacy.medication')),
+            ],
+            options={
+                'db_table': 'medication_stock',
+            },
+        ),
+        migrations.RunPython(populate_stock_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Rules previously hardcoded in pharmacy.views.check_drug_interactions
+LEGACY_RULE_GROUPS = [
+    (
+        ['warfarin', 'aspirin', 'clopidogrel'],
+        ['warfarin', 'aspirin', 'clopidogrel', 'ibuprofen'],
+        'Major',
+        'Increased risk of bleeding when anticoagulants are combined',
+        'Monitor for signs of bleeding. Consider alternative medication or adjust dosages under medical supervision.',
+    ),
+    (
+        ['ace inhibitor', 'lisinopril', 'enalapril', 'captopril'],
+        ['potassium', 'spironolactone', 'amiloride'],
+        'Moderate',
+        'Risk of hyperkalemia when ACE inhibitors are combined with potassium supplements or potassium-sparing diuretics',
+        'Monitor serum potassium levels regularly. Avoid potassium supplements unless prescribed.',
+    ),
+    (
+        ['beta blocker', 'propranolol', 'metoprolol', 'atenolol'],
+        ['calcium channel blocker', 'verapamil', 'diltiazem'],
+        'Moderate',
+        'Combination may cause bradycardia, hypotension, or heart block',
+        'Monitor heart rate and blood pressure closely. Use with caution, especially in elderly patients.',
+    ),
+]
+
+
+def seed_legacy_rules(apps, schema_editor):
+    """Store the previously hardcoded interaction rules as table rows."""
+    DrugInteractionRule = apps.get_model('pharmacy', 'DrugInteractionRule')
+    
+    rules = {}
+    for terms_a, terms_b, severity, description, recommendation in LEGACY_RULE_GROUPS:
+        for term_a in terms_a:
+            for term_b in terms_b:
+                pair = tuple(sorted([term_a, term_b]))
+                rules.setdefault(pair, DrugInteractionRule(
+                    term_a=pair[0],
+                    term_b=pair[1],
+                    severity=severity,
+                    description=description,
+                    recommendation=recommendation,
+                ))
+    DrugInteractionRule.objects.bulk_create(rules.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_medicationstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrugInteractionRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_a', models.CharField(help_text='Ingredient or drug class', max_length=100)),
+                ('term_b', models.CharField(help_text='Ingredient or drug class', max_length=100)),
+                ('severity', models.CharField(choices=[('Major', 'Major'), ('Moderate', 'Moderate'), ('Minor', 'Minor')], default='Moderate', max_length=20)),
+                ('description', models.TextField()),
+                ('recommendation', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'drug_interaction_rules',
+                'ordering': ['term_a', 'term_b'],
+                'unique_together': {('term_a', 'term_b')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicationIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='e.g., warfarin, ace inhibitor', max_length=100)),
+                ('kind', models.CharField(choices=[('ingredient', 'Ingredient'), ('class', 'Drug Class')], default='ingredient', max_length=20)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='pharmacy.medication')),
+            ],
+            options={
+                'db_table': 'medication_ingredients',
+                'ordering': ['medication', 'kind', 'name'],
+                'unique_together': {('medication', 'name')},
+            },
+        ),
+        migrations.RunPython(seed_legacy_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:44
+
+from django.db import migrations, models
+
+
+# Common cross-sensitivities; extend through the admin
+DEFAULT_ALLERGEN_MAPPINGS = {
+    'penicillin': ['penicillin', 'penicillins', 'amoxicillin', 'ampicillin', 'cloxacillin', 'flucloxacillin', 'piperacillin'],
+    'sulfa': ['sulfonamide', 'sulfamethoxazole', 'sulfadoxine', 'sulfasalazine'],
+    'sulphonamide': ['sulfonamide', 'sulfamethoxazole', 'sulfadoxine', 'sulfasalazine'],
+    'aspirin': ['aspirin', 'nsaid'],
+    'nsaid': ['nsaid', 'ibuprofen', 'diclofenac', 'naproxen', 'piroxicam', 'aspirin'],
+    'nsaids': ['nsaid', 'ibuprofen', 'diclofenac', 'naproxen', 'piroxicam', 'aspirin'],
+    'cephalosporin': ['cephalosporin', 'ceftriaxone', 'cefuroxime', 'cefixime', 'cephalexin'],
+    'codeine': ['codeine', 'opioid'],
+    'morphine': ['morphine', 'opioid'],
+}
+
+
+def seed_allergen_mappings(apps, schema_editor):
+    """Seed common allergen to ingredient/class mappings."""
+    AllergenMapping = apps.get_model('pharmacy', 'AllergenMapping')
+    AllergenMapping.objects.bulk_create([
+        AllergenMapping(allergen=allergen, term=term)
+        for allergen, terms in DEFAULT_ALLERGEN_MAPPINGS.items()
+        for term in terms
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0006_interaction_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllergenMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allergen', models.CharField(db_index=True, help_text='Normalized allergen, e.g., penicillin', max_length=100)),
+                ('term', models.CharField(help_text='Conflicting ingredient or drug class', max_length=100)),
+            ],
+            options={
+                'db_table': 'allergen_mappings',
+                'ordering': ['allergen', 'term'],
+                'unique_together': {('allergen', 'term')},
+            },
+        ),
+        migrations.RunPython(seed_allergen_mappings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0007_allergen_mappings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_days', models.IntegerField(help_text='Days of dispense history used')),
+                ('avg_daily_demand', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('demand_std_dev', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('lead_time_days', models.IntegerField()),
+                ('safety_stock', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('suggested_min_level', models.DecimalField(decimal_places=2, default=0, help_text='Reorder point', max_digits=12)),
+                ('suggested_max_level', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Unexpired stock divided by daily demand; empty when there is no demand', max_digits=10, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='pharmacy.medication')),
+            ],
+            options={
+                'db_table': 'medication_forecasts',
+                'ordering': ['days_of_cover'],
+            },
+        ),
+    ]
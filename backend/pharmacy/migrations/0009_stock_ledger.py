@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_opening_balances(apps, schema_editor):
+    """Start the ledger of every existing batch with its current quantity."""
+    MedicationInventory = apps.get_model('pharmacy', 'MedicationInventory')
+    StockMovement = apps.get_model('pharmacy', 'StockMovement')
+    
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            inventory_id=row['id'],
+            medication_id=row['medication_id'],
+            batch_number=row['batch_number'],
+            movement_type='opening',
+            quantity=row['quantity'],
+            balance_after=row['quantity'],
+            notes='Opening balance',
+        )
+        for row in MedicationInventory.objects.exclude(quantity=0).values(
+            'id', 'medication_id', 'batch_number', 'quantity'
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pharmacy', '0008_medicationforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_number', models.CharField(blank=True, max_length=100)),
+                ('movement_type', models.CharField(choices=[('opening', 'Opening Balance'), ('receipt', 'Receipt'), ('dispense', 'Dispense'), ('adjustment', 'Adjustment'), ('return', 'Return'), ('expiry', 'Expiry Write-off')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, help_text='Signed change in stock', max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, help_text='Batch quantity after the movement', max_digits=12)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('dispense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='pharmacy.dispense')),
+                ('inventory', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='pharmacy.medicationinventory')),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='pharmacy.medication')),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'stock_movements',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['inventory', 'created_at'], name='stock_movem_invento_927be7_idx'), models.Index(fields=['medication', 'created_at'], name='stock_movem_medicat_294d5b_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='pharmacy.medicationinventory')),
+            ],
+            options={
+                'db_table': 'stock_balance_snapshots',
+                'ordering': ['-taken_at'],
+                'unique_together': {('inventory', 'taken_at')},
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('low_stock', 'Low Stock'), ('expiring', 'Expiring Soon'), ('expired', 'Expired')], max_length=20)),
+                ('dedup_key', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_stock_level', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('expiry_date', models.DateField()),
+                ('first_detected_at', models.DateTimeField()),
+                ('last_detected_at', models.DateTimeField()),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='pharmacy.medicationinventory')),
+            ],
+            options={
+                'db_table': 'inventory_alerts',
+                'ordering': ['-first_detected_at'],
+                'indexes': [models.Index(fields=['is_active', 'alert_type'], name='inventory_a_is_acti_629d73_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('dedup_key',), name='unique_active_inventory_alert'),
+        ),
+    ]
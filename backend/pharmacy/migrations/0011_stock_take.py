@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:56
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pharmacy', '0010_inventory_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTakeSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('location', models.CharField(blank=True, help_text='Restrict counts to batches at this location', max_length=100)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('posted', 'Posted'), ('cancelled', 'Cancelled')], db_index=True, default='open', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('opened_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('opened_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='opened_stock_takes', to=settings.AUTH_USER_MODEL)),
+                ('posted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posted_stock_takes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'stock_take_sessions',
+                'ordering': ['-opened_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTakeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_quantity', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('system_quantity', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('counted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('counted_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_take_counts', to=settings.AUTH_USER_MODEL)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_take_counts', to='pharmacy.medicationinventory')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='pharmacy.stocktakesession')),
+            ],
+            options={
+                'db_table': 'stock_take_counts',
+                'ordering': ['inventory__medication__name', 'inventory__batch_number'],
+                'unique_together': {('session', 'inventory')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0011_stock_take'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='dispense',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='pharmacy.dispense'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='inventory',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='pharmacy.medicationinventory'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 """
 Pharmacy models for the EMR system.
 """
+from decimal import Decimal
+from functools import partial
+
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -60,6 +63,95 @@ class Medication(models.Model):
         return f"{self.name} ({self.strength})" if self.strength else self.name
 
 
+class MedicationIngredient(models.Model):
+    """
+    Active ingredient or drug class of a medication, used for clinical checks.
+    """
+    
+    KIND_CHOICES = [
+        ('ingredient', 'Ingredient'),
+        ('class', 'Drug Class'),
+    ]
+    
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='ingredients')
+    name = models.CharField(max_length=100, help_text="e.g., warfarin, ace inhibitor")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='ingredient')
+    
+    class Meta:
+        db_table = 'medication_ingredients'
+        ordering = ['medication', 'kind', 'name']
+        unique_together = [['medication', 'name']]
+    
+    def save(self, *args, **kwargs):
+        """Store names normalized so lookups are exact matches."""
+        self.name = ' '.join(self.name.lower().split())
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.medication.name} - {self.name}"
+
+
+class DrugInteractionRule(models.Model):
+    """
+    Interaction between two ingredients and/or drug classes.
+    """
+    
+    SEVERITY_CHOICES = [
+        ('Major', 'Major'),
+        ('Moderate', 'Moderate'),
+        ('Minor', 'Minor'),
+    ]
+    
+    term_a = models.CharField(max_length=100, help_text="Ingredient or drug class")
+    term_b = models.CharField(max_length=100, help_text="Ingredient or drug class")
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='Moderate')
+    description = models.TextField()
+    recommendation = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'drug_interaction_rules'
+        ordering = ['term_a', 'term_b']
+        unique_together = [['term_a', 'term_b']]
+    
+    def save(self, *args, **kwargs):
+        """Normalize terms and store each pair in a canonical order."""
+        self.term_a = ' '.join(self.term_a.lower().split())
+        self.term_b = ' '.join(self.term_b.lower().split())
+        if self.term_b < self.term_a:
+            self.term_a, self.term_b = self.term_b, self.term_a
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.term_a} + {self.term_b} ({self.severity})"
+
+
+class AllergenMapping(models.Model):
+    """
+    Maps a recorded allergen to an ingredient or drug class it conflicts with.
+    """
+    
+    allergen = models.CharField(max_length=100, db_index=True, help_text="Normalized allergen, e.g., penicillin")
+    term = models.CharField(max_length=100, help_text="Conflicting ingredient or drug class")
+    
+    class Meta:
+        db_table = 'allergen_mappings'
+        ordering = ['allergen', 'term']
+        unique_together = [['allergen', 'term']]
+    
+    def save(self, *args, **kwargs):
+        """Store values normalized so lookups are exact matches."""
+        from patients.allergy_utils import normalize_allergy
+        self.allergen = normalize_allergy(self.allergen)
+        self.term = ' '.join(self.term.lower().split())
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.allergen} → {self.term}"
+
+
 class MedicationInventory(models.Model):
     """
     Medication inventory with batch tracking.
@@ -89,6 +181,79 @@ class MedicationInventory(models.Model):
     def __str__(self):
         return f"{self.medication.name} - Batch {self.batch_number}"
     
+    def save(self, *args, movement=None, **kwargs):
+        """
+        Save the batch and record any quantity change in the stock ledger
+        within the same transaction.
+        
+        ``movement`` optionally describes the change with ``StockMovement``
+        fields (``movement_type``, ``performed_by``, ``dispense``,
+        ``reference``, ``notes``). Without it, a new batch is recorded as a
+        receipt and a changed quantity as an adjustment.
+        """
+        from django.db import transaction
+        
+        with transaction.atomic():
+            if self._state.adding:
+                previous = Decimal('0')
+            else:
+                # Lock and re-read the stored quantity, so concurrent saves
+                # each record their own change
+                previous = MedicationInventory.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('quantity', flat=True).first() or Decimal('0')
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            
+            change = Decimal(str(self.quantity)) - previous
+            if change:
+                values = {'movement_type': 'receipt' if adding else 'adjustment'}
+                values.update(movement or {})
+                StockMovement.objects.create(
+                    inventory=self,
+                    medication_id=self.medication_id,
+                    batch_number=self.batch_number,
+                    quantity=change,
+                    balance_after=self.quantity,
+                    **values,
+                )
+    
+    @classmethod
+    def save_quantities(cls, batches, movements):
+        """
+        Bulk-save the changed quantities of ``batches`` together with their
+        ledger ``movements`` (unsaved ``StockMovement`` rows, in order).
+        
+        The stored quantities are re-read under ``select_for_update`` and the
+        movements of each batch must add up to its change, so the ledger
+        cannot drift from the batches. ``balance_after`` is filled in from the
+        running balance.
+        """
+        from django.db import transaction
+        
+        batches = list(batches)
+        if not batches:
+            return
+        with transaction.atomic():
+            balances = dict(
+                cls.objects.select_for_update().filter(pk__in=[batch.pk for batch in batches])
+                .values_list('pk', 'quantity')
+            )
+            for movement in movements:
+                balances[movement.inventory_id] += movement.quantity
+                movement.balance_after = balances[movement.inventory_id]
+            mismatched = [batch.pk for batch in batches if balances[batch.pk] != batch.quantity]
+            if mismatched:
+                raise ValueError(f'Stock movements do not match the quantity change of batch(es) {mismatched}')
+            
+            now = timezone.now()
+            for batch in batches:
+                batch.updated_at = now
+            cls.objects.bulk_update(batches, ['quantity', 'updated_at'], batch_size=1000)
+            StockMovement.objects.bulk_create(movements, batch_size=1000)
+            # bulk_update bypasses post_save, so refresh stock summaries here
+            MedicationStock.refresh({batch.medication_id for batch in batches})
+    
     @property
     def is_low_stock(self):
         """Check if stock is below minimum level."""
@@ -100,6 +265,159 @@ class MedicationInventory(models.Model):
         return self.expiry_date < timezone.now().date()
 
 
+class MedicationStock(models.Model):
+    """
+    Materialized stock-on-hand summary per medication.
+    
+    Maintained from ``MedicationInventory`` changes so serializers can read
+    stock levels without aggregating inventory batches on every render.
+    """
+    
+    medication = models.OneToOneField(Medication, on_delete=models.CASCADE, related_name='stock_summary')
+    on_hand = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    unexpired_on_hand = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earliest_expiry = models.DateField(null=True, blank=True, help_text="Earliest expiry among unexpired batches with stock")
+    batch_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    SUMMARY_FIELDS = ['on_hand', 'unexpired_on_hand', 'earliest_expiry', 'batch_count']
+    
+    class Meta:
+        db_table = 'medication_stock'
+    
+    def __str__(self):
+        return f"{self.medication.name} - {self.unexpired_on_hand} on hand"
+    
+    @property
+    def is_stale(self):
+        """A batch counted as unexpired has expired since the summary was computed."""
+        return self.earliest_expiry is not None and self.earliest_expiry <= timezone.now().date()
+    
+    @classmethod
+    def compute(cls, medication_ids=None):
+        """
+        Aggregate inventory into summary values with one grouped query.
+        
+        Returns ``{medication_id: {field: value}}``. Medications without any
+        inventory batches are omitted when ``medication_ids`` is None.
+        """
+        from django.db.models import Sum, Min, Count, Q
+        
+        today = timezone.now().date()
+        queryset = MedicationInventory.objects.all()
+        if medication_ids is not None:
+            queryset = queryset.filter(medication_id__in=medication_ids)
+        
+        rows = queryset.values('medication_id').annotate(
+            total=Sum('quantity'),
+            unexpired=Sum('quantity', filter=Q(expiry_date__gt=today)),
+            earliest=Min('expiry_date', filter=Q(expiry_date__gt=today, quantity__gt=0)),
+            batches=Count('id'),
+        ).order_by()
+        
+        summaries = {
+            medication_id: {
+                'on_hand': Decimal('0'),
+                'unexpired_on_hand': Decimal('0'),
+                'earliest_expiry': None,
+                'batch_count': 0,
+            }
+            for medication_id in (medication_ids or [])
+        }
+        for row in rows:
+            summaries[row['medication_id']] = {
+                'on_hand': row['total'] or Decimal('0'),
+                'unexpired_on_hand': row['unexpired'] or Decimal('0'),
+                'earliest_expiry': row['earliest'],
+                'batch_count': row['batches'],
+            }
+        return summaries
+    
+    @classmethod
+    def refresh(cls, medication_ids):
+        """
+        Recompute and store summaries for the given medications.
+        
+        Existing summary rows are locked first so concurrent inventory changes
+        for the same medication recompute one after another. Should be called
+        inside the transaction that changed the inventory.
+        """
+        from django.db import transaction
+        
+        medication_ids = sorted(set(medication_ids))
+        if not medication_ids:
+            return {}
+        
+        with transaction.atomic():
+            list(cls.objects.select_for_update().filter(medication_id__in=medication_ids).order_by('medication_id'))
+            summaries = cls.compute(medication_ids)
+            rows = [
+                cls(medication_id=medication_id, updated_at=timezone.now(), **values)
+                for medication_id, values in summaries.items()
+            ]
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['medication'],
+                update_fields=cls.SUMMARY_FIELDS + ['updated_at'],
+            )
+            # Stock status shown in medication autocomplete
+            from .autocomplete import invalidate_stock
+            transaction.on_commit(partial(invalidate_stock, medication_ids))
+        return {row.medication_id: row for row in rows}
+    
+    @classmethod
+    def refresh_expired(cls):
+        """Recompute summaries counting a batch that has since expired. Returns how many."""
+        medication_ids = list(
+            cls.objects.filter(earliest_expiry__lte=timezone.now().date()).values_list('medication_id', flat=True)
+        )
+        cls.refresh(medication_ids)
+        return len(medication_ids)
+    
+    @classmethod
+    def for_medication(cls, medication):
+        """
+        Return the medication's summary. A missing or stale summary is
+        computed without being stored, so reads never write; the write paths
+        and the nightly ``refresh_expired`` keep the stored rows current.
+        """
+        try:
+            summary = medication.stock_summary
+        except cls.DoesNotExist:
+            summary = None
+        if summary is None or summary.is_stale:
+            values = cls.compute([medication.id])[medication.id]
+            summary = cls(medication=medication, updated_at=timezone.now(), **values)
+        return summary
+
+
+class MedicationForecast(models.Model):
+    """
+    Demand forecast and suggested stock levels per medication.
+    
+    Recomputed nightly from dispense history; see ``pharmacy.forecasting``.
+    """
+    
+    medication = models.OneToOneField(Medication, on_delete=models.CASCADE, related_name='forecast')
+    window_days = models.IntegerField(help_text="Days of dispense history used")
+    avg_daily_demand = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    demand_std_dev = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    lead_time_days = models.IntegerField()
+    safety_stock = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    suggested_min_level = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Reorder point")
+    suggested_max_level = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True, help_text="Unexpired stock divided by daily demand; empty when there is no demand")
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'medication_forecasts'
+        ordering = ['days_of_cover']
+    
+    def __str__(self):
+        return f"{self.medication.name} - reorder at {self.suggested_min_level}"
+
+
 class Prescription(models.Model):
     """
     Prescription from a doctor.
@@ -147,14 +465,19 @@ class Prescription(models.Model):
             self.prescription_id = f"RX-{timestamp}-{suffix}"
         super().save(*args, **kwargs)
     
-    def recalculate_status(self):
-        """Recalculate and update prescription status based on medication items."""
+    def recalculate_status(self, items=None):
+        """
+        Recalculate and update prescription status based on medication items.
+        
+        ``items`` may be passed when the caller already holds every item of the
+        prescription in memory, to avoid re-querying them.
+        """
         from django.utils import timezone
         
         # Get all medication items
-        all_items = self.medications.all()
+        all_items = list(self.medications.all()) if items is None else list(items)
         
-        if not all_items.exists():
+        if not all_items:
             # No items, keep current status or set to pending
             if self.status not in ['cancelled']:
                 self.status = 'pending'
@@ -163,20 +486,24 @@ class Prescription(models.Model):
         # Check each item and ensure is_dispensed is correctly set
         all_dispensed = True
         has_partial = False
+        changed_items = []
         
         for item in all_items:
             # Update is_dispensed based on actual dispensed quantity
             if item.dispensed_quantity >= item.quantity:
                 if not item.is_dispensed:
                     item.is_dispensed = True
-                    item.save(update_fields=['is_dispensed'])
+                    changed_items.append(item)
             else:
                 all_dispensed = False
                 if item.dispensed_quantity > 0:
                     has_partial = True
                 if item.is_dispensed:
                     item.is_dispensed = False
-                    item.save(update_fields=['is_dispensed'])
+                    changed_items.append(item)
+        
+        if changed_items:
+            PrescriptionItem.objects.bulk_update(changed_items, ['is_dispensed'])
         
         # Update prescription status
         if all_dispensed:
@@ -252,18 +579,224 @@ class Dispense(models.Model):
             models.Index(fields=['prescription', '-dispensed_at']),
         ]
     
+    @staticmethod
+    def generate_dispense_id(sequence=None):
+        """
+        Generate a dispense ID: DISP-YYYYMMDD-HHMMSS-XXXX.
+        
+        ``sequence`` is appended for rows created together in one batch, where
+        ``save()`` is bypassed and the random suffix alone could collide.
+        """
+        from datetime import datetime
+        import random
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        # Add random suffix to ensure uniqueness
+        suffix = f"{random.randint(1000, 9999)}"
+        dispense_id = f"DISP-{timestamp}-{suffix}"
+        if sequence is not None:
+            dispense_id = f"{dispense_id}-{sequence}"
+        return dispense_id
+    
     def save(self, *args, **kwargs):
         """Auto-generate dispense_id if not provided."""
         if not self.dispense_id:
-            # Generate dispense ID: DISP-YYYYMMDD-HHMMSS-XXXX
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-            # Add random suffix to ensure uniqueness
-            import random
-            suffix = f"{random.randint(1000, 9999)}"
-            self.dispense_id = f"DISP-{timestamp}-{suffix}"
+            self.dispense_id = self.generate_dispense_id()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.dispense_id} - {self.medication.name}"
 
+
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger entry for an inventory batch.
+    
+    Every change of ``MedicationInventory.quantity`` is recorded as a signed
+    movement in the same transaction. Rows are never updated or deleted;
+    corrections are recorded as further adjustments, and batches and
+    dispenses with movements cannot be deleted.
+    """
+    
+    MOVEMENT_TYPE_CHOICES = [
+        ('opening', 'Opening Balance'),
+        ('receipt', 'Receipt'),
+        ('dispense', 'Dispense'),
+        ('adjustment', 'Adjustment'),
+        ('return', 'Return'),
+        ('expiry', 'Expiry Write-off'),
+    ]
+    
+    # Movement types that only add to or only remove from stock
+    INBOUND_TYPES = ['receipt', 'return']
+    OUTBOUND_TYPES = ['dispense', 'expiry']
+    
+    inventory = models.ForeignKey(MedicationInventory, on_delete=models.PROTECT, null=True, related_name='movements')
+    medication = models.ForeignKey(Medication, on_delete=models.PROTECT, related_name='stock_movements')
+    batch_number = models.CharField(max_length=100, blank=True)
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, help_text="Signed change in stock")
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2, help_text="Batch quantity after the movement")
+    
+    dispense = models.ForeignKey(Dispense, on_delete=models.PROTECT, null=True, blank=True, related_name='stock_movements')
+    reference = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    performed_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        db_table = 'stock_movements'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['inventory', 'created_at']),
+            models.Index(fields=['medication', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} - Batch {self.batch_number}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Stock movements are append-only and cannot be changed')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Stock movements are append-only and cannot be deleted')
+
+
+class StockBalanceSnapshot(models.Model):
+    """
+    Ledger balance of an inventory batch at a point in time.
+    
+    Snapshots are taken for every batch with a non-zero balance in one run,
+    so the balance at any time is the latest run before it plus the
+    movements since; see ``pharmacy.ledger``.
+    """
+    
+    inventory = models.ForeignKey(MedicationInventory, on_delete=models.CASCADE, related_name='balance_snapshots')
+    taken_at = models.DateTimeField(db_index=True)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    class Meta:
+        db_table = 'stock_balance_snapshots'
+        ordering = ['-taken_at']
+        unique_together = [['inventory', 'taken_at']]
+    
+    def __str__(self):
+        return f"Batch {self.inventory_id} - {self.balance} at {self.taken_at}"
+
+
+class InventoryAlert(models.Model):
+    """
+    Precomputed inventory alert for a batch.
+    
+    Maintained by the scheduled job in ``pharmacy.alerts``. ``dedup_key``
+    identifies the condition (alert type and batch); at most one active
+    alert exists per key, so a condition is only notified once until it
+    clears.
+    """
+    
+    ALERT_TYPE_CHOICES = [
+        ('low_stock', 'Low Stock'),
+        ('expiring', 'Expiring Soon'),
+        ('expired', 'Expired'),
+    ]
+    
+    inventory = models.ForeignKey(MedicationInventory, on_delete=models.CASCADE, related_name='alerts')
+    alert_type = models.CharField(max_length=20, choices=ALERT_TYPE_CHOICES)
+    dedup_key = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    
+    # Batch values when the alert was last evaluated
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    min_stock_level = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    expiry_date = models.DateField()
+    
+    first_detected_at = models.DateTimeField()
+    last_detected_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'inventory_alerts'
+        ordering = ['-first_detected_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(is_active=True),
+                name='unique_active_inventory_alert',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['is_active', 'alert_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_alert_type_display()} - Batch {self.inventory_id}"
+    
+    @staticmethod
+    def make_dedup_key(alert_type, inventory_id):
+        return f"{alert_type}:{inventory_id}"
+
+
+class StockTakeSession(models.Model):
+    """
+    Physical stock count session.
+    
+    Counted quantities are uploaded in bulk while the session is open;
+    posting the session adjusts every counted batch to its count.
+    """
+    
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('posted', 'Posted'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    name = models.CharField(max_length=200)
+    location = models.CharField(max_length=100, blank=True, help_text="Restrict counts to batches at this location")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open', db_index=True)
+    notes = models.TextField(blank=True)
+    
+    opened_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='opened_stock_takes')
+    opened_at = models.DateTimeField(auto_now_add=True)
+    posted_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='posted_stock_takes')
+    posted_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'stock_take_sessions'
+        ordering = ['-opened_at']
+    
+    def __str__(self):
+        return f"{self.reference} - {self.name}"
+    
+    @property
+    def reference(self):
+        """Reference recorded on the ledger adjustments of this session."""
+        return f"STOCKTAKE-{self.pk}"
+
+
+class StockTakeCount(models.Model):
+    """
+    Counted quantity of one batch in a stock-take session.
+    
+    ``system_quantity`` is filled in when the session is posted; until then
+    variances are computed against the live inventory quantity.
+    """
+    
+    session = models.ForeignKey(StockTakeSession, on_delete=models.CASCADE, related_name='counts')
+    inventory = models.ForeignKey(MedicationInventory, on_delete=models.CASCADE, related_name='stock_take_counts')
+    counted_quantity = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    system_quantity = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    notes = models.TextField(blank=True)
+    
+    counted_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='stock_take_counts')
+    counted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'stock_take_counts'
+        ordering = ['inventory__medication__name', 'inventory__batch_number']
+        unique_together = [['session', 'inventory']]
+    
+    def __str__(self):
+        return f"{self.session.reference} - Batch {self.inventory_id}: {self.counted_quantity}"
@@ -2,7 +2,11 @@
 Serializers for the Pharmacy app.
 """
 from rest_framework import serializers
-from .models import Medication, MedicationInventory, Prescription, PrescriptionItem, Dispense
+from .allergies import check_allergy_conflicts
+from .models import (
+    Medication, MedicationInventory, MedicationStock, MedicationForecast,
+    Prescription, PrescriptionItem, Dispense, StockMovement, StockTakeSession, StockTakeCount,
+)
 
 
 class MedicationSerializer(serializers.ModelSerializer):
@@ -25,6 +29,105 @@ class MedicationInventorySerializer(serializers.ModelSerializer):
         model = MedicationInventory
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+    
+    def create(self, validated_data):
+        """Create the batch, recording its receipt against ``performed_by`` if given."""
+        performed_by = validated_data.pop('performed_by', None)
+        instance = MedicationInventory(**validated_data)
+        instance.save(movement={'performed_by': performed_by})
+        return instance
+    
+    def update(self, instance, validated_data):
+        """Update the batch, recording any quantity change against ``performed_by`` if given."""
+        performed_by = validated_data.pop('performed_by', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(movement={'performed_by': performed_by})
+        return instance
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    """Serializer for stock ledger entries."""
+    
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+    movement_type_display = serializers.CharField(source='get_movement_type_display', read_only=True)
+    performed_by_name = serializers.CharField(source='performed_by.get_full_name', read_only=True, allow_null=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = '__all__'
+        read_only_fields = [field.name for field in StockMovement._meta.fields]
+
+
+class StockTakeSessionSerializer(serializers.ModelSerializer):
+    """Serializer for stock-take sessions."""
+    
+    reference = serializers.ReadOnlyField()
+    opened_by_name = serializers.CharField(source='opened_by.get_full_name', read_only=True, allow_null=True)
+    posted_by_name = serializers.CharField(source='posted_by.get_full_name', read_only=True, allow_null=True)
+    count_lines = serializers.SerializerMethodField()
+    
+    def get_count_lines(self, obj):
+        """Number of batches counted, annotated on list queries."""
+        count_lines = getattr(obj, 'count_lines', None)
+        return count_lines if count_lines is not None else obj.counts.count()
+    
+    class Meta:
+        model = StockTakeSession
+        fields = '__all__'
+        read_only_fields = ['status', 'opened_by', 'opened_at', 'posted_by', 'posted_at']
+
+
+class StockTakeCountSerializer(serializers.ModelSerializer):
+    """Serializer for counted batches in a stock-take session."""
+    
+    medication_name = serializers.CharField(source='inventory.medication.name', read_only=True)
+    batch_number = serializers.CharField(source='inventory.batch_number', read_only=True)
+    
+    class Meta:
+        model = StockTakeCount
+        fields = '__all__'
+        read_only_fields = [field.name for field in StockTakeCount._meta.fields]
+
+
+class MedicationStockSerializer(serializers.ModelSerializer):
+    """Serializer for MedicationStock summaries."""
+    
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+    
+    class Meta:
+        model = MedicationStock
+        fields = '__all__'
+        read_only_fields = ['medication', 'on_hand', 'unexpired_on_hand', 'earliest_expiry', 'batch_count', 'updated_at']
+
+
+class MedicationForecastSerializer(serializers.ModelSerializer):
+    """Serializer for procurement suggestions from MedicationForecast."""
+    
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+    medication_code = serializers.CharField(source='medication.code', read_only=True)
+    unit = serializers.CharField(source='medication.unit', read_only=True)
+    current_stock = serializers.SerializerMethodField()
+    reorder_quantity = serializers.SerializerMethodField()
+    
+    def _current_stock(self, obj):
+        summary = getattr(obj.medication, 'stock_summary', None)
+        return summary.unexpired_on_hand if summary else 0
+    
+    def get_current_stock(self, obj):
+        """Unexpired stock on hand from the materialized summary."""
+        return float(self._current_stock(obj))
+    
+    def get_reorder_quantity(self, obj):
+        """Quantity to order to reach the suggested maximum, once at or below the reorder point."""
+        on_hand = self._current_stock(obj)
+        if obj.avg_daily_demand <= 0 or on_hand > obj.suggested_min_level:
+            return 0
+        return float(obj.suggested_max_level - on_hand)
+    
+    class Meta:
+        model = MedicationForecast
+        fields = '__all__'
 
 
 class PrescriptionItemSerializer(serializers.ModelSerializer):
@@ -40,21 +143,14 @@ class PrescriptionItemSerializer(serializers.ModelSerializer):
         if not obj.medication:
             return None
         
-        # Calculate total available stock from inventory
-        from .models import MedicationInventory
-        from django.db.models import Sum
-        from django.utils import timezone
-        
-        total_stock = MedicationInventory.objects.filter(
-            medication=obj.medication,
-            expiry_date__gt=timezone.now().date()
-        ).aggregate(total=Sum('quantity'))['total'] or 0
+        # Read available stock from the materialized per-medication summary
+        stock = MedicationStock.for_medication(obj.medication)
         
         return {
             'id': obj.medication.id,
             'name': obj.medication.name,
             'code': obj.medication.code,
-            'current_stock': float(total_stock),
+            'current_stock': float(stock.unexpired_on_hand),
             'unit': obj.medication.unit,
             'strength': obj.medication.strength,
             'form': obj.medication.form,
@@ -92,8 +188,21 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         for item_data in items_data:
             PrescriptionItem.objects.create(prescription=prescription, **item_data)
         
+        # Flag drug-allergy conflicts so the prescriber sees them in the response
+        prescription.allergy_conflicts = check_allergy_conflicts(
+            prescription.patient_id,
+            [item_data['medication'].id for item_data in items_data],
+        )
+        
         return prescription
     
+    def to_representation(self, instance):
+        """Include allergy conflicts found when the prescription was created."""
+        data = super().to_representation(instance)
+        if hasattr(instance, 'allergy_conflicts'):
+            data['allergy_conflicts'] = instance.allergy_conflicts
+        return data
+    
     class Meta:
         model = Prescription
         fields = '__all__'
@@ -0,0 +1,480 @@
+"""
+Services for the Pharmacy app.
+"""
+import csv
+import io
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+
+from .models import (
+    MedicationInventory, Prescription, PrescriptionItem, Dispense, StockMovement,
+    StockTakeCount,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DispenseError(Exception):
+    """Raised when a dispense request cannot be applied."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or []
+
+
+class DispenseService:
+    """Service for dispensing medications against prescriptions."""
+
+    @staticmethod
+    def parse_batch_lines(lines):
+        """
+        Validate the raw ``items`` payload of a batch dispense request.
+
+        Returns a list of dicts with ``item_id``, ``quantity``, ``inventory_id``
+        and ``notes``. Raises ``DispenseError`` listing every invalid line.
+        """
+        if not isinstance(lines, list) or not lines:
+            raise DispenseError('items must be a non-empty list')
+
+        parsed = []
+        errors = []
+        for index, line in enumerate(lines):
+            if not isinstance(line, dict):
+                errors.append({'index': index, 'error': 'Each item must be an object'})
+                continue
+            try:
+                item_id = int(line.get('item_id'))
+                quantity = Decimal(str(line.get('quantity', 0)))
+                inventory_id = line.get('inventory_id')
+                inventory_id = int(inventory_id) if inventory_id not in (None, '') else None
+            except (TypeError, ValueError, InvalidOperation):
+                errors.append({'index': index, 'error': 'Invalid item_id, quantity or inventory_id'})
+                continue
+            if not quantity.is_finite():
+                errors.append({'index': index, 'item_id': item_id, 'error': 'Quantity must be a finite number'})
+                continue
+            if quantity <= 0:
+                errors.append({'index': index, 'item_id': item_id, 'error': 'Quantity must be greater than zero'})
+                continue
+            parsed.append({
+                'item_id': item_id,
+                'quantity': quantity,
+                'inventory_id': inventory_id,
+                'notes': line.get('notes'),
+            })
+
+        if errors:
+            raise DispenseError('Invalid dispense items', details=errors)
+        return parsed
+
+    @staticmethod
+    def dispense_batch(prescription, lines, user, notes=''):
+        """
+        Dispense several prescription items in a single transaction.
+
+        Stock for every referenced inventory batch is locked and validated in
+        one query; inventory, dispense rows and prescription items are written
+        with bulk operations and the prescription status is recomputed once.
+        Returns the list of created ``Dispense`` records.
+        """
+        with transaction.atomic():
+            items = {item.id: item for item in prescription.medications.select_for_update()}
+
+            missing_items = sorted({line['item_id'] for line in lines} - set(items))
+            if missing_items:
+                raise DispenseError(
+                    'Prescription item(s) not found',
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    details=[{'item_id': item_id, 'error': 'Prescription item not found'} for item_id in missing_items],
+                )
+
+            inventory_ids = {line['inventory_id'] for line in lines if line['inventory_id']}
+            inventory = {
+                inv.id: inv
+                for inv in MedicationInventory.objects.select_for_update().filter(id__in=inventory_ids)
+            }
+
+            missing_inventory = sorted(inventory_ids - set(inventory))
+            if missing_inventory:
+                raise DispenseError(
+                    'Inventory item(s) not found',
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    details=[{'inventory_id': inv_id, 'error': 'Inventory item not found'} for inv_id in missing_inventory],
+                )
+
+            # Several lines may draw on the same batch, so validate the totals
+            requested = {}
+            for line in lines:
+                if line['inventory_id']:
+                    requested[line['inventory_id']] = requested.get(line['inventory_id'], Decimal('0')) + line['quantity']
+
+            shortages = [
+                {
+                    'inventory_id': inv_id,
+                    'batch_number': inventory[inv_id].batch_number,
+                    'requested': float(quantity),
+                    'available': float(inventory[inv_id].quantity),
+                    'error': 'Insufficient stock',
+                }
+                for inv_id, quantity in requested.items()
+                if inventory[inv_id].quantity < quantity
+            ]
+            if shortages:
+                raise DispenseError('Insufficient stock', details=shortages)
+
+            now = timezone.now()
+            for inv_id, quantity in requested.items():
+                inventory[inv_id].quantity -= quantity
+
+            dispenses = []
+            touched_items = {}
+            for sequence, line in enumerate(lines, start=1):
+                item = items[line['item_id']]
+                inv = inventory.get(line['inventory_id'])
+                dispenses.append(Dispense(
+                    dispense_id=Dispense.generate_dispense_id(sequence),
+                    prescription=prescription,
+                    prescription_item=item,
+                    medication_id=item.medication_id,
+                    inventory_item=inv,
+                    quantity=line['quantity'],
+                    unit=item.unit,
+                    batch_number=inv.batch_number if inv else '',
+                    dispensed_by=user,
+                    notes=line['notes'] if line['notes'] is not None else notes,
+                ))
+
+                item.dispensed_quantity += line['quantity']
+                item.is_dispensed = item.dispensed_quantity >= item.quantity
+                touched_items[item.id] = item
+
+            Dispense.objects.bulk_create(dispenses)
+
+            # Ledger entries for the batches drawn on, in line order
+            MedicationInventory.save_quantities(
+                [inventory[inv_id] for inv_id in requested],
+                [
+                    StockMovement(
+                        inventory=dispense.inventory_item,
+                        medication_id=dispense.medication_id,
+                        batch_number=dispense.batch_number,
+                        movement_type='dispense',
+                        quantity=-dispense.quantity,
+                        dispense=dispense,
+                        reference=dispense.dispense_id,
+                        performed_by=user,
+                        created_at=now,
+                    )
+                    for dispense in dispenses
+                    if dispense.inventory_item is not None
+                ],
+            )
+            PrescriptionItem.objects.bulk_update(
+                list(touched_items.values()), ['dispensed_quantity', 'is_dispensed']
+            )
+
+            # Recalculate prescription status once, from the items already in memory
+            prescription.recalculate_status(items=items.values())
+
+        logger.info(
+            f"Dispensed {len(dispenses)} line(s) for prescription {prescription.prescription_id}"
+        )
+        return dispenses
+
+
+class PrescriptionStatusService:
+    """
+    Set-based recalculation of item and prescription dispensing status.
+
+    Mirrors ``Prescription.recalculate_status`` with a handful of UPDATE
+    statements per range of prescriptions instead of per-row saves.
+    """
+
+    @staticmethod
+    def status_expressions():
+        """
+        Return ``(has_items, new_status, new_dispensed_at)`` expressions
+        computed from each prescription's items.
+        """
+        items = PrescriptionItem.objects.filter(prescription=OuterRef('pk'))
+        outstanding = items.filter(dispensed_quantity__lt=F('quantity'))
+        fully_dispensed = ~Exists(outstanding)
+
+        new_status = Case(
+            When(fully_dispensed, then=Value('dispensed')),
+            When(Exists(outstanding.filter(dispensed_quantity__gt=0)), then=Value('partially_dispensed')),
+            When(status='dispensed', then=Value('partially_dispensed')),
+            When(status='cancelled', then=Value('cancelled')),
+            default=Value('pending'),
+        )
+        # Newly dispensed prescriptions keep an existing dispensed_at
+        new_dispensed_at = Case(
+            When(fully_dispensed, then=Coalesce(F('dispensed_at'), Value(timezone.now()))),
+            default=F('dispensed_at'),
+        )
+        return Exists(items), new_status, new_dispensed_at
+
+    @staticmethod
+    def recalculate_range(queryset, first_pk, last_pk, dry_run=False):
+        """
+        Recalculate statuses for prescriptions of ``queryset`` with primary
+        keys in ``[first_pk, last_pk]``.
+    
+        Returns ``(items_fixed, transitions)`` where ``transitions`` maps
+        ``(old_status, new_status)`` to a count.
+        """
+        prescriptions = queryset.filter(pk__gte=first_pk, pk__lte=last_pk)
+        items = PrescriptionItem.objects.filter(prescription__in=prescriptions.values('pk'))
+        items_to_set = items.filter(is_dispensed=False, dispensed_quantity__gte=F('quantity'))
+        items_to_clear = items.filter(is_dispensed=True, dispensed_quantity__lt=F('quantity'))
+
+        # Prescriptions without items keep their status, as in recalculate_status
+        has_items, new_status, new_dispensed_at = PrescriptionStatusService.status_expressions()
+        changed = prescriptions.filter(has_items).annotate(new_status=new_status).filter(
+            ~Q(status=F('new_status')) | Q(new_status='dispensed', dispensed_at__isnull=True)
+        )
+
+        with transaction.atomic():
+            transitions = {
+                (row['status'], row['new_status']): row['count']
+                for row in changed.values('status', 'new_status').annotate(count=Count('pk')).order_by()
+            }
+
+            if dry_run:
+                return items_to_set.count() + items_to_clear.count(), transitions
+
+            items_fixed = items_to_set.update(is_dispensed=True) + items_to_clear.update(is_dispensed=False)
+            Prescription.objects.filter(pk__in=list(changed.values_list('pk', flat=True))).update(
+                status=new_status,
+                dispensed_at=new_dispensed_at,
+            )
+
+        return items_fixed, transitions
+
+
+class StockTakeError(Exception):
+    """Raised when a stock-take request cannot be applied."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or []
+
+
+class StockTakeService:
+    """Service for bulk stock counts and posting their adjustments."""
+
+    @staticmethod
+    def parse_count_lines(lines=None, csv_file=None):
+        """
+        Validate counts given as a JSON array or an uploaded CSV file.
+
+        Each line identifies a batch by ``inventory_id`` or by
+        ``medication_code`` and ``batch_number``, and gives
+        ``counted_quantity`` and optional ``notes``; CSV files use these as
+        column headers. Raises ``StockTakeError`` listing every invalid line.
+        """
+        if csv_file is not None:
+            try:
+                text = csv_file.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise StockTakeError('CSV file must be UTF-8 encoded')
+            lines = list(csv.DictReader(io.StringIO(text)))
+
+        if not isinstance(lines, list) or not lines:
+            raise StockTakeError('counts must be a non-empty list or CSV file')
+
+        parsed = []
+        errors = []
+        for index, line in enumerate(lines):
+            if not isinstance(line, dict):
+                errors.append({'index': index, 'error': 'Each count must be an object'})
+                continue
+            try:
+                inventory_id = line.get('inventory_id')
+                inventory_id = int(inventory_id) if inventory_id not in (None, '') else None
+                counted_quantity = Decimal(str(line.get('counted_quantity', '')).strip())
+            except (TypeError, ValueError, InvalidOperation):
+                errors.append({'index': index, 'error': 'Invalid inventory_id or counted_quantity'})
+                continue
+            if not counted_quantity.is_finite():
+                errors.append({'index': index, 'error': 'counted_quantity must be a finite number'})
+                continue
+            medication_code = (line.get('medication_code') or '').strip()
+            batch_number = (line.get('batch_number') or '').strip()
+            if inventory_id is None and not (medication_code and batch_number):
+                errors.append({'index': index, 'error': 'Provide inventory_id or medication_code and batch_number'})
+                continue
+            if counted_quantity < 0:
+                errors.append({'index': index, 'error': 'counted_quantity cannot be negative'})
+                continue
+            parsed.append({
+                'index': index,
+                'inventory_id': inventory_id,
+                'medication_code': medication_code,
+                'batch_number': batch_number,
+                'counted_quantity': counted_quantity,
+                'notes': line.get('notes') or '',
+            })
+
+        if errors:
+            raise StockTakeError('Invalid counts', details=errors)
+        return parsed
+
+    @staticmethod
+    def record_counts(session, lines, user):
+        """
+        Store counts for an open session, replacing earlier counts of the
+        same batches. Batches are resolved with one query and counts written
+        with one upsert. Returns the number of counts stored.
+        """
+        if session.status != 'open':
+            raise StockTakeError('Stock take session is not open')
+
+        inventory_ids = {line['inventory_id'] for line in lines if line['inventory_id']}
+        codes = {line['medication_code'] for line in lines if not line['inventory_id']}
+        batch_numbers = {line['batch_number'] for line in lines if not line['inventory_id']}
+        batches = MedicationInventory.objects.filter(
+            Q(id__in=inventory_ids) | Q(medication__code__in=codes, batch_number__in=batch_numbers)
+        ).values('id', 'medication__code', 'batch_number', 'location')
+
+        by_id = {}
+        by_key = {}
+        for batch in batches:
+            by_id[batch['id']] = batch
+            by_key.setdefault((batch['medication__code'], batch['batch_number']), []).append(batch)
+
+        errors = []
+        counts = {}
+        for line in lines:
+            if line['inventory_id']:
+                batch = by_id.get(line['inventory_id'])
+                if batch is None:
+                    errors.append({'index': line['index'], 'error': 'Inventory item not found'})
+                    continue
+            else:
+                matches = by_key.get((line['medication_code'], line['batch_number']), [])
+                if len(matches) != 1:
+                    errors.append({
+                        'index': line['index'],
+                        'error': 'Batch not found' if not matches else 'Batch number is ambiguous; use inventory_id',
+                    })
+                    continue
+                batch = matches[0]
+            if session.location and batch['location'] != session.location:
+                errors.append({'index': line['index'], 'error': f"Batch is not at location {session.location}"})
+                continue
+            if batch['id'] in counts:
+                errors.append({'index': line['index'], 'error': 'Batch counted more than once'})
+                continue
+            counts[batch['id']] = StockTakeCount(
+                session=session,
+                inventory_id=batch['id'],
+                counted_quantity=line['counted_quantity'],
+                notes=line['notes'],
+                counted_by=user,
+                counted_at=timezone.now(),
+            )
+
+        if errors:
+            raise StockTakeError('Invalid counts', details=errors)
+
+        StockTakeCount.objects.bulk_create(
+            list(counts.values()),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['session', 'inventory'],
+            update_fields=['counted_quantity', 'notes', 'counted_by', 'counted_at'],
+        )
+        return len(counts)
+
+    @staticmethod
+    def variances(session, only_variances=False):
+        """
+        Count rows with system quantity, variance and variance value, from
+        one query. Open sessions compare against the live inventory quantity.
+        """
+        system_quantity = Coalesce(F('system_quantity'), F('inventory__quantity'))
+        queryset = session.counts.annotate(
+            system=system_quantity,
+            variance=F('counted_quantity') - system_quantity,
+            variance_value=(F('counted_quantity') - system_quantity) * F('inventory__purchase_price'),
+        )
+        if only_variances:
+            queryset = queryset.exclude(variance=0)
+        return list(queryset.values(
+            'inventory_id', 'inventory__medication__name', 'inventory__medication__code',
+            'inventory__batch_number', 'inventory__expiry_date', 'inventory__location', 'inventory__unit',
+            'system', 'counted_quantity', 'variance', 'variance_value', 'notes',
+        ))
+
+    @staticmethod
+    def post_session(session, user):
+        """
+        Adjust every counted batch to its count in one transaction.
+
+        Inventory is locked and updated with ``bulk_update``; the adjustments
+        are recorded in the stock ledger and the system quantities kept on
+        the counts for the variance report. Returns a summary dict.
+        """
+        with transaction.atomic():
+            session = type(session).objects.select_for_update().get(pk=session.pk)
+            if session.status != 'open':
+                raise StockTakeError('Stock take session is not open')
+
+            counts = list(session.counts.all())
+            inventory = {
+                inv.id: inv
+                for inv in MedicationInventory.objects.select_for_update().filter(
+                    id__in=[count.inventory_id for count in counts]
+                )
+            }
+
+            now = timezone.now()
+            adjusted = []
+            movements = []
+            for count in counts:
+                inv = inventory[count.inventory_id]
+                count.system_quantity = inv.quantity
+                change = count.counted_quantity - inv.quantity
+                if not change:
+                    continue
+                inv.quantity = count.counted_quantity
+                adjusted.append(inv)
+                movements.append(StockMovement(
+                    inventory=inv,
+                    medication_id=inv.medication_id,
+                    batch_number=inv.batch_number,
+                    movement_type='adjustment',
+                    quantity=change,
+                    reference=session.reference,
+                    notes='Stock take',
+                    performed_by=user,
+                    created_at=now,
+                ))
+
+            MedicationInventory.save_quantities(adjusted, movements)
+            StockTakeCount.objects.bulk_update(counts, ['system_quantity'], batch_size=1000)
+
+            session.status = 'posted'
+            session.posted_by = user
+            session.posted_at = now
+            session.save(update_fields=['status', 'posted_by', 'posted_at'])
+
+        logger.info(
+            f"Posted stock take {session.reference}: {len(counts)} count(s), {len(adjusted)} adjustment(s)"
+        )
+        return {
+            'counted': len(counts),
+            'adjusted': len(adjusted),
+            'net_variance': float(sum((movement.quantity for movement in movements), Decimal('0'))),
+        }
@@ -0,0 +1,52 @@
+"""
+Signals keeping pharmacy stock summaries and in-memory indexes in sync.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .autocomplete import invalidate_catalog
+from .interactions import invalidate_index
+from .models import (
+    Medication, MedicationIngredient, DrugInteractionRule, AllergenMapping,
+    MedicationInventory, MedicationStock,
+)
+
+
+@receiver(post_save, sender=MedicationInventory)
+def refresh_stock_on_inventory_save(sender, instance, **kwargs):
+    """Recompute the medication's stock summary after a batch is saved."""
+    MedicationStock.refresh([instance.medication_id])
+
+
+@receiver(post_save, sender=Medication)
+def create_stock_summary(sender, instance, created, **kwargs):
+    """Give a new medication its (empty) stock summary, so reads never create one."""
+    if created:
+        MedicationStock.refresh([instance.id])
+
+
+@receiver(post_delete, sender=MedicationInventory)
+def refresh_stock_on_inventory_delete(sender, instance, **kwargs):
+    """Recompute the medication's stock summary after a batch is deleted."""
+    MedicationStock.refresh([instance.medication_id])
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+@receiver(post_save, sender=MedicationIngredient)
+@receiver(post_delete, sender=MedicationIngredient)
+@receiver(post_save, sender=DrugInteractionRule)
+@receiver(post_delete, sender=DrugInteractionRule)
+@receiver(post_save, sender=AllergenMapping)
+@receiver(post_delete, sender=AllergenMapping)
+def invalidate_interaction_index(sender, **kwargs):
+    """Have workers rebuild their interaction index once the change commits."""
+    transaction.on_commit(invalidate_index)
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def invalidate_autocomplete_catalog(sender, **kwargs):
+    """Have workers rebuild their autocomplete catalog once the change commits."""
+    transaction.on_commit(invalidate_catalog)
@@ -0,0 +1,33 @@
+"""
+Celery tasks for the Pharmacy app.
+"""
+from celery import shared_task
+
+from . import alerts
+from .forecasting import compute_reorder_points
+from .ledger import take_balance_snapshot
+from .models import MedicationStock
+
+
+@shared_task(ignore_result=True)
+def recompute_reorder_points():
+    """Nightly recomputation of demand forecasts and reorder points."""
+    compute_reorder_points()
+
+
+@shared_task(ignore_result=True)
+def snapshot_stock_balances():
+    """Nightly snapshot of per-batch ledger balances."""
+    take_balance_snapshot()
+
+
+@shared_task(ignore_result=True)
+def compute_inventory_alerts():
+    """Refresh stored inventory alerts and notify pharmacists of new ones."""
+    alerts.compute_inventory_alerts()
+
+
+@shared_task(ignore_result=True)
+def refresh_expired_stock_summaries():
+    """Nightly recount of stock summaries that include batches expired since."""
+    MedicationStock.refresh_expired()
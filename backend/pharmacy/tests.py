@@ -0,0 +1,33 @@
+"""
+Tests for the Pharmacy app.
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .allergies import check_allergy_conflicts
+from .interactions import InteractionIndex
+
+
+class AllergyConflictTests(SimpleTestCase):
+    """check_allergy_conflicts against a hand-built interaction index."""
+
+    def setUp(self):
+        index = InteractionIndex(
+            version='test',
+            partners={},
+            medication_terms={1: frozenset({'amoxicillin'}), 2: frozenset({'latex'})},
+            medication_names={1: 'Amoxil', 2: 'Latex catheter'},
+            allergen_terms={'penicillin': frozenset({'amoxicillin'})},
+        )
+        patcher = mock.patch('pharmacy.allergies.get_index', return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_mapped_allergen_matches_its_terms(self):
+        conflicts = check_allergy_conflicts(None, [1, 2], allergens=['penicillin'])
+        self.assertEqual([(c['medication_id'], c['allergen']) for c in conflicts], [(1, 'penicillin')])
+
+    def test_unmapped_allergen_matches_itself(self):
+        conflicts = check_allergy_conflicts(None, [1, 2], allergens=['latex'])
+        self.assertEqual([(c['medication_id'], c['allergen']) for c in conflicts], [(2, 'latex')])
@@ -4,13 +4,17 @@ URL configuration for the Pharmacy app.
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    MedicationViewSet, MedicationInventoryViewSet, PrescriptionViewSet,
-    DispenseViewSet, InventoryAlertViewSet
+    MedicationViewSet, MedicationInventoryViewSet, MedicationStockViewSet, ProcurementViewSet, PrescriptionViewSet,
+    DispenseViewSet, InventoryAlertViewSet, StockMovementViewSet, StockTakeSessionViewSet
 )
 
 router = DefaultRouter()
 router.register(r'medications', MedicationViewSet, basename='medication')
 router.register(r'inventory', MedicationInventoryViewSet, basename='medication-inventory')
+router.register(r'stock', MedicationStockViewSet, basename='medication-stock')
+router.register(r'stock-movements', StockMovementViewSet, basename='stock-movement')
+router.register(r'stock-takes', StockTakeSessionViewSet, basename='stock-take')
+router.register(r'procurement', ProcurementViewSet, basename='procurement')
 router.register(r'prescriptions', PrescriptionViewSet, basename='prescription')
 router.register(r'history', DispenseViewSet, basename='dispense')
 router.register(r'inventory-alerts', InventoryAlertViewSet, basename='inventory-alert')
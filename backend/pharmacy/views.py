@@ -7,95 +7,47 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.http import HttpResponse
 from django.utils import timezone
-from django.db.models import Q, F
-from decimal import Decimal
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import transaction
+from django.db.models import Q, F, Prefetch, Count, ProtectedError
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+import csv
 
-from .models import Medication, MedicationInventory, Prescription, PrescriptionItem, Dispense
+from .models import (
+    Medication, MedicationInventory, MedicationStock, MedicationForecast,
+    Prescription, PrescriptionItem, Dispense, StockMovement, StockTakeSession,
+)
 from .serializers import (
     MedicationSerializer,
     MedicationInventorySerializer,
+    MedicationStockSerializer,
+    MedicationForecastSerializer,
     PrescriptionSerializer,
     PrescriptionItemSerializer,
     DispenseSerializer,
+    StockMovementSerializer,
+    StockTakeSessionSerializer,
+    StockTakeCountSerializer,
 )
 from .pagination import FlexiblePageNumberPagination
+from .services import DispenseService, DispenseError, StockTakeService, StockTakeError
+from .interactions import check_drug_interactions
+from .allergies import check_allergy_conflicts
+from .autocomplete import autocomplete, DEFAULT_LIMIT, MAX_LIMIT
+from .ledger import ledger_balances
+from .alerts import alert_summary
 
 
-def check_drug_interactions(medication_ids):
-    """
-    Check for drug interactions between medications.
-    This is a basic implementation - in production, integrate with a drug interaction database/API.
-    """
-    interactions = []
-    
-    if len(medication_ids) < 2:
-        return interactions
-    
-    # Get medication objects
-    medications = Medication.objects.filter(id__in=medication_ids).values_list('id', 'name', 'generic_name')
-    med_dict = {med[0]: {'name': med[1], 'generic': med[2]} for med in medications}
-    
-    # Basic interaction rules (expand this with real drug interaction database)
-    # Example: ACE inhibitors + Potassium supplements = Hyperkalemia risk
-    # Example: Warfarin + Aspirin = Increased bleeding risk
-    # Example: Beta-blockers + Calcium channel blockers = Bradycardia/hypotension risk
-    
-    # Convert to list for easier iteration
-    med_list = list(medication_ids)
-    
-    # Check each pair
-    for i in range(len(med_list)):
-        for j in range(i + 1, len(med_list)):
-            med1_id = med_list[i]
-            med2_id = med_list[j]
-            
-            med1 = med_dict.get(med1_id)
-            med2 = med_dict.get(med2_id)
-            
-            if not med1 or not med2:
-                continue
-            
-            # Basic interaction checking based on categories/generic names
-            med1_name = (med1['generic'] or med1['name']).lower()
-            med2_name = (med2['generic'] or med2['name']).lower()
-            
-            # Example interactions (this should be replaced with proper drug interaction API)
-            interaction = None
-            
-            # Check for known interaction patterns
-            if any(term in med1_name for term in ['warfarin', 'aspirin', 'clopidogrel']) and \
-               any(term in med2_name for term in ['warfarin', 'aspirin', 'clopidogrel', 'ibuprofen']):
-                interaction = {
-                    'drug1': med1['name'],
-                    'drug2': med2['name'],
-                    'severity': 'Major',
-                    'description': 'Increased risk of bleeding when anticoagulants are combined',
-                    'recommendation': 'Monitor for signs of bleeding. Consider alternative medication or adjust dosages under medical supervision.'
-                }
-            elif any(term in med1_name for term in ['ace inhibitor', 'lisinopril', 'enalapril', 'captopril']) and \
-                 any(term in med2_name for term in ['potassium', 'spironolactone', 'amiloride']):
-                interaction = {
-                    'drug1': med1['name'],
-                    'drug2': med2['name'],
-                    'severity': 'Moderate',
-                    'description': 'Risk of hyperkalemia when ACE inhibitors are combined with potassium supplements or potassium-sparing diuretics',
-                    'recommendation': 'Monitor serum potassium levels regularly. Avoid potassium supplements unless prescribed.'
-                }
-            elif any(term in med1_name for term in ['beta blocker', 'propranolol', 'metoprolol', 'atenolol']) and \
-                 any(term in med2_name for term in ['calcium channel blocker', 'verapamil', 'diltiazem']):
-                interaction = {
-                    'drug1': med1['name'],
-                    'drug2': med2['name'],
-                    'severity': 'Moderate',
-                    'description': 'Combination may cause bradycardia, hypotension, or heart block',
-                    'recommendation': 'Monitor heart rate and blood pressure closely. Use with caution, especially in elderly patients.'
-                }
-            
-            if interaction:
-                interactions.append(interaction)
-    
-    return interactions
+def prescription_items_prefetch(lookup):
+    """Prefetch prescription items with their medication and stock summary in one query."""
+    return Prefetch(
+        lookup,
+        queryset=PrescriptionItem.objects.select_related('medication', 'medication__stock_summary'),
+    )
 
 
 class MedicationViewSet(viewsets.ModelViewSet):
@@ -112,6 +64,25 @@ class MedicationViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         return Medication.objects.filter(is_active=True)
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Fast medication suggestions for prescribing, served from an in-memory index.
+        
+        Matches word prefixes of name, generic name, code and strength, falling
+        back to trigram similarity for misspellings.
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        
+        if not query:
+            return Response({'results': []})
+        
+        return Response({'results': autocomplete(query, limit=max(limit, 1))})
 
 
 class MedicationInventoryViewSet(viewsets.ModelViewSet):
@@ -128,6 +99,351 @@ class MedicationInventoryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         return MedicationInventory.objects.all().select_related('medication')
+    
+    def perform_create(self, serializer):
+        serializer.save(performed_by=self.request.user)
+    
+    def perform_update(self, serializer):
+        serializer.save(performed_by=self.request.user)
+    
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'Batch has stock movements and cannot be deleted; write it off with an expiry or adjustment instead'},
+                status=status.HTTP_409_CONFLICT
+            )
+    
+    @action(detail=True, methods=['post'])
+    def adjust(self, request, pk=None):
+        """
+        Record a stock movement against this batch.
+        
+        Expects ``movement_type`` (receipt, return, expiry or adjustment) and
+        ``quantity``: positive for receipts, returns and expiries, signed for
+        adjustments. An expiry without a quantity writes off the whole batch.
+        """
+        movement_type = request.data.get('movement_type')
+        if movement_type not in ['receipt', 'return', 'expiry', 'adjustment']:
+            return Response(
+                {'error': 'movement_type must be one of receipt, return, expiry or adjustment'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        with transaction.atomic():
+            inventory = MedicationInventory.objects.select_for_update().get(pk=self.get_object().pk)
+            try:
+                raw_quantity = request.data.get('quantity')
+                if movement_type == 'expiry' and raw_quantity in (None, ''):
+                    quantity = inventory.quantity
+                else:
+                    quantity = Decimal(str(raw_quantity))
+            except (ValueError, InvalidOperation):
+                return Response({'error': 'Invalid quantity'}, status=status.HTTP_400_BAD_REQUEST)
+            if not quantity.is_finite():
+                return Response({'error': 'Invalid quantity'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if movement_type == 'adjustment':
+                change = quantity
+            elif quantity <= 0:
+                return Response({'error': 'Quantity must be greater than zero'}, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                change = -quantity if movement_type in StockMovement.OUTBOUND_TYPES else quantity
+            
+            if not change:
+                return Response({'error': 'Quantity must not be zero'}, status=status.HTTP_400_BAD_REQUEST)
+            if inventory.quantity + change < 0:
+                return Response(
+                    {'error': 'Insufficient stock', 'available': float(inventory.quantity)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            inventory.quantity += change
+            inventory.save(movement={
+                'movement_type': movement_type,
+                'reference': request.data.get('reference', ''),
+                'notes': request.data.get('notes', ''),
+                'performed_by': request.user,
+            })
+        
+        return Response(self.get_serializer(inventory).data)
+    
+    @action(detail=True, methods=['get'])
+    def movements(self, request, pk=None):
+        """Ledger entries for this batch, newest first."""
+        queryset = StockMovement.objects.filter(inventory=self.get_object()).select_related('medication', 'performed_by')
+        page = self.paginate_queryset(queryset)
+        serializer = StockMovementSerializer(page if page is not None else queryset, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for the append-only stock ledger."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = StockMovementSerializer
+    pagination_class = FlexiblePageNumberPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = {
+        'inventory': ['exact'],
+        'medication': ['exact'],
+        'movement_type': ['exact'],
+        'created_at': ['gte', 'lte'],
+    }
+    search_fields = ['medication__name', 'batch_number', 'reference']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        return StockMovement.objects.all().select_related('medication', 'performed_by')
+    
+    @action(detail=False, methods=['get'])
+    def balances(self, request):
+        """
+        Stock per batch as of a date (end of day) or datetime, from the
+        latest balance snapshot plus later movements.
+        
+        Query params: ``as_of`` (YYYY-MM-DD or ISO datetime, default now),
+        optional ``medication``.
+        """
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            as_of_date = parse_date(as_of)
+            if as_of_date is not None:
+                as_of_datetime = datetime.combine(as_of_date, time.max)
+            else:
+                as_of_datetime = parse_datetime(as_of)
+                if as_of_datetime is None:
+                    return Response(
+                        {'error': 'as_of must be a date (YYYY-MM-DD) or datetime'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            if timezone.is_naive(as_of_datetime):
+                as_of_datetime = timezone.make_aware(as_of_datetime)
+        else:
+            as_of_datetime = timezone.now()
+        
+        filters = {}
+        medication_id = request.query_params.get('medication')
+        if medication_id:
+            try:
+                filters['inventory__medication_id'] = int(medication_id)
+            except ValueError:
+                return Response({'error': 'Invalid medication'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        balances = ledger_balances(as_of=as_of_datetime, **filters)
+        batches = MedicationInventory.objects.filter(
+            id__in=[inventory_id for inventory_id, balance in balances.items() if balance]
+        ).values('id', 'medication_id', 'medication__name', 'batch_number', 'expiry_date', 'unit')
+        
+        results = [
+            {
+                'inventory_id': batch['id'],
+                'medication_id': batch['medication_id'],
+                'medication_name': batch['medication__name'],
+                'batch_number': batch['batch_number'],
+                'expiry_date': batch['expiry_date'],
+                'unit': batch['unit'],
+                'balance': float(balances[batch['id']]),
+            }
+            for batch in batches.order_by('medication__name', 'expiry_date')
+        ]
+        return Response({'as_of': as_of_datetime, 'count': len(results), 'results': results})
+
+
+class StockTakeSessionViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for stock-take sessions.
+    
+    Open a session, upload counts in bulk to ``counts/`` (JSON array or CSV
+    file), review ``variances/`` and ``post/`` the session to adjust stock.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = StockTakeSessionSerializer
+    pagination_class = FlexiblePageNumberPagination
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['status', 'location']
+    search_fields = ['name', 'notes']
+    ordering_fields = ['opened_at', 'posted_at']
+    ordering = ['-opened_at']
+    http_method_names = ['get', 'post', 'patch', 'head', 'options']
+    
+    def get_queryset(self):
+        return StockTakeSession.objects.all().select_related('opened_by', 'posted_by').annotate(
+            count_lines=Count('counts')
+        )
+    
+    def perform_create(self, serializer):
+        serializer.save(opened_by=self.request.user)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def counts(self, request, pk=None):
+        """
+        List counted batches, or upload counts.
+        
+        POST either a JSON body ``{"counts": [{inventory_id | medication_code +
+        batch_number, counted_quantity, notes}]}`` or a CSV ``file`` with those
+        columns. Re-uploading a batch replaces its earlier count.
+        """
+        session = self.get_object()
+        
+        if request.method == 'GET':
+            queryset = session.counts.select_related('inventory', 'inventory__medication')
+            page = self.paginate_queryset(queryset)
+            serializer = StockTakeCountSerializer(page if page is not None else queryset, many=True)
+            if page is not None:
+                return self.get_paginated_response(serializer.data)
+            return Response(serializer.data)
+        
+        try:
+            lines = StockTakeService.parse_count_lines(
+                request.data.get('counts'), csv_file=request.FILES.get('file')
+            )
+            stored = StockTakeService.record_counts(session, lines, request.user)
+        except StockTakeError as e:
+            payload = {'error': e.message}
+            if e.details:
+                payload['details'] = e.details
+            return Response(payload, status=e.status_code)
+        
+        return Response({'stored': stored, 'count_lines': session.counts.count()})
+    
+    @action(detail=True, methods=['get'])
+    def variances(self, request, pk=None):
+        """
+        Variance report of counted against system quantities.
+        
+        Use ``?only_variances=true`` to skip matching batches and
+        ``?export=csv`` to download the report as CSV.
+        """
+        session = self.get_object()
+        only_variances = request.query_params.get('only_variances', '').lower() == 'true'
+        rows = StockTakeService.variances(session, only_variances=only_variances)
+        
+        if request.query_params.get('export') == 'csv':
+            response = HttpResponse(content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{session.reference.lower()}_variances.csv"'
+            writer = csv.writer(response)
+            writer.writerow([
+                'Medication', 'Code', 'Batch', 'Expiry', 'Location', 'Unit',
+                'System Quantity', 'Counted Quantity', 'Variance', 'Variance Value', 'Notes',
+            ])
+            for row in rows:
+                writer.writerow([
+                    row['inventory__medication__name'], row['inventory__medication__code'],
+                    row['inventory__batch_number'], row['inventory__expiry_date'], row['inventory__location'],
+                    row['inventory__unit'], row['system'], row['counted_quantity'], row['variance'],
+                    row['variance_value'] if row['variance_value'] is not None else '', row['notes'],
+                ])
+            return response
+        
+        results = [
+            {
+                'inventory_id': row['inventory_id'],
+                'medication_name': row['inventory__medication__name'],
+                'medication_code': row['inventory__medication__code'],
+                'batch_number': row['inventory__batch_number'],
+                'expiry_date': row['inventory__expiry_date'],
+                'location': row['inventory__location'],
+                'unit': row['inventory__unit'],
+                'system_quantity': float(row['system']),
+                'counted_quantity': float(row['counted_quantity']),
+                'variance': float(row['variance']),
+                'variance_value': float(row['variance_value']) if row['variance_value'] is not None else None,
+                'notes': row['notes'],
+            }
+            for row in rows
+        ]
+        summary = {
+            'lines': len(results),
+            'lines_with_variance': sum(1 for row in results if row['variance']),
+            'surplus_quantity': sum(row['variance'] for row in results if row['variance'] > 0),
+            'shortage_quantity': sum(-row['variance'] for row in results if row['variance'] < 0),
+            'net_variance_value': sum(row['variance_value'] or 0 for row in results),
+        }
+        return Response({
+            'session': StockTakeSessionSerializer(session).data,
+            'summary': summary,
+            'results': results,
+        })
+    
+    @action(detail=True, methods=['post'], url_path='post')
+    def post_session(self, request, pk=None):
+        """Adjust every counted batch to its counted quantity."""
+        session = self.get_object()
+        try:
+            result = StockTakeService.post_session(session, request.user)
+        except StockTakeError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        session.refresh_from_db()
+        return Response({**result, 'session': StockTakeSessionSerializer(session).data})
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel an open session without adjusting stock."""
+        session = self.get_object()
+        if session.status != 'open':
+            return Response(
+                {'error': 'Stock take session is not open'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        session.status = 'cancelled'
+        session.save(update_fields=['status'])
+        return Response(StockTakeSessionSerializer(session).data)
+
+
+class MedicationStockViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for viewing per-medication stock-on-hand summaries."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = MedicationStockSerializer
+    pagination_class = FlexiblePageNumberPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['medication']
+    search_fields = ['medication__name', 'medication__code']
+    ordering_fields = ['unexpired_on_hand', 'earliest_expiry', 'medication__name']
+    ordering = ['medication__name']
+    
+    def get_queryset(self):
+        return MedicationStock.objects.filter(medication__is_active=True).select_related('medication')
+
+
+class ProcurementViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for forecast-based procurement suggestions.
+    
+    Use ``?needs_reorder=true`` to list medications at or below their
+    suggested reorder point.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = MedicationForecastSerializer
+    pagination_class = FlexiblePageNumberPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['medication']
+    search_fields = ['medication__name', 'medication__code']
+    ordering_fields = ['days_of_cover', 'avg_daily_demand', 'medication__name']
+    ordering = ['days_of_cover']
+    
+    def get_queryset(self):
+        queryset = MedicationForecast.objects.filter(
+            medication__is_active=True
+        ).select_related('medication', 'medication__stock_summary')
+        
+        needs_reorder = self.request.query_params.get('needs_reorder')
+        if needs_reorder and needs_reorder.lower() in ('true', '1'):
+            queryset = queryset.filter(avg_daily_demand__gt=0).filter(
+                Q(medication__stock_summary__isnull=True) |
+                Q(medication__stock_summary__unexpired_on_hand__lte=F('suggested_min_level'))
+            )
+        
+        return queryset
 
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -142,7 +458,18 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     ordering = ['-prescribed_at']
     
     def get_queryset(self):
-        return Prescription.objects.all().select_related('patient', 'doctor', 'visit', 'created_by').prefetch_related('medications')
+        return Prescription.objects.all().select_related('patient', 'doctor', 'visit', 'created_by').prefetch_related(
+            prescription_items_prefetch('medications')
+        )
+    
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'Prescription has dispensed medication and cannot be deleted; cancel it instead'},
+                status=status.HTTP_409_CONFLICT
+            )
     
     def perform_create(self, serializer):
         # Set doctor from request user if not provided
@@ -153,8 +480,15 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def check_interactions(self, request):
-        """Check for drug interactions between medications."""
+        """
+        Check for drug interactions between medications.
+        
+        When ``patient_id`` is given, the medications are also checked against
+        the patient's other active prescriptions (excluding ``prescription``).
+        """
         medication_ids = request.data.get('medication_ids', [])
+        patient_id = request.data.get('patient_id')
+        exclude_prescription = request.data.get('prescription')
         
         if not medication_ids:
             return Response(
@@ -165,7 +499,13 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         try:
             # Convert to integers
             medication_ids = [int(id) for id in medication_ids]
-            interactions = check_drug_interactions(medication_ids)
+            patient_id = int(patient_id) if patient_id else None
+            exclude_prescription = int(exclude_prescription) if exclude_prescription else None
+            interactions = check_drug_interactions(
+                medication_ids,
+                patient_id=patient_id,
+                exclude_prescription=exclude_prescription,
+            )
             return Response({'interactions': interactions})
         except (ValueError, TypeError) as e:
             return Response(
@@ -173,6 +513,29 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=False, methods=['post'])
+    def check_allergies(self, request):
+        """Check medications against a patient's recorded allergies."""
+        medication_ids = request.data.get('medication_ids', [])
+        patient_id = request.data.get('patient_id')
+        
+        if not patient_id:
+            return Response(
+                {'error': 'patient_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            medication_ids = [int(id) for id in medication_ids]
+            patient_id = int(patient_id)
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'Invalid patient_id or medication_ids format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        conflicts = check_allergy_conflicts(patient_id, medication_ids)
+        return Response({'conflicts': conflicts})
+    
     @action(detail=True, methods=['post'])
     def dispense(self, request, pk=None):
         """Dispense medication from a prescription."""
@@ -184,29 +547,37 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         try:
             item = prescription.medications.get(id=item_id)
             
-            # Check if enough quantity available
-            if inventory_id:
-                inventory = MedicationInventory.objects.get(id=inventory_id)
-                if inventory.quantity < quantity:
-                    return Response(
-                        {'error': 'Insufficient stock'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                inventory.quantity -= quantity
-                inventory.save()
-            
-            # Create dispense record
-            dispense = Dispense.objects.create(
-                prescription=prescription,
-                prescription_item=item,
-                medication=item.medication,
-                inventory_item=inventory if inventory_id else None,
-                quantity=quantity,
-                unit=item.unit,
-                batch_number=inventory.batch_number if inventory_id else '',
-                dispensed_by=request.user,
-                notes=request.data.get('notes', '')
-            )
+            with transaction.atomic():
+                # Check if enough quantity available
+                if inventory_id:
+                    inventory = MedicationInventory.objects.select_for_update().get(id=inventory_id)
+                    if inventory.quantity < quantity:
+                        return Response(
+                            {'error': 'Insufficient stock'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                
+                # Create dispense record
+                dispense = Dispense.objects.create(
+                    prescription=prescription,
+                    prescription_item=item,
+                    medication=item.medication,
+                    inventory_item=inventory if inventory_id else None,
+                    quantity=quantity,
+                    unit=item.unit,
+                    batch_number=inventory.batch_number if inventory_id else '',
+                    dispensed_by=request.user,
+                    notes=request.data.get('notes', '')
+                )
+                
+                if inventory_id:
+                    inventory.quantity -= quantity
+                    inventory.save(movement={
+                        'movement_type': 'dispense',
+                        'dispense': dispense,
+                        'reference': dispense.dispense_id,
+                        'performed_by': request.user,
+                    })
             
             # Update prescription item
             item.dispensed_quantity += quantity
@@ -226,6 +597,34 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
             )
 
 
+    @action(detail=True, methods=['post'])
+    def dispense_batch(self, request, pk=None):
+        """
+        Dispense several items of a prescription in one atomic request.
+        
+        Expects ``items``: a list of ``{item_id, quantity, inventory_id, notes}``.
+        Either every line is applied or none is.
+        """
+        prescription = self.get_object()
+        
+        try:
+            lines = DispenseService.parse_batch_lines(request.data.get('items'))
+            DispenseService.dispense_batch(
+                prescription,
+                lines,
+                user=request.user,
+                notes=request.data.get('notes', ''),
+            )
+        except DispenseError as e:
+            return Response(
+                {'error': e.message, 'details': e.details},
+                status=e.status_code
+            )
+        
+        prescription = self.get_queryset().get(pk=prescription.pk)
+        return Response(PrescriptionSerializer(prescription).data)
+
+
 class DispenseViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing dispense history."""
     
@@ -237,7 +636,10 @@ class DispenseViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['-dispensed_at']
     
     def get_queryset(self):
-        return Dispense.objects.all().select_related('prescription', 'medication', 'dispensed_by', 'inventory_item')
+        return Dispense.objects.all().select_related(
+            'prescription', 'prescription__patient', 'prescription__doctor',
+            'medication', 'dispensed_by', 'inventory_item'
+        ).prefetch_related(prescription_items_prefetch('prescription__medications'))
 
 
 class InventoryAlertViewSet(viewsets.ReadOnlyModelViewSet):
@@ -278,28 +680,11 @@ class InventoryAlertViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get summary of inventory alerts."""
-        from datetime import timedelta
-        
-        expiry_threshold = timezone.now().date() + timedelta(days=30)
-        today = timezone.now().date()
-        
-        summary = {
-            'low_stock_count': MedicationInventory.objects.filter(
-                quantity__lte=F('min_stock_level')
-            ).count(),
-            'expiring_count': MedicationInventory.objects.filter(
-                expiry_date__lte=expiry_threshold,
-                expiry_date__gte=today
-            ).count(),
-            'expired_count': MedicationInventory.objects.filter(
-                expiry_date__lt=today
-            ).count(),
-            'total_alerts': MedicationInventory.objects.filter(
-                Q(quantity__lte=F('min_stock_level')) |
-                Q(expiry_date__lte=expiry_threshold)
-            ).count(),
-        }
+        """
+        Get summary of inventory alerts.
         
-        return Response(summary)
+        Counts come from the alerts stored by the scheduled alert job;
+        ``computed_at`` is when that job last ran.
+        """
+        return Response(alert_summary())
 
@@ -2,7 +2,7 @@
 Admin configuration for the Radiology app.
 """
 from django.contrib import admin
-from .models import RadiologyOrder, RadiologyStudy, RadiologyReport
+from .models import RadiologyOrder, RadiologyStudy, RadiologyImage, RadiologyReport, ImagingRoom, RoomSlotTemplate
 
 
 @admin.register(RadiologyOrder)
@@ -14,11 +14,31 @@ class RadiologyOrderAdmin(admin.ModelAdmin):
 
 @admin.register(RadiologyStudy)
 class RadiologyStudyAdmin(admin.ModelAdmin):
-    list_display = ['procedure', 'order', 'status', 'modality', 'scheduled_date', 'created_at']
+    list_display = ['procedure', 'order', 'status', 'modality', 'room', 'scheduled_start', 'created_at']
     list_filter = ['status', 'modality', 'processing_method']
     search_fields = ['procedure', 'order__order_id']
 
 
+class RoomSlotTemplateInline(admin.TabularInline):
+    model = RoomSlotTemplate
+    extra = 0
+
+
+@admin.register(ImagingRoom)
+class ImagingRoomAdmin(admin.ModelAdmin):
+    list_display = ['name', 'modality', 'is_active']
+    list_filter = ['modality', 'is_active']
+    search_fields = ['name']
+    inlines = [RoomSlotTemplateInline]
+
+
+@admin.register(RadiologyImage)
+class RadiologyImageAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'study', 'content_type', 'size', 'rendition_status', 'uploaded_at']
+    list_filter = ['rendition_status', 'content_type']
+    search_fields = ['original_name', 'study__order__order_id']
+
+
 @admin.register(RadiologyReport)
 class RadiologyReportAdmin(admin.ModelAdmin):
     list_display = ['study', 'patient', 'overall_status', 'priority', 'created_at']
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiology', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='report_file',
+            field=models.FileField(blank=True, null=True, upload_to='radiology_reports/'),
+        ),
+    ]
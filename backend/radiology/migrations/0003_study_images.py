@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('radiology', '0002_study_report_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RadiologyImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='radiology_images/')),
+                ('original_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('rendition_status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('unsupported', 'Unsupported format'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('thumbnail', models.FileField(blank=True, null=True, upload_to='radiology_images/thumbnails/')),
+                ('preview', models.FileField(blank=True, null=True, upload_to='radiology_images/previews/')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('study', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='radiology.radiologystudy')),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_radiology_images', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'radiology_images',
+                'ordering': ['uploaded_at', 'id'],
+                'indexes': [models.Index(fields=['study', 'uploaded_at'], name='radiology_i_study_i_6f076c_idx')],
+            },
+        ),
+    ]
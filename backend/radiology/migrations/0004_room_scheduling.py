@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiology', '0003_study_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagingRoom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('modality', models.CharField(choices=[('X-Ray', 'X-Ray'), ('CT', 'CT'), ('MRI', 'MRI'), ('Ultrasound', 'Ultrasound')], db_index=True, max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+                ('notes', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'radiology_rooms',
+                'ordering': ['modality', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomSlotTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30)),
+            ],
+            options={
+                'db_table': 'radiology_room_slot_templates',
+                'ordering': ['room', 'weekday', 'start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='scheduled_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='scheduled_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='radiologystudy',
+            index=models.Index(fields=['room', 'scheduled_start'], name='radiology_s_room_id_422afb_idx'),
+        ),
+        migrations.AddField(
+            model_name='roomslottemplate',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_templates', to='radiology.imagingroom'),
+        ),
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='studies', to='radiology.imagingroom'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:19
+
+from django.db import migrations, models
+
+
+def copy_order_priority_ranks(apps, schema_editor):
+    """Copy each order's priority rank onto its studies (routine is the default)."""
+    RadiologyStudy = apps.get_model('radiology', 'RadiologyStudy')
+    for priority, rank in (('stat', 0), ('urgent', 1)):
+        RadiologyStudy.objects.filter(order__priority=priority).update(priority_rank=rank)
+
+
+def backfill_turnaround(apps, schema_editor):
+    """Store the turnaround durations of studies already reported."""
+    RadiologyStudy = apps.get_model('radiology', 'RadiologyStudy')
+
+    def seconds_between(start, end):
+        if start is None or end is None:
+            return None
+        return max(int((end - start).total_seconds()), 0)
+
+    studies = RadiologyStudy.objects.filter(reported_at__isnull=False).only('acquired_at', 'reported_at', 'verified_at')
+    batch = []
+    for study in studies.iterator(chunk_size=1000):
+        study.acquire_to_report_seconds = seconds_between(study.acquired_at, study.reported_at)
+        study.report_to_verify_seconds = seconds_between(study.reported_at, study.verified_at)
+        batch.append(study)
+        if len(batch) == 1000:
+            RadiologyStudy.objects.bulk_update(batch, ['acquire_to_report_seconds', 'report_to_verify_seconds'])
+            batch = []
+    RadiologyStudy.objects.bulk_update(batch, ['acquire_to_report_seconds', 'report_to_verify_seconds'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiology', '0004_room_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='acquire_to_report_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.AddField(
+            model_name='radiologystudy',
+            name='report_to_verify_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='radiologystudy',
+            index=models.Index(condition=models.Q(('status__in', ['acquired', 'processing', 'reported'])), fields=['priority_rank', 'acquired_at', 'id'], name='radiology_worklist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='radiologystudy',
+            index=models.Index(fields=['reported_at', 'acquire_to_report_seconds'], name='radiology_report_tat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='radiologystudy',
+            index=models.Index(fields=['verified_at', 'report_to_verify_seconds'], name='radiology_verify_tat_idx'),
+        ),
+        migrations.RunPython(copy_order_priority_ranks, migrations.RunPython.noop),
+        migrations.RunPython(backfill_turnaround, migrations.RunPython.noop),
+    ]
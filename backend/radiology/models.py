@@ -1,7 +1,7 @@
 """
 Radiology models for the EMR system.
 """
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -21,6 +21,9 @@ class RadiologyOrder(models.Model):
     doctor = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='ordered_radiology')
     visit = models.ForeignKey('patients.Visit', on_delete=models.SET_NULL, null=True, blank=True, related_name='radiology_orders')
     
+    # Worklist rank of each priority; lower is reported first
+    PRIORITY_RANKS = {'stat': 0, 'urgent': 1, 'routine': 2}
+    
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='routine')
     clinic = models.CharField(max_length=100, blank=True)
     clinical_notes = models.TextField(blank=True)
@@ -37,12 +40,86 @@ class RadiologyOrder(models.Model):
         if self.clinic:
             from common.clinic_utils import normalize_clinic_name
             self.clinic = normalize_clinic_name(self.clinic)
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        
+        # Keep the worklist rank copied onto the studies in line with the priority
+        if not adding:
+            rank = self.PRIORITY_RANKS.get(self.priority, RadiologyStudy.DEFAULT_PRIORITY_RANK)
+            self.studies.exclude(priority_rank=rank).update(priority_rank=rank)
     
     def __str__(self):
         return f"{self.order_id} - {self.patient.get_full_name()}"
 
 
+class ImagingRoom(models.Model):
+    """
+    A room (and its scanner) where studies of one modality are performed.
+    """
+    
+    MODALITY_CHOICES = [
+        ('X-Ray', 'X-Ray'),
+        ('CT', 'CT'),
+        ('MRI', 'MRI'),
+        ('Ultrasound', 'Ultrasound'),
+    ]
+    
+    name = models.CharField(max_length=100, unique=True)
+    modality = models.CharField(max_length=50, choices=MODALITY_CHOICES, db_index=True)
+    is_active = models.BooleanField(default=True)
+    notes = models.TextField(blank=True)
+    
+    class Meta:
+        db_table = 'radiology_rooms'
+        ordering = ['modality', 'name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.modality})"
+
+
+class RoomSlotTemplate(models.Model):
+    """
+    A weekly session of a room, divided into bookable slots of
+    ``slot_minutes`` from ``start_time`` to ``end_time``.
+    """
+    
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    room = models.ForeignKey(ImagingRoom, on_delete=models.CASCADE, related_name='slot_templates')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+    
+    class Meta:
+        db_table = 'radiology_room_slot_templates'
+        ordering = ['room', 'weekday', 'start_time']
+    
+    def __str__(self):
+        return f"{self.room.name} {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
+# Statuses of studies on the reporting worklist: awaiting a report, then
+# awaiting verification
+REPORTING_STATUSES = ['acquired', 'processing']
+VERIFICATION_STATUSES = ['reported']
+
+
+def seconds_between(start, end):
+    """Whole seconds from ``start`` to ``end``, or ``None`` unless both are set."""
+    if start is None or end is None:
+        return None
+    return max(int((end - start).total_seconds()), 0)
+
+
 class RadiologyStudy(models.Model):
     """
     Individual imaging study within an order.
@@ -62,16 +139,24 @@ class RadiologyStudy(models.Model):
         ('outsourced', 'Outsourced'),
     ]
     
+    DEFAULT_PRIORITY_RANK = RadiologyOrder.PRIORITY_RANKS['routine']
+    
     order = models.ForeignKey(RadiologyOrder, on_delete=models.CASCADE, related_name='studies')
     procedure = models.CharField(max_length=200)
     body_part = models.CharField(max_length=100, blank=True)
     modality = models.CharField(max_length=50, blank=True, help_text="X-Ray, CT, MRI, Ultrasound, etc.")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Copy of the order's priority rank so the worklist sorts on one table
+    priority_rank = models.PositiveSmallIntegerField(default=DEFAULT_PRIORITY_RANK)
     
     # Scheduling
     scheduled_date = models.DateField(null=True, blank=True)
     scheduled_time = models.TimeField(null=True, blank=True)
     scheduled_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='scheduled_studies')
+    # Room booking; the interval checked for conflicts
+    room = models.ForeignKey(ImagingRoom, on_delete=models.SET_NULL, null=True, blank=True, related_name='studies')
+    scheduled_start = models.DateTimeField(null=True, blank=True)
+    scheduled_end = models.DateTimeField(null=True, blank=True)
     
     # Acquisition
     processing_method = models.CharField(max_length=20, choices=PROCESSING_METHOD_CHOICES, blank=True, null=True)
@@ -86,6 +171,7 @@ class RadiologyStudy(models.Model):
     findings = models.TextField(blank=True)
     impression = models.TextField(blank=True)
     recommendations = models.TextField(blank=True)
+    report_file = models.FileField(upload_to='radiology_reports/', blank=True, null=True)
     reported_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='reported_studies')
     reported_at = models.DateTimeField(null=True, blank=True)
     
@@ -94,6 +180,10 @@ class RadiologyStudy(models.Model):
     verified_at = models.DateTimeField(null=True, blank=True)
     verification_notes = models.TextField(blank=True)
     
+    # Turnaround, stored when the study is reported and verified
+    acquire_to_report_seconds = models.PositiveIntegerField(null=True, blank=True)
+    report_to_verify_seconds = models.PositiveIntegerField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -101,11 +191,97 @@ class RadiologyStudy(models.Model):
         db_table = 'radiology_studies'
         ordering = ['-created_at']
         verbose_name_plural = 'Radiology Studies'
+        indexes = [
+            models.Index(fields=['room', 'scheduled_start']),
+            models.Index(
+                fields=['priority_rank', 'acquired_at', 'id'],
+                name='radiology_worklist_idx',
+                condition=models.Q(status__in=REPORTING_STATUSES + VERIFICATION_STATUSES),
+            ),
+            models.Index(fields=['reported_at', 'acquire_to_report_seconds'], name='radiology_report_tat_idx'),
+            models.Index(fields=['verified_at', 'report_to_verify_seconds'], name='radiology_verify_tat_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        """
+        Take the worklist rank from the order on creation and store the
+        turnaround durations from the workflow timestamps.
+        """
+        if self._state.adding:
+            self.priority_rank = RadiologyOrder.PRIORITY_RANKS.get(self.order.priority, self.DEFAULT_PRIORITY_RANK)
+        self.acquire_to_report_seconds = seconds_between(self.acquired_at, self.reported_at)
+        self.report_to_verify_seconds = seconds_between(self.reported_at, self.verified_at)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'acquire_to_report_seconds', 'report_to_verify_seconds'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.procedure} - {self.order.order_id}"
 
 
+class RadiologyImage(models.Model):
+    """
+    An image or attachment stored for a study, with the thumbnail and
+    preview renditions generated from it in the background.
+    """
+    
+    RENDITION_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('unsupported', 'Unsupported format'),
+        ('failed', 'Failed'),
+    ]
+    
+    study = models.ForeignKey(RadiologyStudy, on_delete=models.CASCADE, related_name='images')
+    file = models.FileField(upload_to='radiology_images/')
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    
+    # Renditions
+    rendition_status = models.CharField(max_length=20, choices=RENDITION_STATUS_CHOICES, default='pending')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.FileField(upload_to='radiology_images/thumbnails/', blank=True, null=True)
+    preview = models.FileField(upload_to='radiology_images/previews/', blank=True, null=True)
+    
+    uploaded_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='uploaded_radiology_images')
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'radiology_images'
+        ordering = ['uploaded_at', 'id']
+        indexes = [
+            models.Index(fields=['study', 'uploaded_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.original_name} - {self.study}"
+    
+    @classmethod
+    def create_from_upload(cls, session, name, size, sha256):
+        """Store a completed chunked upload as an image of the study given as target."""
+        image = cls.objects.create(
+            study_id=session.target_id,
+            file=name,
+            original_name=session.filename,
+            content_type=session.content_type,
+            size=size,
+            sha256=sha256,
+            uploaded_by=session.created_by,
+        )
+        image.queue_renditions()
+        return image
+    
+    def queue_renditions(self):
+        """Generate the renditions in a worker once the image is committed."""
+        from .tasks import generate_image_renditions
+        
+        transaction.on_commit(lambda: generate_image_renditions.delay(self.pk))
+
+
 class RadiologyReport(models.Model):
     """
     Radiology reports awaiting verification.
@@ -0,0 +1,69 @@
+"""
+Thumbnail and preview renditions of radiology images.
+
+Reviewing a study lists small thumbnails and opens a screen-sized preview;
+the original is only downloaded when needed. Renditions are JPEGs drawn
+with Pillow by a Celery task after the image is stored. JPEG originals are
+decoded at reduced scale (``Image.draft``), so large acquisitions are never
+fully decoded. Formats Pillow cannot read, such as DICOM or PDF, are marked
+``unsupported`` and served as originals only.
+"""
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (256, 256)
+PREVIEW_SIZE = (1600, 1600)
+JPEG_QUALITY = 85
+
+
+def _jpeg(image, size):
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    rendition.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _displayable(image):
+    """Convert an image to a mode JPEG can store, scaling 16-bit greyscale down to 8 bits."""
+    if image.mode.startswith('I'):
+        return image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    if image.mode in ('L', 'RGB'):
+        return image
+    return image.convert('RGB')
+
+
+def generate_renditions(image):
+    """
+    Draw the thumbnail and preview of a ``RadiologyImage`` and record its
+    dimensions. Returns the resulting ``rendition_status``.
+    """
+    previous = [field.name for field in (image.thumbnail, image.preview) if field]
+    try:
+        with image.file.open('rb') as stream:
+            with Image.open(stream) as source:
+                image.width, image.height = source.size
+                source.draft('RGB', PREVIEW_SIZE)
+                source = _displayable(ImageOps.exif_transpose(source))
+                preview = _jpeg(source, PREVIEW_SIZE)
+                thumbnail = _jpeg(source, THUMBNAIL_SIZE)
+    except UnidentifiedImageError:
+        image.rendition_status = 'unsupported'
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not render radiology image {image.pk}: {e}")
+        image.rendition_status = 'failed'
+    else:
+        image.preview.save(f"{image.pk}-preview.jpg", ContentFile(preview), save=False)
+        image.thumbnail.save(f"{image.pk}-thumb.jpg", ContentFile(thumbnail), save=False)
+        image.rendition_status = 'ready'
+
+    image.save(update_fields=['rendition_status', 'width', 'height', 'thumbnail', 'preview'])
+    for name in previous:
+        if name not in (image.thumbnail.name, image.preview.name):
+            image.thumbnail.storage.delete(name)
+    return image.rendition_status
@@ -0,0 +1,188 @@
+"""
+Room capacity scheduling for radiology studies.
+
+Each ``ImagingRoom`` has weekly ``RoomSlotTemplate`` sessions divided into
+fixed-length slots. A slot is free when no study booked in the room has a
+``[scheduled_start, scheduled_end)`` interval overlapping it.
+
+Availability loads the rooms and their templates, then every booking
+overlapping the searched window with one query, and walks the slot grid
+day by day in memory; overlap against a room's bookings is a binary search
+over their sorted starts. Booking locks the room row, so concurrent
+bookings of a room are serialized and the overlap check cannot race.
+"""
+import bisect
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import ImagingRoom, RadiologyStudy
+
+Slot = namedtuple('Slot', ['room', 'start', 'end'])
+
+
+class SchedulingError(Exception):
+    """Raised when a study cannot be booked."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class Bookings:
+    """A room's booked intervals, sorted by start, for overlap tests."""
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _ in intervals]
+        # Latest end among the first i intervals, so overlapping bookings are handled
+        self.max_ends = []
+        latest = None
+        for _, end in intervals:
+            latest = end if latest is None or end > latest else latest
+            self.max_ends.append(latest)
+
+    def overlaps(self, start, end):
+        """Whether any interval overlaps ``[start, end)``."""
+        count = bisect.bisect_left(self.starts, end)
+        return count > 0 and self.max_ends[count - 1] > start
+
+
+def active_rooms(modality=None, room_id=None):
+    """
+    Active rooms (with templates prefetched) for a modality or a room id, by
+    name. A blank modality has no rooms.
+    """
+    rooms = ImagingRoom.objects.filter(is_active=True).prefetch_related('slot_templates').order_by('name')
+    if room_id is not None:
+        rooms = rooms.filter(pk=room_id)
+    else:
+        modality = (modality or '').strip()
+        if not modality:
+            return []
+        rooms = rooms.filter(modality__iexact=modality)
+    return list(rooms)
+
+
+def load_bookings(room_ids, start, end, exclude_study_id=None):
+    """Bookings of rooms overlapping ``[start, end)``, with one query. Returns ``{room id: Bookings}``."""
+    intervals = {room_id: [] for room_id in room_ids}
+    rows = RadiologyStudy.objects.filter(
+        room_id__in=list(room_ids), scheduled_start__lt=end, scheduled_end__gt=start
+    )
+    if exclude_study_id is not None:
+        rows = rows.exclude(pk=exclude_study_id)
+    for room_id, booked_start, booked_end in rows.values_list('room_id', 'scheduled_start', 'scheduled_end'):
+        intervals[room_id].append((booked_start, booked_end))
+    return {room_id: Bookings(room_intervals) for room_id, room_intervals in intervals.items()}
+
+
+def day_slots(room, day):
+    """The template slots of a room on a date, in order."""
+    tz = timezone.get_current_timezone()
+    slots = []
+    for template in room.slot_templates.all():
+        if template.weekday != day.weekday() or not template.slot_minutes:
+            continue
+        length = timedelta(minutes=template.slot_minutes)
+        start = timezone.make_aware(datetime.combine(day, template.start_time), tz)
+        session_end = timezone.make_aware(datetime.combine(day, template.end_time), tz)
+        while start + length <= session_end:
+            slots.append(Slot(room, start, start + length))
+            start += length
+    return sorted(slots, key=lambda slot: slot.start)
+
+
+def available_slots(rooms, date_from, date_to=None, limit=10, now=None):
+    """
+    Free slots of ``rooms`` from ``date_from`` through ``date_to`` (by
+    default the scheduling horizon), earliest first and at most ``limit``.
+    Slots that have already started are skipped.
+    """
+    now = now or timezone.now()
+    date_to = date_to or date_from + timedelta(days=settings.RADIOLOGY_SCHEDULING_HORIZON_DAYS)
+    if not rooms or date_to < date_from:
+        return []
+
+    tz = timezone.get_current_timezone()
+    window_start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()), tz)
+    window_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()), tz)
+    bookings = load_bookings([room.id for room in rooms], window_start, window_end)
+
+    free = []
+    day = date_from
+    while day <= date_to and len(free) < limit:
+        slots = [slot for room in rooms for slot in day_slots(room, day)]
+        slots.sort(key=lambda slot: (slot.start, slot.room.name))
+        for slot in slots:
+            if slot.start < now or bookings[slot.room.id].overlaps(slot.start, slot.end):
+                continue
+            free.append(slot)
+            if len(free) == limit:
+                break
+        day += timedelta(days=1)
+    return free
+
+
+def slot_at(room, start):
+    """The template slot of a room starting exactly at ``start``, or ``None``."""
+    local_start = timezone.localtime(start)
+    for slot in day_slots(room, local_start.date()):
+        if slot.start == local_start:
+            return slot
+    return None
+
+
+def book_study(study, start, user, room=None):
+    """
+    Book a study into the slot starting at ``start``, in ``room`` or the
+    first room of the study's modality that is free then. Returns the
+    updated study. Raises ``SchedulingError`` if no slot is free.
+    """
+    if start < timezone.now():
+        raise SchedulingError('Cannot schedule in the past')
+    if room is not None:
+        candidates = [room.id]
+    else:
+        if not (study.modality or '').strip():
+            raise SchedulingError('The study has no modality to book a room for')
+        candidates = [candidate.id for candidate in active_rooms(modality=study.modality)]
+        if not candidates:
+            raise SchedulingError(f"No rooms are set up for modality '{study.modality}'")
+
+    fitting = False
+    with transaction.atomic():
+        # Locked in id order so concurrent bookings cannot deadlock
+        rooms = list(
+            ImagingRoom.objects.select_for_update().filter(pk__in=candidates, is_active=True)
+            .prefetch_related('slot_templates').order_by('id')
+        )
+        rooms.sort(key=lambda candidate: candidate.name)
+        for candidate in rooms:
+            slot = slot_at(candidate, start)
+            if slot is None:
+                continue
+            fitting = True
+            bookings = load_bookings([candidate.id], slot.start, slot.end, exclude_study_id=study.pk)
+            if bookings[candidate.id].overlaps(slot.start, slot.end):
+                continue
+
+            local_start = timezone.localtime(slot.start)
+            study.room = candidate
+            study.scheduled_start = slot.start
+            study.scheduled_end = slot.end
+            study.scheduled_date = local_start.date()
+            study.scheduled_time = local_start.time()
+            study.scheduled_by = user
+            study.status = 'scheduled'
+            study.save()
+            return study
+
+    if not fitting:
+        raise SchedulingError('The requested time is not a bookable slot for this room')
+    raise SchedulingError('The slot is already booked', status.HTTP_409_CONFLICT)
@@ -2,7 +2,37 @@
 Serializers for the Radiology app.
 """
 from rest_framework import serializers
-from .models import RadiologyOrder, RadiologyStudy, RadiologyReport
+from rest_framework.reverse import reverse
+from .models import (
+    RadiologyOrder, RadiologyStudy, RadiologyImage, RadiologyReport, ImagingRoom, RoomSlotTemplate,
+)
+
+
+class RoomSlotTemplateSerializer(serializers.ModelSerializer):
+    """Serializer for RoomSlotTemplate model."""
+    
+    def validate(self, attrs):
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and end_time <= start_time:
+            raise serializers.ValidationError({'end_time': 'Must be after start_time'})
+        if attrs.get('slot_minutes') == 0:
+            raise serializers.ValidationError({'slot_minutes': 'Must be at least one minute'})
+        return attrs
+    
+    class Meta:
+        model = RoomSlotTemplate
+        fields = '__all__'
+
+
+class ImagingRoomSerializer(serializers.ModelSerializer):
+    """Serializer for ImagingRoom model."""
+    
+    slot_templates = RoomSlotTemplateSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = ImagingRoom
+        fields = '__all__'
 
 
 class RadiologyStudySerializer(serializers.ModelSerializer):
@@ -16,7 +46,44 @@ class RadiologyStudySerializer(serializers.ModelSerializer):
     class Meta:
         model = RadiologyStudy
         fields = '__all__'
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['priority_rank', 'acquire_to_report_seconds', 'report_to_verify_seconds', 'created_at', 'updated_at']
+
+
+class RadiologyImageSerializer(serializers.ModelSerializer):
+    """
+    Serializer for RadiologyImage model. Files are linked through the
+    streaming endpoints rather than exposed as storage paths.
+    """
+    
+    file = serializers.FileField(write_only=True)
+    file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+    uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True, allow_null=True)
+    
+    def _url(self, obj, name):
+        # Link within the API prefix (/api/ or /api/v1/) the request came in on
+        request = self.context.get('request')
+        match = getattr(request, 'resolver_match', None)
+        namespace = match.namespace if match and match.namespace else 'api_v1'
+        return reverse(f'{namespace}:radiology-image-{name}', args=[obj.pk], request=request)
+    
+    def get_file_url(self, obj):
+        return self._url(obj, 'file')
+    
+    def get_thumbnail_url(self, obj):
+        return self._url(obj, 'thumbnail') if obj.thumbnail else None
+    
+    def get_preview_url(self, obj):
+        return self._url(obj, 'preview') if obj.preview else None
+    
+    class Meta:
+        model = RadiologyImage
+        exclude = ['thumbnail', 'preview']
+        read_only_fields = [
+            'original_name', 'content_type', 'size', 'sha256', 'rendition_status', 'width', 'height',
+            'uploaded_by', 'uploaded_at',
+        ]
 
 
 class RadiologyOrderSerializer(serializers.ModelSerializer):
@@ -0,0 +1,15 @@
+"""
+Celery tasks for the Radiology app.
+"""
+from celery import shared_task
+
+from .models import RadiologyImage
+from .renditions import generate_renditions
+
+
+@shared_task(ignore_result=True)
+def generate_image_renditions(image_id):
+    """Draw the thumbnail and preview of a newly stored study image."""
+    image = RadiologyImage.objects.filter(pk=image_id).first()
+    if image is not None:
+        generate_renditions(image)
@@ -3,10 +3,21 @@ URL configuration for the Radiology app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RadiologyOrderViewSet, RadiologyReportViewSet
+from .views import (
+    RadiologyOrderViewSet,
+    RadiologyStudyViewSet,
+    RadiologyImageViewSet,
+    RadiologyReportViewSet,
+    ImagingRoomViewSet,
+    RoomSlotTemplateViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'orders', RadiologyOrderViewSet, basename='radiology-order')
+router.register(r'studies', RadiologyStudyViewSet, basename='radiology-study')
+router.register(r'images', RadiologyImageViewSet, basename='radiology-image')
+router.register(r'rooms', ImagingRoomViewSet, basename='radiology-room')
+router.register(r'slot-templates', RoomSlotTemplateViewSet, basename='radiology-slot-template')
 router.register(r'verification', RadiologyReportViewSet, basename='radiology-report')
 
 urlpatterns = [
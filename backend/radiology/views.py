@@ -1,20 +1,36 @@
 """
 Views for the Radiology app.
 """
+from datetime import datetime, timedelta
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from common.pagination import InvalidCursor, keyset_page, parse_cursor_datetime
+from common.streaming import file_response
 
-from .models import RadiologyOrder, RadiologyStudy, RadiologyReport
+from .models import (
+    RadiologyOrder, RadiologyStudy, RadiologyImage, RadiologyReport, ImagingRoom, RoomSlotTemplate,
+    REPORTING_STATUSES, VERIFICATION_STATUSES,
+)
 from .serializers import (
     RadiologyOrderSerializer,
     RadiologyStudySerializer,
+    RadiologyImageSerializer,
     RadiologyReportSerializer,
+    ImagingRoomSerializer,
+    RoomSlotTemplateSerializer,
 )
+from .scheduling import SchedulingError, active_rooms, available_slots, book_study
 
 
 class RadiologyOrderViewSet(viewsets.ModelViewSet):
@@ -36,22 +52,65 @@ class RadiologyOrderViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def schedule(self, request, pk=None):
-        """Schedule a study."""
+        """
+        Schedule a study.
+        
+        Takes ``scheduled_start`` (or ``scheduled_date`` and
+        ``scheduled_time``) and optionally a ``room``. When rooms are set up
+        for the study's modality the time must be a free slot of the room,
+        or of any room of the modality if none is given; otherwise the date
+        and time are recorded as given. A given room must be of the study's
+        modality.
+        """
         order = self.get_object()
         study_id = request.data.get('study_id')
         scheduled_date = request.data.get('scheduled_date')
         scheduled_time = request.data.get('scheduled_time')
+        room_id = request.data.get('room')
         
         try:
             study = order.studies.get(id=study_id)
+        except RadiologyStudy.DoesNotExist:
+            return Response({'error': 'Study not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        room = None
+        if room_id:
+            room = ImagingRoom.objects.filter(pk=room_id, is_active=True).first()
+            if room is None:
+                return Response({'error': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+            if room.modality.lower() != (study.modality or '').strip().lower():
+                return Response(
+                    {'error': f"Room {room.name} is for {room.modality}, not {study.modality or 'an unspecified modality'}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        
+        if room is None and not active_rooms(modality=study.modality):
             study.status = 'scheduled'
             study.scheduled_date = scheduled_date
             study.scheduled_time = scheduled_time
             study.scheduled_by = request.user
             study.save()
             return Response(RadiologyStudySerializer(study).data)
-        except RadiologyStudy.DoesNotExist:
-            return Response({'error': 'Study not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.data.get('scheduled_start'):
+            start = parse_datetime(str(request.data['scheduled_start']))
+        else:
+            day = parse_date(str(scheduled_date or ''))
+            time = parse_time(str(scheduled_time or ''))
+            start = datetime.combine(day, time) if day and time else None
+        if start is None:
+            return Response(
+                {'error': 'scheduled_start (or scheduled_date and scheduled_time) is required'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        
+        try:
+            study = book_study(study, start, request.user, room=room)
+        except SchedulingError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(RadiologyStudySerializer(study).data)
     
     @action(detail=True, methods=['post'])
     def acquire(self, request, pk=None):
@@ -60,7 +119,7 @@ class RadiologyOrderViewSet(viewsets.ModelViewSet):
         study_id = request.data.get('study_id')
         processing_method = request.data.get('processing_method')
         outsourced_facility = request.data.get('outsourced_facility', '')
-        images_count = request.data.get('images_count', 0)
+        images_count = request.data.get('images_count')
         technical_notes = request.data.get('technical_notes', '')
         
         try:
@@ -70,7 +129,8 @@ class RadiologyOrderViewSet(viewsets.ModelViewSet):
             study.status = 'acquired'
             study.processing_method = processing_method
             study.outsourced_facility = outsourced_facility if processing_method == 'outsourced' else ''
-            study.images_count = images_count
+            # Without an explicit count, count the images stored for the study
+            study.images_count = images_count if images_count is not None else study.images.count()
             study.technical_notes = technical_notes
             study.acquired_by = request.user
             study.acquired_at = timezone.now()
@@ -105,10 +165,8 @@ class RadiologyOrderViewSet(viewsets.ModelViewSet):
             # For now, we'll note it in the report text if critical
             if critical:
                 study.report = f"[CRITICAL FINDING]\n\n{study.report}"
-            # File upload handling - could store file path if FileField added to model
             if report_file:
-                # Note: FileField would need to be added to model for actual file storage
-                study.technical_notes = f"{study.technical_notes}\n\nReport file uploaded: {report_file.name}".strip()
+                study.report_file = report_file
             study.save()
             
             # Create or update report record
@@ -130,6 +188,261 @@ class RadiologyOrderViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Study not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class RadiologyStudyViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for viewing radiology studies and the reporting worklist."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = RadiologyStudySerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['order', 'status', 'modality', 'room']
+    ordering_fields = ['created_at', 'acquired_at', 'reported_at']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        return RadiologyStudy.objects.all().select_related(
+            'order', 'scheduled_by', 'acquired_by', 'reported_by', 'verified_by'
+        )
+    
+    # stage -> statuses on that worklist
+    WORKLIST_STAGES = {'report': REPORTING_STATUSES, 'verify': VERIFICATION_STATUSES}
+    WORKLIST_ORDERING = ['priority_rank', 'acquired_at', 'id']
+    WORKLIST_DEFAULT_LIMIT = 50
+    WORKLIST_MAX_LIMIT = 200
+    
+    @action(detail=False, methods=['get'])
+    def worklist(self, request):
+        """
+        Reporting worklist: STAT, then urgent, then routine, longest since
+        acquisition first within each priority.
+        
+        Query params: ``stage`` (``report``, the default, for studies
+        awaiting a report or ``verify`` for reports awaiting verification),
+        ``modality`` (comma-separated), ``priority``, ``limit`` and
+        ``cursor`` (the ``next_cursor`` of the previous page). Rows are
+        flagged ``overdue`` once they have waited longer than the reporting
+        SLA for their priority.
+        """
+        stage = request.query_params.get('stage', 'report')
+        if stage not in self.WORKLIST_STAGES:
+            return Response(
+                {'error': f"stage must be one of {', '.join(self.WORKLIST_STAGES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = RadiologyStudy.objects.filter(
+            status__in=self.WORKLIST_STAGES[stage], acquired_at__isnull=False
+        )
+        
+        modalities = [value for value in request.query_params.get('modality', '').split(',') if value]
+        if modalities:
+            queryset = queryset.filter(modality__in=modalities)
+        
+        priority = request.query_params.get('priority')
+        if priority:
+            if priority not in RadiologyOrder.PRIORITY_RANKS:
+                return Response({'error': 'Invalid priority'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(priority_rank=RadiologyOrder.PRIORITY_RANKS[priority])
+        
+        try:
+            limit = min(int(request.query_params.get('limit', self.WORKLIST_DEFAULT_LIMIT)), self.WORKLIST_MAX_LIMIT)
+        except ValueError:
+            limit = self.WORKLIST_DEFAULT_LIMIT
+        limit = max(limit, 1)
+        
+        try:
+            rows, next_cursor = keyset_page(
+                queryset.values(
+                    'id', 'procedure', 'body_part', 'modality', 'status', 'priority_rank', 'acquired_at',
+                    'reported_at', 'room__name', 'order_id', 'order__order_id', 'order__patient_id',
+                    'order__patient__patient_id', 'order__patient__first_name', 'order__patient__middle_name',
+                    'order__patient__surname',
+                ),
+                self.WORKLIST_ORDERING,
+                (int, parse_cursor_datetime, int),
+                cursor=request.query_params.get('cursor'),
+                limit=limit,
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        priorities = {rank: priority for priority, rank in RadiologyOrder.PRIORITY_RANKS.items()}
+        results = []
+        for row in rows:
+            priority = priorities.get(row['priority_rank'], 'routine')
+            waiting_minutes = int((now - row['acquired_at']).total_seconds() // 60)
+            sla_minutes = settings.RADIOLOGY_REPORT_SLA_MINUTES.get(priority)
+            name_parts = [row['order__patient__first_name'], row['order__patient__middle_name'], row['order__patient__surname']]
+            results.append({
+                'id': row['id'],
+                'procedure': row['procedure'],
+                'body_part': row['body_part'],
+                'modality': row['modality'],
+                'status': row['status'],
+                'priority': priority,
+                'room': row['room__name'],
+                'order': row['order_id'],
+                'order_id': row['order__order_id'],
+                'patient_id': row['order__patient_id'],
+                'patient_number': row['order__patient__patient_id'],
+                'patient_name': ' '.join(part for part in name_parts if part),
+                'acquired_at': row['acquired_at'],
+                'reported_at': row['reported_at'],
+                'waiting_minutes': waiting_minutes,
+                'overdue': sla_minutes is not None and waiting_minutes > sla_minutes,
+            })
+        
+        return Response({'results': results, 'next_cursor': next_cursor})
+
+
+class ImagingRoomViewSet(viewsets.ModelViewSet):
+    """ViewSet for imaging rooms and their availability."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImagingRoomSerializer
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['modality', 'is_active']
+    search_fields = ['name']
+    ordering = ['modality', 'name']
+    
+    AVAILABILITY_DEFAULT_LIMIT = 10
+    AVAILABILITY_MAX_LIMIT = 100
+    
+    def get_queryset(self):
+        return ImagingRoom.objects.all().prefetch_related('slot_templates')
+    
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Next free slots, earliest first.
+        
+        Query params: ``modality`` or ``room``, ``date_from`` (default
+        today), ``date_to`` (default, and at most, the scheduling horizon
+        after ``date_from``) and ``limit``.
+        """
+        params = request.query_params
+        modality = params.get('modality')
+        room_id = params.get('room')
+        if not modality and not room_id:
+            return Response({'error': 'modality or room is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            date_from = parse_date(params['date_from']) if params.get('date_from') else timezone.localdate()
+            date_to = parse_date(params['date_to']) if params.get('date_to') else None
+        except ValueError:
+            date_from = None
+        if date_from is None or (params.get('date_to') and date_to is None):
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if date_to is not None and date_to < date_from:
+            return Response({'error': 'date_to must not be before date_from'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            horizon = date_from + timedelta(days=settings.RADIOLOGY_SCHEDULING_HORIZON_DAYS)
+        except OverflowError:
+            return Response({'error': 'date_from is out of range'}, status=status.HTTP_400_BAD_REQUEST)
+        date_to = min(date_to or horizon, horizon)
+        try:
+            limit = min(int(params.get('limit', self.AVAILABILITY_DEFAULT_LIMIT)), self.AVAILABILITY_MAX_LIMIT)
+            room_id = int(room_id) if room_id else None
+        except ValueError:
+            return Response({'error': 'limit and room must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rooms = active_rooms(modality=modality, room_id=room_id)
+        slots = available_slots(rooms, date_from, date_to, limit=max(limit, 1))
+        return Response({
+            'results': [
+                {
+                    'room': slot.room.id,
+                    'room_name': slot.room.name,
+                    'modality': slot.room.modality,
+                    'start': slot.start,
+                    'end': slot.end,
+                }
+                for slot in slots
+            ],
+        })
+
+
+class RoomSlotTemplateViewSet(viewsets.ModelViewSet):
+    """ViewSet for managing the weekly slot templates of imaging rooms."""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = RoomSlotTemplateSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['room', 'weekday']
+    
+    def get_queryset(self):
+        return RoomSlotTemplate.objects.all().select_related('room')
+
+
+class RadiologyImageViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for study images and attachments.
+    
+    Small files can be posted here as multipart ``file`` with ``study``;
+    large ones go through the chunked upload API with target type
+    ``radiology_image``. Thumbnails and previews are generated in the
+    background. Originals and renditions are streamed with HTTP Range
+    support.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = RadiologyImageSerializer
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['study', 'rendition_status']
+    ordering_fields = ['uploaded_at']
+    ordering = ['uploaded_at', 'id']
+    
+    def get_queryset(self):
+        return RadiologyImage.objects.all().select_related('uploaded_by')
+    
+    def perform_create(self, serializer):
+        upload = serializer.validated_data['file']
+        image = serializer.save(
+            uploaded_by=self.request.user,
+            original_name=upload.name[:255],
+            content_type=(getattr(upload, 'content_type', '') or '')[:100],
+            size=upload.size,
+        )
+        image.queue_renditions()
+    
+    def perform_destroy(self, instance):
+        names = [field.name for field in (instance.file, instance.thumbnail, instance.preview) if field]
+        storage = instance.file.storage
+        with transaction.atomic():
+            instance.delete()
+            transaction.on_commit(lambda: [storage.delete(name) for name in names])
+    
+    @action(detail=True, methods=['get'])
+    def file(self, request, pk=None):
+        """Stream the original file."""
+        image = self.get_object()
+        return file_response(
+            request, image.file, image.content_type or 'application/octet-stream',
+            filename=image.original_name, etag=image.sha256 or None,
+        )
+    
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        """Stream the thumbnail rendition."""
+        return self._rendition(request, self.get_object(), 'thumbnail')
+    
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """Stream the preview rendition."""
+        return self._rendition(request, self.get_object(), 'preview')
+    
+    def _rendition(self, request, image, name):
+        field_file = getattr(image, name)
+        if not field_file:
+            return Response(
+                {'error': f'Rendition not available ({image.rendition_status})'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        etag = f'{image.sha256}-{name}' if image.sha256 else None
+        return file_response(request, field_file, 'image/jpeg', etag=etag)
+
+
 class RadiologyReportViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing radiology reports awaiting verification."""
     
@@ -248,12 +248,11 @@ class LabPerformanceReportView(views.APIView):
                     turnaround_diffs.append(diff.total_seconds() / 3600)  # Convert to hours
             avg_turnaround_hours = sum(turnaround_diffs) / len(turnaround_diffs) if turnaround_diffs else 0
         
-        # Critical values (tests with abnormal/critical results)
+        # Critical values (verified tests whose result was classified critical)
         critical_values = LabTest.objects.filter(
             status='verified',
-            verified_at__date__gte=start_of_month
-        ).exclude(notes__isnull=True).exclude(notes='').filter(
-            notes__icontains='critical'
+            verified_at__date__gte=start_of_month,
+            result_record__overall_status='critical'
         ).count()
         
         stats = {
@@ -840,43 +839,59 @@ class RadiologicalServicesReportView(views.APIView):
         except (ValueError, TypeError):
             year_int = timezone.now().year
         
-        # Get radiology studies for the year
-        studies = RadiologyStudy.objects.filter(
-            created_at__year=year_int
-        ).select_related('order__patient')
-        
-        # Count by modality/type
-        xray_count = studies.filter(
-            Q(modality__icontains='x-ray') | Q(modality__icontains='xray') | Q(procedure__icontains='x-ray')
-        ).count()
-        
-        ecg_count = studies.filter(
-            Q(modality__icontains='ecg') | Q(procedure__icontains='ecg') | Q(procedure__icontains='electrocardiogram')
-        ).count()
-        
-        ultrasound_count = studies.filter(
-            Q(modality__icontains='ultrasound') | Q(procedure__icontains='ultrasound')
-        ).count()
-        
-        ct_count = studies.filter(
-            Q(modality__icontains='ct') | Q(modality__icontains='computed tomography') | Q(procedure__icontains='ct scan')
-        ).count()
-        
-        mri_count = studies.filter(
-            Q(modality__icontains='mri') | Q(procedure__icontains='magnetic resonance')
-        ).count()
-        
-        other_count = studies.exclude(
+        # Count every category in one aggregate query over the year's studies
+        studies = RadiologyStudy.objects.filter(created_at__year=year_int)
+        xray = Q(modality__icontains='x-ray') | Q(modality__icontains='xray') | Q(procedure__icontains='x-ray')
+        ecg = Q(modality__icontains='ecg') | Q(procedure__icontains='ecg') | Q(procedure__icontains='electrocardiogram')
+        ultrasound = Q(modality__icontains='ultrasound') | Q(procedure__icontains='ultrasound')
+        ct = Q(modality__icontains='ct') | Q(modality__icontains='computed tomography') | Q(procedure__icontains='ct scan')
+        mri = Q(modality__icontains='mri') | Q(procedure__icontains='magnetic resonance')
+        other = ~(
             Q(modality__icontains='x-ray') | Q(modality__icontains='xray') |
             Q(modality__icontains='ecg') | Q(modality__icontains='ultrasound') |
             Q(modality__icontains='ct') | Q(modality__icontains='mri')
-        ).exclude(
+        ) & ~(
             Q(procedure__icontains='x-ray') | Q(procedure__icontains='ecg') |
             Q(procedure__icontains='ultrasound') | Q(procedure__icontains='ct scan') |
             Q(procedure__icontains='magnetic resonance')
-        ).count()
-        
-        total = studies.count()
+        )
+        counts = studies.aggregate(
+            xray=Count('id', filter=xray),
+            ecg=Count('id', filter=ecg),
+            ultrasound=Count('id', filter=ultrasound),
+            ct=Count('id', filter=ct),
+            mri=Count('id', filter=mri),
+            other=Count('id', filter=other),
+            total=Count('id'),
+        )
+        xray_count = counts['xray']
+        ecg_count = counts['ecg']
+        ultrasound_count = counts['ultrasound']
+        ct_count = counts['ct']
+        mri_count = counts['mri']
+        other_count = counts['other']
+        total = counts['total']
+        
+        # Turnaround from the durations stored at each transition
+        turnaround = [
+            {
+                'modality': row['modality'] or 'Unspecified',
+                'reported': row['reported'],
+                'avg_acquire_to_report_minutes': (
+                    round(row['acquire_to_report'] / 60, 1) if row['acquire_to_report'] is not None else None
+                ),
+                'verified': row['verified'],
+                'avg_report_to_verify_minutes': (
+                    round(row['report_to_verify'] / 60, 1) if row['report_to_verify'] is not None else None
+                ),
+            }
+            for row in studies.filter(reported_at__isnull=False).values('modality').annotate(
+                reported=Count('acquire_to_report_seconds'),
+                acquire_to_report=Avg('acquire_to_report_seconds'),
+                verified=Count('report_to_verify_seconds'),
+                report_to_verify=Avg('report_to_verify_seconds'),
+            ).order_by('modality')
+        ]
         
         categories = [
             {'sn': 1, 'category': 'X-Ray', 'count': xray_count},
@@ -892,7 +907,8 @@ class RadiologicalServicesReportView(views.APIView):
         
         return Response({
             'data': categories,
-            'total': total
+            'total': total,
+            'turnaround': turnaround,
         })
 
 